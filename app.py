@@ -1,11 +1,45 @@
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
+import sys
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key')
+from services import metrics
+from services.catalog import get_catalog
+from services.rankings import storefront_version
+from services.template_cache import FragmentCacheExtension, bytecode_cache
+
+
+def create_app(config=None):
+    """Build the storefront app.
+
+    Anything that cannot be set up (a blueprint that fails to import, a
+    missing or malformed catalog) raises here, so a bad deploy fails at
+    startup instead of serving errors. The catalog, its indexes and every
+    template are loaded before returning; under gunicorn's preload_app that
+    happens once in the master and forked workers share the memory.
+
+    Set START_BACKGROUND_TASKS to False in config when the app is built in
+    a process that will fork (see gunicorn.conf.py); the workers start the
+    Telegram delivery thread themselves.
+    """
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key')
+    app.config['START_BACKGROUND_TASKS'] = True
+    app.config.update(config or {})
+
+    # {% cache %} fragments, and compiled templates kept on disk across restarts
+    app.jinja_options = {**app.jinja_options, 'extensions': [FragmentCacheExtension], 'bytecode_cache': bytecode_cache()}
+    # Fragments show ranking badges too, so they are keyed on both the catalog and the rankings
+    app.jinja_env.fragment_cache_version = storefront_version
+
+    # Behind a load balancer, take the client address from X-Forwarded-For (rate limits key on it)
+    proxy_hops = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops)
+
+    # Latency histograms and counters at /metrics; ?__profile when PROFILER_ENABLED is set
+    metrics.init_app(app)
 
-# Import and register blueprints
-try:
     from routes.fronts.index import home_bp
     from routes.fronts.about import about_bp
     from routes.fronts.contact import contact_bp
@@ -14,7 +48,7 @@ try:
     from routes.fronts.cart import cart_bp
     from routes.fronts.product import product_bp
     from routes.fronts.checkout import checkout_bp
-    
+
     app.register_blueprint(home_bp)
     app.register_blueprint(about_bp)
     app.register_blueprint(contact_bp)
@@ -23,16 +57,46 @@ try:
     app.register_blueprint(cart_bp)
     app.register_blueprint(product_bp)
     app.register_blueprint(checkout_bp)
-    
-    print("All blueprints registered successfully!")
-    
-except Exception as e:
-    print(f"Error importing blueprints: {e}")
 
-@app.route('/health')
-def health():
-    return {'status': 'healthy', 'message': 'Plant Store is running!'}, 200
+    # Fingerprinted, precompressed static files from `flask assets build`
+    from services import assets
+    assets.init_app(app)
+
+    # <picture>/srcset helper over the derivatives from `flask images build`
+    from services import images
+    images.init_app(app)
+
+    # Best sellers and new arrivals, and the is_popular()/is_new_arrival() template helpers
+    from services import rankings
+    rankings.init_app(app)
+
+    # `flask catalog import/export`, and a swap to the new catalog when its file is replaced
+    from services import catalog_io
+    catalog_io.init_app(app)
+
+    @app.route('/health')
+    def health():
+        return {'status': 'healthy', 'message': 'Plant Store is running!'}, 200
+
+    warm(app)
+
+    if app.config['START_BACKGROUND_TASKS']:
+        # Start Telegram delivery and replay anything left in the spool by a previous run
+        from services import telegram_bot
+        telegram_bot.start()
+
+    return app
+
+
+def warm(app):
+    """Load the catalog and compile every template now rather than on the first requests"""
+    catalog = get_catalog()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    # stderr, so `flask catalog export` to stdout is only the catalog
+    print(f"Loaded {len(catalog)} products and {len(app.jinja_env.list_templates())} templates", file=sys.stderr)
+
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
+    create_app().run(host='0.0.0.0', port=port, debug=False)
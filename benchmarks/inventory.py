@@ -0,0 +1,106 @@
+"""Benchmark stock reservations under contention on a single hot product.
+
+Several processes, standing in for gunicorn workers, race to reserve and
+then commit (or abandon) one unit each of the same product until it sells
+out. Reports throughput and latency, and fails if the product was oversold
+or stock was left reserved. From the repository root:
+
+    python -m benchmarks.inventory --processes 8 --stock 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.workload import percentile
+from services.inventory import Inventory, OutOfStock
+
+HOT_PRODUCT_ID = 1
+
+
+def _worker(path, attempts, abandon_rate, seed):
+    rng = random.Random(seed)
+    inventory = Inventory(path)
+    sold = abandoned = rejected = 0
+    latencies = []
+    for _ in range(attempts):
+        started = time.perf_counter()
+        try:
+            reservation_id = inventory.reserve([(HOT_PRODUCT_ID, 1)])
+        except OutOfStock:
+            rejected += 1
+            latencies.append(time.perf_counter() - started)
+            continue
+        if rng.random() < abandon_rate:
+            inventory.release(reservation_id)
+            abandoned += 1
+        else:
+            inventory.commit(reservation_id)
+            sold += 1
+        latencies.append(time.perf_counter() - started)
+    return sold, abandoned, rejected, latencies
+
+
+def run(processes, stock, attempts, abandon_rate, seed=0):
+    with tempfile.TemporaryDirectory(prefix='bench-inventory-') as workdir:
+        path = os.path.join(workdir, 'inventory.sqlite3')
+        inventory = Inventory(path)
+        inventory.set_stock(HOT_PRODUCT_ID, stock)
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(_worker, [path] * processes, [attempts] * processes,
+                                    [abandon_rate] * processes, range(seed, seed + processes)))
+        wall = time.perf_counter() - started
+
+        on_hand, reserved = inventory.conn.execute(
+            'SELECT on_hand, reserved FROM stock WHERE product_id = ?', (HOT_PRODUCT_ID,)).fetchone()
+
+    sold = sum(r[0] for r in results)
+    latencies = sorted(latency for r in results for latency in r[3])
+    errors = []
+    if sold > stock:
+        errors.append(f"oversold: {sold} sold from a stock of {stock}")
+    if on_hand != stock - sold:
+        errors.append(f"on hand is {on_hand}, expected {stock - sold}")
+    if reserved:
+        errors.append(f"{reserved} units still reserved")
+    return {
+        'config': {'processes': processes, 'stock': stock, 'attempts': attempts, 'abandon_rate': abandon_rate},
+        'sold': sold,
+        'abandoned': sum(r[1] for r in results),
+        'rejected': sum(r[2] for r in results),
+        'operations': len(latencies),
+        'wall_s': round(wall, 3),
+        'ops_per_s': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'errors': errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--processes', type=int, default=8, help='competing processes (default: %(default)s)')
+    parser.add_argument('--stock', type=int, default=2000, help='units of the hot product (default: %(default)s)')
+    parser.add_argument('--attempts', type=int, default=500,
+                        help='checkouts attempted per process (default: %(default)s)')
+    parser.add_argument('--abandon-rate', type=float, default=0.2,
+                        help='share of reservations released instead of committed (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = run(args.processes, args.stock, args.attempts, args.abandon_rate, args.seed)
+    print(json.dumps(results, indent=2, sort_keys=True))
+    for error in results['errors']:
+        print(f"FAILED {error}", file=sys.stderr)
+    return 1 if results['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Benchmark the storefront against synthetic catalogs and check for regressions.
+
+Runs the same seeded traffic mix (see workload.DEFAULT_MIX) through the
+Flask test client and/or a local gunicorn, once per catalog size, with
+contact-form notifications going to tools/telegram_stub.py. Results are
+printed as JSON; pass --baseline to fail when they are worse than a stored
+run by more than --tolerance. From the repository root:
+
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import requests
+
+from benchmarks.synthetic import generate_catalog
+from benchmarks.workload import HTTPClient, InProcessClient, run_visitors, summarize
+from services import BASE_DIR
+from services.telegram_bot import MessageSpool
+from tools.telegram_stub import StubTelegramServer
+
+DEFAULT_SIZES = (100, 10_000, 100_000)
+# Routes with fewer samples than this are too noisy to compare against the baseline
+MIN_ROUTE_SAMPLES = 50
+STARTUP_TIMEOUT = 120
+# How long a run may take to hand its queued contact-form notifications to the stub
+TELEGRAM_DRAIN_TIMEOUT = 60
+
+
+def app_env(workdir, catalog_path, telegram_url):
+    """Environment for an app under test: private instance dir, synthetic catalog, stub Telegram"""
+    return dict(
+        os.environ,
+        INSTANCE_DIR=os.path.join(workdir, 'instance'),
+        CATALOG_PATH=catalog_path,
+        TELEGRAM_SPOOL_PATH=os.path.join(workdir, 'telegram_spool.jsonl'),
+        SECRET_KEY='benchmark',
+        TELEGRAM_API_URL=telegram_url,
+        TELEGRAM_BOT_TOKEN='benchmark',
+        TELEGRAM_CHAT_ID='1',
+        # Every visitor comes from 127.0.0.1 and would share one bucket
+        RATE_LIMIT_ENABLED='0',
+        # Enough stock that the most viewed products never sell out mid-run
+        INVENTORY_DEFAULT_STOCK='1000000',
+    )
+
+
+def _inprocess_worker(catalog_size, options):
+    from app import create_app
+    app = create_app()
+
+    samples, wall = run_visitors(lambda: InProcessClient(app), catalog_size, **options)
+    # Delivery runs on a daemon thread that dies with this process; let it finish first
+    from services import telegram_bot
+    notifier = telegram_bot.get_notifier()
+    if notifier:
+        notifier.flush(timeout=TELEGRAM_DRAIN_TIMEOUT)
+    return summarize(samples, wall)
+
+
+def run_inprocess(env, catalog_size, options):
+    # The child must start with this run's environment: a spawned interpreter imports the
+    # services (which read INSTANCE_DIR, CATALOG_PATH, ...) before the worker function runs
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            return pool.submit(_inprocess_worker, catalog_size, options).result()
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_gunicorn(env, catalog_size, options, workers, log_path):
+    port = _free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    with open(log_path, 'ab') as log:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers)],
+            cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {server.returncode}; see {log_path}')
+            try:
+                if requests.get(base_url + '/health', timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'gunicorn did not start within {STARTUP_TIMEOUT}s; see {log_path}')
+            time.sleep(0.2)
+
+        samples, wall = run_visitors(lambda: HTTPClient(base_url), catalog_size, **options)
+        summary = summarize(samples, wall)
+        wait_for_telegram(env['TELEGRAM_SPOOL_PATH'])
+        return summary
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def wait_for_telegram(spool_path, timeout=TELEGRAM_DRAIN_TIMEOUT):
+    """Wait until the app's spool has no undelivered messages; returns how many are left"""
+    spool = MessageSpool(spool_path)
+    deadline = time.monotonic() + timeout
+    while spool.pending() and time.monotonic() < deadline:
+        time.sleep(0.2)
+    return len(spool.pending())
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human-readable regressions of results against baseline"""
+    regressions = []
+    for name, base in baseline.get('runs', {}).items():
+        run = results['runs'].get(name)
+        if run is None:
+            continue
+        if run['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {run['throughput_rps']} rps < baseline {base['throughput_rps']} rps")
+        if run['errors'] > base['errors']:
+            regressions.append(f"{name}: {run['errors']} server errors, baseline had {base['errors']}")
+        if run.get('telegram_undelivered'):
+            regressions.append(f"{name}: {run['telegram_undelivered']} Telegram messages were never delivered")
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if run['latency'][key] > base['latency'][key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {run['latency'][key]} > baseline {base['latency'][key]}")
+        for route, base_stats in base['routes'].items():
+            stats = run['routes'].get(route)
+            if stats is None or min(stats['count'], base_stats['count']) < MIN_ROUTE_SAMPLES:
+                continue
+            if stats['p95_ms'] > base_stats['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name} {route}: p95_ms {stats['p95_ms']} > baseline {base_stats['p95_ms']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--mode', choices=('inprocess', 'gunicorn', 'both'), default='inprocess')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated catalog sizes (default: %(default)s)')
+    parser.add_argument('--visitors', type=int, default=4, help='concurrent sessions (default: %(default)s)')
+    parser.add_argument('--actions', type=int, default=250, help='recorded actions per visitor (default: %(default)s)')
+    parser.add_argument('--warmup', type=int, default=20, help='unrecorded actions per visitor first')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--telegram-delay', type=float, default=0.05, help='stub Telegram latency in seconds')
+    parser.add_argument('--output', help='also write the results JSON here')
+    parser.add_argument('--baseline', help='fail if results regress against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional slowdown before a regression is reported (default: %(default)s)')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    modes = ('inprocess', 'gunicorn') if args.mode == 'both' else (args.mode,)
+    options = {'visitors': args.visitors, 'actions': args.actions, 'warmup': args.warmup, 'seed': args.seed}
+    results = {'config': {**options, 'sizes': sizes, 'modes': list(modes), 'workers': args.workers}, 'runs': {}}
+
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir, \
+            StubTelegramServer(delay=args.telegram_delay) as telegram:
+        for size in sizes:
+            catalog_path = generate_catalog(os.path.join(workdir, f'catalog-{size}.jsonl'), size, seed=args.seed)
+            for mode in modes:
+                run_dir = os.path.join(workdir, f'{mode}-{size}')
+                os.makedirs(run_dir)
+                env = app_env(run_dir, catalog_path, telegram.url)
+                print(f"Running {mode} with {size} products...", file=sys.stderr)
+                delivered = len(telegram.messages)
+                if mode == 'inprocess':
+                    summary = run_inprocess(env, size, options)
+                else:
+                    summary = run_gunicorn(env, size, options, args.workers, os.path.join(run_dir, 'gunicorn.log'))
+                # Notifications merged into one send count once
+                summary['telegram_sends'] = len(telegram.messages) - delivered
+                summary['telegram_undelivered'] = wait_for_telegram(env['TELEGRAM_SPOOL_PATH'], timeout=0)
+                results['runs'][f'{mode}/{size}'] = summary
+        results['telegram_messages'] = len(telegram.messages)
+
+    rendered = json.dumps(results, indent=2, sort_keys=True)
+    print(rendered)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(rendered + '\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
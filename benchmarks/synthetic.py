@@ -0,0 +1,35 @@
+"""Synthetic catalogs of any size, built from the products in data/catalog.jsonl."""
+import json
+import os
+import random
+
+from services.catalog import CATALOG_PATH, read_products
+
+ADJECTIVES = ('Variegated', 'Dwarf', 'Giant', 'Golden', 'Silver', 'Trailing', 'Compact', 'Rare', 'Classic', 'Pink')
+
+
+def generate_catalog(path, size, seed=0, source=CATALOG_PATH):
+    """Write a JSONL catalog of size products to path and return path.
+
+    Products are copies of the real catalog with new ids, names and prices,
+    so every image and template field exists. The same seed always gives
+    the same file, and about a tenth of the products carry each flag.
+    """
+    rng = random.Random(seed)
+    templates = read_products(source)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        for product_id in range(1, size + 1):
+            base = templates[(product_id - 1) % len(templates)]
+            product = dict(base)
+            product.update(
+                id=product_id,
+                name=f"{rng.choice(ADJECTIVES)} {base['name']} {product_id}",
+                price=round(base['price'] * rng.uniform(0.5, 2.0), 2),
+                rating=rng.randint(3, 5),
+                is_popular=rng.random() < 0.1,
+                is_new=rng.random() < 0.1,
+                is_on_sale=rng.random() < 0.1,
+            )
+            f.write(json.dumps(product, ensure_ascii=False) + '\n')
+    return path
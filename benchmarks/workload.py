@@ -0,0 +1,201 @@
+"""Storefront traffic: weighted visitor actions over every blueprint, and latency statistics."""
+import random
+import threading
+import time
+
+CATEGORIES = ('indoor', 'outdoor', 'accessories', 'pot')
+
+CHECKOUT_FORM = {
+    'first_name': 'Bench',
+    'last_name': 'Mark',
+    'email': 'bench@example.com',
+    'phone': '555-0100',
+    'street_address': '1 Load Test Way',
+    'city': 'Portland',
+    'state': 'OR',
+    'zip_code': '97201',
+    'payment_method': 'credit_card',
+    'shipping_method': 'standard',
+}
+
+# Words typed into the search box, one letter at a time, by the typeahead action
+SEARCH_WORDS = ('monstera', 'snake', 'pothos', 'ceramic', 'tropical', 'golden', 'planter')
+
+CONTACT_FORM = {'name': 'Bench Mark', 'email': 'bench@example.com', 'message': 'Do you ship cuttings?'}
+
+
+class InProcessClient:
+    """One visitor talking to the app through the Flask test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, **kwargs):
+        response = self.client.open(path, method=method, **kwargs)
+        try:
+            response.get_data()
+            return response.status_code, response.headers.get('Location')
+        finally:
+            response.close()
+
+
+class HTTPClient:
+    """One visitor talking to a running server over HTTP, with its own cookie jar"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, data=None, json=None):
+        response = self.session.request(method, self.base_url + path, data=data, json=json, allow_redirects=False)
+        return response.status_code, response.headers.get('Location')
+
+
+class Visitor:
+    """Runs weighted actions for one session, recording (route, seconds, status) samples.
+
+    Product ids are drawn with a power-law skew, so a few products get most
+    of the views, as on a real storefront.
+    """
+
+    def __init__(self, client, catalog_size, rng, recorder):
+        self.client = client
+        self.catalog_size = catalog_size
+        self.rng = rng
+        self.recorder = recorder
+        self.last_order = None
+
+    def _product_id(self):
+        return min(self.catalog_size, int(self.rng.paretovariate(1.2)))
+
+    def _timed(self, route, method, path, **kwargs):
+        start = time.perf_counter()
+        status, location = self.client.request(method, path, **kwargs)
+        self.recorder.record(route, time.perf_counter() - start, status)
+        return status, location
+
+    def home(self):
+        self._timed('home', 'GET', '/')
+
+    def shop(self):
+        self._timed('shop', 'GET', '/shop')
+
+    def category(self):
+        self._timed('category', 'GET', f'/shop/category/{self.rng.choice(CATEGORIES)}')
+
+    def product(self):
+        self._timed('product', 'GET', f'/product/{self._product_id()}')
+
+    def suggest(self):
+        word = self.rng.choice(SEARCH_WORDS)
+        for end in range(2, len(word) + 1):
+            self._timed('suggest', 'GET', f'/api/suggest?q={word[:end]}')
+
+    def add_to_cart(self):
+        self._timed('add-to-cart', 'POST', '/cart/items', json={'id': self._product_id(), 'quantity': 1})
+
+    def view_cart(self):
+        self._timed('cart', 'GET', '/cart')
+
+    def sync_cart(self):
+        items = [{'id': self._product_id(), 'quantity': self.rng.randint(1, 3)} for _ in range(self.rng.randint(1, 4))]
+        self._timed('sync-cart', 'POST', '/sync-cart', json={'cart_items': items})
+
+    def checkout(self):
+        self._timed('add-to-cart', 'POST', '/cart/items', json={'id': self._product_id(), 'quantity': 1})
+        self._timed('checkout', 'GET', '/checkout')
+        status, location = self._timed('checkout/process', 'POST', '/checkout/process', data=CHECKOUT_FORM)
+        if location and '/order-confirmation/' in location:
+            self.last_order = '/order-confirmation/' + location.rsplit('/order-confirmation/', 1)[1]
+            self._timed('order-confirmation', 'GET', self.last_order)
+
+    def contact(self):
+        self._timed('contact', 'GET', '/contact')
+        self._timed('contact/submit', 'POST', '/contact', data=CONTACT_FORM)
+
+
+# Relative frequency of each visitor action; most traffic is browsing
+DEFAULT_MIX = (
+    (Visitor.home, 15),
+    (Visitor.shop, 15),
+    (Visitor.category, 15),
+    (Visitor.product, 30),
+    (Visitor.suggest, 5),
+    (Visitor.add_to_cart, 8),
+    (Visitor.view_cart, 7),
+    (Visitor.sync_cart, 3),
+    (Visitor.checkout, 4),
+    (Visitor.contact, 3),
+)
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.samples.append((route, seconds, status))
+
+
+def run_visitors(make_client, catalog_size, visitors, actions, seed=0, mix=DEFAULT_MIX, warmup=0):
+    """Run visitors concurrent sessions of actions each; returns (samples, wall seconds).
+
+    Each visitor's random stream is derived from seed, so the sequence of
+    requests is the same on every run. The first warmup actions of each
+    visitor are not recorded.
+    """
+    recorder = Recorder()
+    actions_list, weights = zip(*mix)
+
+    def visit(index):
+        rng = random.Random(seed * 1000003 + index)
+        warm = Recorder()
+        visitor = Visitor(make_client(), catalog_size, rng, warm)
+        for n in range(warmup + actions):
+            if n == warmup:
+                visitor.recorder = recorder
+            rng.choices(actions_list, weights)[0](visitor)
+
+    threads = [threading.Thread(target=visit, args=(i,), name=f'visitor-{i}') for i in range(visitors)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.samples, time.perf_counter() - start
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _latency_stats(latencies):
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def summarize(samples, wall_seconds):
+    """Throughput, error count and p50/p95/p99 overall and per route"""
+    by_route = {}
+    for route, seconds, _ in samples:
+        by_route.setdefault(route, []).append(seconds)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, _, status in samples if status >= 500),
+        'seconds': round(wall_seconds, 3),
+        'throughput_rps': round(len(samples) / wall_seconds, 1) if wall_seconds else 0.0,
+        'latency': _latency_stats([seconds for _, seconds, _ in samples]),
+        'routes': {route: _latency_stats(values) for route, values in sorted(by_route.items())},
+    }
@@ -0,0 +1,37 @@
+"""Gunicorn settings; start the server with `gunicorn -c gunicorn.conf.py`.
+
+Worker model comes from the environment:
+
+    WEB_CONCURRENCY        worker processes (default 2)
+    GUNICORN_THREADS       threads per worker (default 1; more than 1 selects gthread)
+    GUNICORN_WORKER_CLASS  sync, gthread or gevent (gevent must be installed)
+    GUNICORN_TIMEOUT       seconds before a silent worker is restarted (default 120)
+"""
+import gc
+import os
+
+# Built in the master with background threads off; each worker starts its own after the fork
+wsgi_app = 'app:create_app({"START_BACKGROUND_TASKS": False})'
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Not one per CPU: a container often reports the host's cores, and every worker holds its own
+# page, quote and fragment caches. Raise it with WEB_CONCURRENCY where the memory is there.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or ('gthread' if threads > 1 else 'sync')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Load the app, catalog and templates once in the master so workers share them copy-on-write.
+# gevent has to patch the standard library before the app is imported, so it cannot preload.
+preload_app = worker_class != 'gevent'
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach; otherwise the first
+    # collection in each worker touches every object and un-shares the pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from services import telegram_bot
+    telegram_bot.start()
@@ -1,49 +1,135 @@
-from flask import Blueprint, render_template, session, request, jsonify
+from flask import Blueprint, render_template, request, jsonify
+from services.catalog import get_catalog
+from services.pricing import quote, quote_cart, PricingError
+from services.cart_store import (get_cart_store, get_cart_id, load_cart, replace_cart, clear_cart,
+                                 cart_item_count, migrate_session_cart, as_int)
 
 cart_bp = Blueprint('cart', __name__)
 
+
+def _cart_response(message, **extra):
+    return jsonify({'success': True, 'message': message, 'item_count': cart_item_count(), **extra})
+
+
+def _error(message, status=400):
+    return jsonify({'success': False, 'message': message}), status
+
+
+def _json_object():
+    """The request's JSON object ({} without a body), or None for any other JSON value"""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    return data if isinstance(data, dict) else None
+
+
+def _is_item_list(items):
+    return isinstance(items, list) and all(isinstance(item, dict) for item in items)
+
+
 @cart_bp.route('/cart')
 def cart():
-    # Get cart items from session (you can modify this based on your cart logic)
-    cart_items = session.get('cart', [])
-    total = sum(item.get('price', 0) * item.get('quantity', 1) for item in cart_items)
+    # The page itself renders from localStorage; these are the server-side lines
+    cart_items = load_cart()
+    total = quote_cart(cart_items).total
     return render_template('shop/cart.html', title="Green Bean - Cart", cart_items=cart_items, total=total)
 
-@cart_bp.route('/sync-cart', methods=['POST'])
-def sync_cart():
-    """Sync cart from localStorage to Flask session"""
-    try:
-        data = request.get_json()
-        cart_items = data.get('cart_items', [])
-        session['cart'] = cart_items
-        session.modified = True
-        return jsonify({'success': True, 'message': 'Cart synced successfully'})
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+@cart_bp.route('/cart/items', methods=['GET'])
+def list_items():
+    cart_items = load_cart()
+    return jsonify({
+        'success': True,
+        'items': [{'id': item['id'], 'quantity': item['quantity']} for item in cart_items],
+        'item_count': sum(item['quantity'] for item in cart_items)
+    })
 
+@cart_bp.route('/cart/items', methods=['POST'])
 @cart_bp.route('/add-to-cart', methods=['POST'])
 def add_to_cart():
-    # Sample add to cart functionality
-    data = request.get_json()
-    if 'cart' not in session:
-        session['cart'] = []
-    
-    # Add item to cart (modify based on your requirements)
-    session['cart'].append({
-        'id': data.get('id'),
-        'name': data.get('name'),
-        'price': data.get('price'),
-        'quantity': data.get('quantity', 1)
-    })
-    session.modified = True
-    
-    return jsonify({'success': True, 'message': 'Item added to cart'})
+    """Add a quantity of one product to the cart"""
+    data = _json_object()
+    if data is None:
+        return _error('Expected a JSON object')
+    product_id = as_int(data.get('id'))
+    quantity = as_int(data.get('quantity', 1))
+    if product_id is None or get_catalog().get(product_id) is None:
+        return _error('Unknown product', 404)
+    if quantity is None:
+        return _error('Invalid quantity')
 
+    migrate_session_cart()
+    get_cart_store().add(get_cart_id(create=True), product_id, quantity)
+    return _cart_response('Item added to cart')
+
+@cart_bp.route('/cart/items/<int:product_id>', methods=['PATCH', 'PUT'])
+def update_item(product_id):
+    """Set the quantity of one line; zero removes it"""
+    data = _json_object()
+    if data is None:
+        return _error('Expected a JSON object')
+    quantity = as_int(data.get('quantity'))
+    if quantity is None:
+        return _error('Invalid quantity')
+    if quantity > 0 and get_catalog().get(product_id) is None:
+        return _error('Unknown product', 404)
+
+    migrate_session_cart()
+    get_cart_store().set(get_cart_id(create=True), product_id, quantity)
+    return _cart_response('Cart updated')
+
+@cart_bp.route('/cart/items/<int:product_id>', methods=['DELETE'])
 @cart_bp.route('/remove-from-cart/<int:item_id>', methods=['POST'])
-def remove_from_cart(item_id):
-    # Remove item from cart
-    if 'cart' in session:
-        session['cart'] = [item for item in session['cart'] if item.get('id') != item_id]
-        session.modified = True
-    
-    return jsonify({'success': True, 'message': 'Item removed from cart'})
+def remove_from_cart(product_id=None, item_id=None):
+    migrate_session_cart()
+    cart_id = get_cart_id()
+    if cart_id is not None:
+        get_cart_store().remove(cart_id, product_id if product_id is not None else item_id)
+    return _cart_response('Item removed from cart')
+
+@cart_bp.route('/cart/items', methods=['DELETE'])
+def clear_items():
+    migrate_session_cart()
+    clear_cart()
+    return _cart_response('Cart cleared')
+
+@cart_bp.route('/sync-cart', methods=['POST'])
+def sync_cart():
+    """Replace the server-side cart with the browser's copy.
+
+    Only used to recover when delta updates were lost; normal edits go
+    through the /cart/items endpoints.
+    """
+    data = _json_object()
+    cart_items = data.get('cart_items', []) if data is not None else None
+    if not _is_item_list(cart_items):
+        return _error('cart_items must be a list of {id, quantity} objects')
+
+    skipped = replace_cart(cart_items)
+    return _cart_response('Cart synced successfully', skipped=skipped)
+
+@cart_bp.route('/api/quote', methods=['GET', 'POST'])
+def api_quote():
+    """Price a cart with a coupon and shipping method.
+
+    POST {items: [{id, quantity}], coupon, shipping_method} prices the given
+    items; GET prices the visitor's server-side cart from query arguments.
+    """
+    if request.method == 'POST':
+        data = _json_object()
+        if data is None:
+            return _error('Expected a JSON object')
+        items = data.get('items')
+        if items is None:
+            items = load_cart()
+        elif not _is_item_list(items):
+            return _error('items must be a list of {id, quantity} objects')
+        pairs = [(as_int(item.get('id')), as_int(item.get('quantity', 1)) or 0) for item in items]
+    else:
+        data = request.args
+        pairs = [(item['id'], item['quantity']) for item in load_cart()]
+
+    try:
+        result = quote(pairs, data.get('coupon'), data.get('shipping_method'))
+    except PricingError as e:
+        return _error(str(e))
+    return jsonify({'success': True, 'quote': result.to_json()})
@@ -1,41 +1,63 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from datetime import datetime
-import json
+import time
+
+from services.cart_store import load_cart, clear_cart
+from services.order_store import get_order_store, get_customer_id, migrate_session_orders, order_placed, ORDERS_PAGE_SIZE
+from services.pricing import quote_cart, PricingError
+from services.inventory import get_inventory, OutOfStock
+from services.catalog import get_catalog
+from services.idempotency import allow_retry, idempotent, new_key
+from services.rate_limit import Limit, rate_limit
 
 checkout_bp = Blueprint('checkout', __name__)
 
+# Generous enough for retries and several orders, tight enough to stop scripted floods
+CHECKOUT_LIMITS = (Limit('ip', 30, 600), Limit('session', 10, 600))
+
+def out_of_stock_message(e):
+    product = get_catalog().get(e.product_id)
+    name = product['name'] if product else 'an item in your cart'
+    if e.available > 0:
+        return f'Sorry, only {e.available} of {name} left in stock. Please update your cart.'
+    return f'Sorry, {name} is out of stock. Please remove it from your cart.'
+
 @checkout_bp.route('/checkout')
 def checkout():
-    # Get cart items from session (in a real app you'd get from database based on user)
-    cart_items = session.get('cart', [])
+    cart_items = load_cart()
     
-    # If session cart is empty, redirect back to cart with message
+    # If cart is empty, redirect back to cart with message
     if not cart_items:
         flash('Your cart is empty. Please add some items before checkout.', 'warning')
         return redirect(url_for('cart.cart'))
     
-    # Calculate totals
-    subtotal = sum(item.get('price', 0) * item.get('quantity', 1) for item in cart_items)
-    shipping_cost = 0 if subtotal >= 50 else 9.99  # Free shipping over $50
-    tax_rate = 0.08  # 8% tax
-    tax_amount = subtotal * tax_rate
-    total = subtotal + shipping_cost + tax_amount
+    # Coupon and shipping method chosen on the cart page
+    try:
+        order_quote = quote_cart(cart_items, request.args.get('coupon'), request.args.get('shipping_method'))
+    except PricingError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('cart.cart'))
     
-    order_summary = {
-        'subtotal': subtotal,
-        'shipping_cost': shipping_cost,
-        'tax_amount': tax_amount,
-        'total': total,
-        'items_count': sum(item.get('quantity', 1) for item in cart_items)
-    }
+    # Warn about shortages now, but hold nothing: anyone (or any crawler) can open this page,
+    # so stock is only reserved when the order is placed
+    inventory = get_inventory()
+    for item in cart_items:
+        available = inventory.available(item['id'])
+        if available is not None and available < item['quantity']:
+            flash(out_of_stock_message(OutOfStock(item['id'], item['quantity'], available)), 'warning')
+            return redirect(url_for('cart.cart'))
     
     return render_template('checkout/checkout.html', 
                          title="Checkout - Green Bean", 
                          cart_items=cart_items, 
-                         order_summary=order_summary)
+                         order_summary=order_quote.summary(),
+                         idempotency_key=new_key())
 
 @checkout_bp.route('/checkout/process', methods=['POST'])
+@idempotent
+@rate_limit(*CHECKOUT_LIMITS)
 def process_checkout():
+    saved = False
     try:
         # Get form data
         form_data = request.get_json() if request.is_json else request.form
@@ -55,8 +77,8 @@ def process_checkout():
             'billing_same_as_shipping': form_data.get('billing_same_as_shipping', 'on') == 'on'
         }
         
-        # Get cart items
-        cart_items = session.get('cart', [])
+        # Get cart items, priced from the catalog
+        cart_items = load_cart()
         
         if not cart_items:
             if request.is_json:
@@ -64,40 +86,63 @@ def process_checkout():
             flash('Cart is empty', 'error')
             return redirect(url_for('cart.cart'))
         
-        # Calculate totals
-        subtotal = sum(item.get('price', 0) * item.get('quantity', 1) for item in cart_items)
-        shipping_cost = 0 if subtotal >= 50 else 9.99
-        tax_amount = subtotal * 0.08
-        total = subtotal + shipping_cost + tax_amount
+        # Reprice from the catalog; nothing the client sent is trusted
+        try:
+            order_quote = quote_cart(cart_items, form_data.get('coupon'), form_data.get('shipping_method'))
+        except PricingError as e:
+            if request.is_json:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            flash(str(e), 'warning')
+            return redirect(url_for('cart.cart'))
+        
+        # Reserve the cart as it is now, then sell it
+        inventory = get_inventory()
+        lines = [(item['id'], item['quantity']) for item in cart_items]
+        try:
+            reservation_id = inventory.reserve(lines)
+        except OutOfStock as e:
+            if request.is_json:
+                return jsonify({'success': False, 'message': out_of_stock_message(e)}), 409
+            flash(out_of_stock_message(e), 'warning')
+            return redirect(url_for('cart.cart'))
         
-        # Generate order ID
-        order_id = f"GB{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        order_store = get_order_store()
+        order_id = order_store.next_order_id()
         
         # Create order record
         order_data = {
             'order_id': order_id,
             'customer_info': customer_info,
             'items': cart_items,
-            'order_summary': {
-                'subtotal': subtotal,
-                'shipping_cost': shipping_cost,
-                'tax_amount': tax_amount,
-                'total': total
-            },
+            'order_summary': order_quote.summary(),
             'order_date': datetime.now().isoformat(),
+            'created_at': time.time(),
             'status': 'confirmed',
             'payment_method': form_data.get('payment_method', 'credit_card')
         }
         
-        # Store order in session (in production, save to database)
-        if 'orders' not in session:
-            session['orders'] = []
-        session['orders'].append(order_data)
-        session.modified = True
+        # Take the stock first, so once the order is saved nothing is left that can fail it
+        try:
+            inventory.commit(reservation_id)
+        except BaseException:
+            inventory.release(reservation_id)
+            raise
+        # Returns once the order is committed
+        try:
+            order_store.save(order_data, get_customer_id(create=True))
+        except BaseException:
+            inventory.restock(lines)
+            raise
+        saved = True
         
         # Clear cart
-        session['cart'] = []
-        session.modified = True
+        clear_cart()
+        
+        # Rankings and anything else interested in sales; the order stands even if one of them fails
+        try:
+            order_placed.send(order_data)
+        except Exception as e:
+            print(f"order_placed receiver failed for {order_id}: {e}")
         
         if request.is_json:
             return jsonify({
@@ -111,6 +156,9 @@ def process_checkout():
             return redirect(url_for('checkout.order_confirmation', order_id=order_id))
             
     except Exception as e:
+        # Until the order is saved nothing was sold, so a retry with the same idempotency key runs again
+        if not saved:
+            allow_retry()
         if request.is_json:
             return jsonify({'success': False, 'message': f'Error processing order: {str(e)}'})
         flash(f'Error processing order: {str(e)}', 'error')
@@ -118,9 +166,9 @@ def process_checkout():
 
 @checkout_bp.route('/order-confirmation/<order_id>')
 def order_confirmation(order_id):
-    # Find order in session
-    orders = session.get('orders', [])
-    order = next((o for o in orders if o['order_id'] == order_id), None)
+    migrate_session_orders()
+    customer_id = get_customer_id()
+    order = get_order_store().get(order_id, customer_id) if customer_id else None
     
     if not order:
         flash('Order not found', 'error')
@@ -132,8 +180,16 @@ def order_confirmation(order_id):
 
 @checkout_bp.route('/my-orders')
 def my_orders():
-    # Get all orders for the user
-    orders = session.get('orders', [])
+    # One page of this customer's orders, newest first
+    migrate_session_orders()
+    customer_id = get_customer_id()
+    orders, next_cursor, total = [], None, 0
+    if customer_id:
+        order_store = get_order_store()
+        orders, next_cursor = order_store.for_customer(customer_id, ORDERS_PAGE_SIZE, request.args.get('cursor'))
+        total = order_store.count_for_customer(customer_id)
     return render_template('checkout/my_orders.html', 
                          title="My Orders - Green Bean", 
-                         orders=orders)
\ No newline at end of file
+                         orders=orders,
+                         total_orders=total,
+                         next_url=url_for('checkout.my_orders', cursor=next_cursor) if next_cursor else None)
@@ -1,10 +1,16 @@
 from flask import Blueprint, render_template, request, jsonify, flash
+from services.rate_limit import Limit, rate_limit
 from services.telegram_bot import send_telegram_alert
+import html
 import re
 
 contact_bp = Blueprint('contact', __name__)
 
+# Each submission costs a Telegram message, so allow a handful per ten minutes
+CONTACT_LIMITS = (Limit('ip', 10, 600), Limit('session', 5, 600))
+
 @contact_bp.route('/contact', methods=['GET', 'POST'])
+@rate_limit(*CONTACT_LIMITS)
 def contact():
     if request.method == 'POST':
         # Handle form submission
@@ -29,20 +35,20 @@ def contact():
                     'message': 'Please enter a valid email address!'
                 }), 400
             
-            # Format message for Telegram
+            # Format message for Telegram; it is sent as HTML, so a stray < or & in the form would get it rejected
             telegram_message = f"""
 🌱 <b>New Contact Form Submission</b> 🌱
 
-👤 <b>Name:</b> {name}
-📧 <b>Email:</b> {email}
+👤 <b>Name:</b> {html.escape(name)}
+📧 <b>Email:</b> {html.escape(email)}
 
 💬 <b>Message:</b>
-{message}
+{html.escape(message)}
 
-⏰ <b>Received at:</b> {request.environ.get('HTTP_HOST', 'Unknown')}
+⏰ <b>Received at:</b> {html.escape(request.environ.get('HTTP_HOST', 'Unknown'))}
 """
             
-            # Send to Telegram
+            # Queue for Telegram; delivery happens on a background thread
             success = send_telegram_alert(telegram_message)
             
             if success:
@@ -1,8 +1,28 @@
 from flask import Blueprint, render_template
+from services.cache import cache_page
+from services.catalog import CATEGORY_NAMES
+from services.rankings import get_rankings, storefront_version
 
 home_bp = Blueprint('home', __name__)
 
+# Products in each of the home page's popular and new-arrival rows
+HOME_SECTION_SIZE = 4
+# Category cards in the featured section, in display order
+FEATURED_CATEGORIES = ('indoor', 'outdoor', 'accessories', 'pot')
+
 @home_bp.route('/')
 @home_bp.route('/home')
+@cache_page(storefront_version)
 def home():
-    return render_template('home/index.html', title="Green Garden - Home")
+    # Rankings are kept up to date as orders come in; nothing is aggregated here
+    rankings = get_rankings()
+    featured = []
+    for category in FEATURED_CATEGORIES:
+        best = rankings.popular(category, limit=1)
+        if best:
+            featured.append({'category': category, 'title': CATEGORY_NAMES.get(category, category.title()),
+                             'product': best[0]})
+    return render_template('home/index.html', title="Green Garden - Home",
+                           popular_products=rankings.popular(limit=HOME_SECTION_SIZE),
+                           new_arrivals=rankings.new(limit=HOME_SECTION_SIZE),
+                           featured_categories=featured)
@@ -1,71 +1,174 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, url_for, stream_with_context
+from flask.signals import before_render_template, template_rendered
+from services.cache import cache_page
+from services.catalog import get_catalog, CATEGORY_NAMES
+from services.rankings import get_rankings, storefront_version
+from services.suggest import suggest_cache, normalize, SUGGEST_COUNT, MAX_SUGGEST_COUNT, CATEGORY, PRODUCT
 
 shop_bp = Blueprint('shop', __name__)
 
+# Products per page; later pages are fetched from /shop/page as the user scrolls
+PAGE_SIZE = 9
+MAX_API_LIMIT = 100
+
+# Suggestions only change with the catalog, so browsers and proxies may reuse them briefly
+SUGGEST_MAX_AGE = 300
+
+# Bytes of rendered HTML collected before each streamed chunk is flushed
+STREAM_BUFFER_SIZE = 8192
+
+
+def _parse_price_range(value):
+    """Parse a 'low-high' price range, returning None if it is malformed"""
+    try:
+        low, high = value.split('-', 1)
+        return float(low or 0), float(high or 'inf')
+    except ValueError:
+        return None
+
+
+def _search_params(args):
+    """Translate query string arguments into SearchIndex.search keyword arguments"""
+    params = {
+        'query': args.get('q') or args.get('search') or '',
+        'categories': [c for c in args.getlist('category') if c and c != 'all'],
+        'price_ranges': [r for r in map(_parse_price_range, args.getlist('price')) if r],
+        'flag': args.get('flag') or None,
+        'sort': args.get('sort', 'featured'),
+        'cursor': args.get('cursor', type=int),
+    }
+
+    min_price = args.get('min_price', type=float)
+    max_price = args.get('max_price', type=float)
+    if min_price is not None or max_price is not None:
+        params['price_ranges'].append((min_price or 0, max_price if max_price is not None else float('inf')))
+
+    if args.get('flag') == 'rating':
+        params['min_rating'] = 5
+    elif args.get('min_rating'):
+        params['min_rating'] = args.get('min_rating', type=float)
+
+    return params
+
+
+def _product_json(product):
+    rankings = get_rankings()
+    return {
+        'id': product['id'],
+        'name': product['name'],
+        'price': product['price'],
+        'category': product['category'],
+        'rating': product.get('rating'),
+        'summary': product.get('summary') or product.get('description'),
+        'image': url_for('static', filename='images/' + product['image']),
+        'url': url_for('product.product_detail', product_id=product['id']),
+        'is_popular': rankings.is_popular(product),
+        'is_new': rankings.is_new(product),
+        'is_on_sale': bool(product.get('is_on_sale')),
+    }
+
+
+def _stream_template(template_name, **context):
+    """Render a template as a streamed response so the page head goes out first.
+
+    Sends the same signals as render_template, the second once the last
+    chunk is generated, so template metrics cover streamed pages too.
+    """
+    app = current_app._get_current_object()
+    template = app.jinja_env.get_template(template_name)
+    app.update_template_context(context)
+    before_render_template.send(app, template=template, context=context)
+    stream = template.stream(context)
+    # Jinja yields one string per template node; group them into sensible chunks
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+
+    def generate():
+        yield from stream
+        template_rendered.send(app, template=template, context=context)
+
+    return Response(stream_with_context(generate()), mimetype='text/html')
+
+
+def _render_listing(title, endpoint, **search):
+    catalog = get_catalog()
+    search['cursor'] = request.args.get('cursor', type=int)
+    products, total, next_cursor = catalog.search_index.search(limit=PAGE_SIZE, **search)
+
+    next_url = None
+    if next_cursor is not None:
+        next_url = url_for(endpoint, **{**request.args.to_dict(), **request.view_args, 'cursor': next_cursor})
+
+    return _stream_template('shop/all_product.html',
+                         title=title,
+                         products=products,
+                         total_products=total,
+                         next_cursor=next_cursor,
+                         next_url=next_url,
+                         search_query=search.get('query', ''),
+                         product_counts=catalog.category_counts,
+                         category_filter=(search.get('categories') or [None])[0])
+
 @shop_bp.route('/shop')
 @shop_bp.route('/products')
+@cache_page(storefront_version)
 def shop():
-    # Sample product data - matching actual available images
-    products = [
-        {"id": 1, "name": "Monstera Deliciosa", "price": 25.99, "category": "indoor", "image": "indoor/monstera.jpg", "rating": 5, "description": "The Monstera Deliciosa, also known as the Swiss Cheese Plant, is a stunning tropical houseplant famous for its unique split leaves.", "is_popular": True},
-        {"id": 2, "name": "Snake Plant", "price": 19.99, "category": "indoor", "image": "indoor/snake-plant.jpg", "rating": 5, "description": "The Snake Plant is the ultimate low-maintenance houseplant, perfect for beginners or busy plant parents.", "is_popular": True},
-        {"id": 3, "name": "Peace Lily", "price": 20.00, "category": "indoor", "image": "indoor/peace-lily.jpg", "rating": 4, "description": "The elegant Peace Lily is a graceful flowering houseplant that produces beautiful white blooms throughout the year."},
-        {"id": 4, "name": "Golden Pothos", "price": 18.00, "category": "indoor", "image": "indoor/golden_potho.jpg", "rating": 4, "description": "The Golden Pothos is a versatile trailing vine with heart-shaped leaves variegated in golden yellow."},
-        {"id": 5, "name": "Fiddle Leaf Fig", "price": 35.00, "category": "indoor", "image": "indoor/fiddle-leaf-fig.jpg", "rating": 4, "description": "The Fiddle Leaf Fig is a dramatic statement plant with large, violin-shaped glossy green leaves.", "is_new": True},
-        {"id": 6, "name": "ZZ Plant", "price": 24.00, "category": "indoor", "image": "indoor/ZZ_plants.jpg", "rating": 5, "description": "The ZZ Plant is virtually indestructible with its glossy, waxy leaves and remarkable drought tolerance."},
-        {"id": 7, "name": "Jade Plant", "price": 16.00, "category": "indoor", "image": "indoor/Jade Plant.jpg", "rating": 5, "description": "The Jade Plant is a beautiful succulent with thick, fleshy oval leaves that symbolize good luck.", "is_popular": True},
-        {"id": 8, "name": "Money Tree", "price": 28.00, "category": "indoor", "image": "indoor/money_tree.jpg", "rating": 4, "description": "The Money Tree features a distinctive braided trunk and palmate leaves, believed to bring good fortune."},
-        {"id": 9, "name": "Lavender", "price": 15.00, "category": "outdoor", "image": "outdoor/lavender.jpg", "rating": 5, "description": "Fragrant lavender is a beautiful perennial herb with silvery-green foliage and iconic purple flower spikes.", "is_popular": True},
-        {"id": 10, "name": "Rosemary", "price": 12.00, "category": "outdoor", "image": "outdoor/rosemary.jpg", "rating": 4, "description": "Rosemary is an aromatic evergreen herb with needle-like leaves and a pine-like fragrance."},
-        {"id": 11, "name": "Sunflower", "price": 18.00, "category": "outdoor", "image": "outdoor/sunflower.jpg", "rating": 5, "description": "Bright and cheerful sunflowers are annual plants that follow the sun throughout the day.", "is_new": True},
-        {"id": 12, "name": "Palm Tree", "price": 45.00, "category": "outdoor", "image": "outdoor/palm_tree.jpg", "rating": 4, "description": "This tropical palm brings exotic beauty to outdoor spaces with its fan-shaped or feathery fronds."},
-        {"id": 13, "name": "White Ceramic Pot", "price": 25.00, "category": "pot", "image": "pot/ceramic-pot-white.jpg", "rating": 4, "description": "This modern white ceramic pot features a clean, minimalist design that complements any plant.", "is_popular": True},
-        {"id": 14, "name": "Decorative Planter", "price": 32.00, "category": "pot", "image": "pot/Latitude_Run.jpg", "rating": 4, "description": "This elegant decorative planter features sophisticated styling perfect for modern homes.", "is_new": True},
-        {"id": 15, "name": "Garden Shears", "price": 24.00, "category": "accessories", "image": "accessories/Garden_Shears.jpg", "rating": 5, "description": "Professional-grade garden shears with sharp stainless steel blades and comfortable ergonomic handles.", "is_popular": True},
-        {"id": 16, "name": "Watering Can", "price": 35.00, "category": "accessories", "image": "accessories/Bloom_Pine_Watering_Can.jpg", "rating": 4, "description": "This elegant vintage-style watering can combines functionality with aesthetic appeal.", "is_on_sale": True},
-        {"id": 17, "name": "Gardening Gloves", "price": 15.00, "category": "accessories", "image": "accessories/Gardening_Gloves.jpg", "rating": 4, "description": "Durable and comfortable gardening gloves that protect your hands while maintaining dexterity."},
-        {"id": 18, "name": "Modern Planter Set", "price": 42.00, "category": "pot", "image": "pot/Stewart_Garden.jpg", "rating": 5, "description": "This contemporary planter set offers versatile styling for both indoor and outdoor use.", "is_new": True},
-    ]
-    return render_template('shop/all_product.html', title="Green Garden - Shop", products=products)
+    return _render_listing("Green Garden - Shop", 'shop.shop', query=request.args.get('search', ''))
 
 @shop_bp.route('/shop/category/<category>')
+@cache_page(storefront_version)
 def category(category):
-    # Sample product data - matching actual available images
-    all_products = [
-        {"id": 1, "name": "Monstera Deliciosa", "price": 25.99, "category": "indoor", "image": "indoor/monstera.jpg", "rating": 5, "description": "The Monstera Deliciosa, also known as the Swiss Cheese Plant, is a stunning tropical houseplant famous for its unique split leaves.", "is_popular": True},
-        {"id": 2, "name": "Snake Plant", "price": 19.99, "category": "indoor", "image": "indoor/snake-plant.jpg", "rating": 5, "description": "The Snake Plant is the ultimate low-maintenance houseplant, perfect for beginners or busy plant parents.", "is_popular": True},
-        {"id": 3, "name": "Peace Lily", "price": 20.00, "category": "indoor", "image": "indoor/peace-lily.jpg", "rating": 4, "description": "The elegant Peace Lily is a graceful flowering houseplant that produces beautiful white blooms throughout the year."},
-        {"id": 4, "name": "Golden Pothos", "price": 18.00, "category": "indoor", "image": "indoor/golden_potho.jpg", "rating": 4, "description": "The Golden Pothos is a versatile trailing vine with heart-shaped leaves variegated in golden yellow."},
-        {"id": 5, "name": "Fiddle Leaf Fig", "price": 35.00, "category": "indoor", "image": "indoor/fiddle-leaf-fig.jpg", "rating": 4, "description": "The Fiddle Leaf Fig is a dramatic statement plant with large, violin-shaped glossy green leaves.", "is_new": True},
-        {"id": 6, "name": "ZZ Plant", "price": 24.00, "category": "indoor", "image": "indoor/ZZ_plants.jpg", "rating": 5, "description": "The ZZ Plant is virtually indestructible with its glossy, waxy leaves and remarkable drought tolerance."},
-        {"id": 7, "name": "Jade Plant", "price": 16.00, "category": "indoor", "image": "indoor/Jade Plant.jpg", "rating": 5, "description": "The Jade Plant is a beautiful succulent with thick, fleshy oval leaves that symbolize good luck.", "is_popular": True},
-        {"id": 8, "name": "Money Tree", "price": 28.00, "category": "indoor", "image": "indoor/money_tree.jpg", "rating": 4, "description": "The Money Tree features a distinctive braided trunk and palmate leaves, believed to bring good fortune."},
-        {"id": 9, "name": "Lavender", "price": 15.00, "category": "outdoor", "image": "outdoor/lavender.jpg", "rating": 5, "description": "Fragrant lavender is a beautiful perennial herb with silvery-green foliage and iconic purple flower spikes.", "is_popular": True},
-        {"id": 10, "name": "Rosemary", "price": 12.00, "category": "outdoor", "image": "outdoor/rosemary.jpg", "rating": 4, "description": "Rosemary is an aromatic evergreen herb with needle-like leaves and a pine-like fragrance."},
-        {"id": 11, "name": "Sunflower", "price": 18.00, "category": "outdoor", "image": "outdoor/sunflower.jpg", "rating": 5, "description": "Bright and cheerful sunflowers are annual plants that follow the sun throughout the day.", "is_new": True},
-        {"id": 12, "name": "Palm Tree", "price": 45.00, "category": "outdoor", "image": "outdoor/palm_tree.jpg", "rating": 4, "description": "This tropical palm brings exotic beauty to outdoor spaces with its fan-shaped or feathery fronds."},
-        {"id": 13, "name": "White Ceramic Pot", "price": 25.00, "category": "pot", "image": "pot/ceramic-pot-white.jpg", "rating": 4, "description": "This modern white ceramic pot features a clean, minimalist design that complements any plant.", "is_popular": True},
-        {"id": 14, "name": "Decorative Planter", "price": 32.00, "category": "pot", "image": "pot/Latitude_Run.jpg", "rating": 4, "description": "This elegant decorative planter features sophisticated styling perfect for modern homes.", "is_new": True},
-        {"id": 15, "name": "Garden Shears", "price": 24.00, "category": "accessories", "image": "accessories/Garden_Shears.jpg", "rating": 5, "description": "Professional-grade garden shears with sharp stainless steel blades and comfortable ergonomic handles.", "is_popular": True},
-        {"id": 16, "name": "Watering Can", "price": 35.00, "category": "accessories", "image": "accessories/Bloom_Pine_Watering_Can.jpg", "rating": 4, "description": "This elegant vintage-style watering can combines functionality with aesthetic appeal.", "is_on_sale": True},
-        {"id": 17, "name": "Gardening Gloves", "price": 15.00, "category": "accessories", "image": "accessories/Gardening_Gloves.jpg", "rating": 4, "description": "Durable and comfortable gardening gloves that protect your hands while maintaining dexterity."},
-        {"id": 18, "name": "Modern Planter Set", "price": 42.00, "category": "pot", "image": "pot/Stewart_Garden.jpg", "rating": 5, "description": "This contemporary planter set offers versatile styling for both indoor and outdoor use.", "is_new": True},
-    ]
-    
-    # Filter products by category
-    filtered_products = [p for p in all_products if p['category'] == category]
-    
-    # Category display names
-    category_names = {
-        'indoor': 'Indoor Plants',
-        'outdoor': 'Outdoor Plants', 
-        'accessories': 'Accessories',
-        'pot': 'Pots & Planters'
-    }
-    
-    category_display = category_names.get(category, category.title())
-    
-    return render_template('shop/all_product.html', 
-                         title=f"Green Garden - {category_display}", 
-                         products=filtered_products,
-                         category_filter=category)
+    category_display = CATEGORY_NAMES.get(category, category.title())
+    return _render_listing(f"Green Garden - {category_display}", 'shop.category', categories=[category])
+
+@shop_bp.route('/shop/page')
+def products_page():
+    """Next page of product cards as an HTML fragment, for infinite scroll"""
+    params = _search_params(request.args)
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_API_LIMIT)
+
+    products, total, next_cursor = get_catalog().search_index.search(limit=limit, **params)
+    response = Response(render_template('components/product-grid-items.html', products=products), mimetype='text/html')
+    response.headers['X-Total-Count'] = str(total)
+    response.headers['X-Next-Cursor'] = '' if next_cursor is None else str(next_cursor)
+    return response
+
+@shop_bp.route('/api/products')
+def api_products():
+    """Search, filter and sort the catalog, one page at a time"""
+    params = _search_params(request.args)
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_API_LIMIT)
+
+    products, total, next_cursor = get_catalog().search_index.search(limit=limit, **params)
+    return jsonify({
+        'success': True,
+        'products': [_product_json(p) for p in products],
+        'total': total,
+        'next_cursor': next_cursor
+    })
+
+def _suggestion_json(kind, text, target):
+    if kind == CATEGORY:
+        url = url_for('shop.category', category=target)
+    elif kind == PRODUCT:
+        url = url_for('product.product_detail', product_id=target)
+    else:
+        url = url_for('shop.shop', search=target)
+    return {'type': kind, 'text': text, 'url': url}
+
+@shop_bp.route('/api/suggest')
+def api_suggest():
+    """Typeahead suggestions for the search boxes, best first"""
+    query = normalize(request.args.get('q', ''))
+    count = min(max(request.args.get('limit', SUGGEST_COUNT, type=int), 1), MAX_SUGGEST_COUNT)
+
+    catalog = get_catalog()
+    key = (catalog.version, query, count)
+    suggestions = suggest_cache.get(key)
+    if suggestions is None:
+        suggestions = [_suggestion_json(*entry) for entry in catalog.suggest_index.suggest(query, count)]
+        suggest_cache.set(key, suggestions)
+
+    response = jsonify({'query': query, 'suggestions': suggestions})
+    response.cache_control.public = True
+    response.cache_control.max_age = SUGGEST_MAX_AGE
+    return response
@@ -1 +1,14 @@
-# Services package
\ No newline at end of file
+# Services package
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Writable runtime state (spools, databases, caches) lives outside the source tree
+INSTANCE_DIR = os.environ.get('INSTANCE_DIR', os.path.join(BASE_DIR, 'instance'))
+
+
+def instance_path(*parts):
+    """Return a path inside the instance directory, creating the directory if needed"""
+    path = os.path.join(INSTANCE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
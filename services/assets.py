@@ -0,0 +1,202 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped; gzip still works
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+# Built assets go under static/<DIST_DIR>/ next to a manifest of their fingerprinted names
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+SOURCE_DIRS = ('css', 'js')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Static subdirectories whose file names carry a content hash
+IMMUTABLE_PREFIXES = (DIST_DIR + '/', 'derived/')
+
+# A whole-line call, optionally followed by a // comment; arguments holding a ';' are left alone
+_CONSOLE_CALL = re.compile(r'^\s*(?P<call>console\.(log|debug|info)\([^;]*\));\s*(//.*)?$')
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,])\s*')
+
+
+def strip_console_calls(source):
+    """Replace single-line console.log/debug/info statements with an empty statement.
+
+    An empty statement, not nothing, so an unbraced ``if (x) console.log(y);``
+    stays valid. Lines inside template literals are left alone.
+    """
+    lines = []
+    in_template = False
+    for line in source.split('\n'):
+        match = None if in_template else _CONSOLE_CALL.match(line)
+        if match and match['call'].count('(') == match['call'].count(')'):
+            line = ';'
+        if (line.count('`') - line.count('\\`')) % 2:
+            in_template = not in_template
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def minify_js(source):
+    source = strip_console_calls(source)
+    if rjsmin:
+        return rjsmin.jsmin(source)
+
+    # Without rjsmin: drop indentation, blank lines and whole-line comments but
+    # keep every line break, so automatic semicolon insertion is unaffected
+    lines = []
+    in_template = False
+    for line in source.split('\n'):
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        if (line.count('`') - line.count('\\`')) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def minify_css(source):
+    if rcssmin:
+        return rcssmin.cssmin(source)
+    source = _CSS_COMMENT.sub('', source)
+    source = _CSS_SPACE.sub(' ', source)
+    source = _CSS_PUNCTUATION.sub(r'\1', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_assets(static_folder, source_dirs=SOURCE_DIRS, compress=True):
+    """Minify, fingerprint and precompress static assets, returning the manifest.
+
+    Each file under static/<source_dirs> is written to static/dist/ with a
+    content hash in its name (js/cart.js -> dist/js/cart.1a2b3c4d.js), plus
+    .gz and .br siblings when compress is set. Files from earlier builds are
+    kept so pages cached by browsers can still load them.
+    """
+    dist_root = os.path.join(static_folder, DIST_DIR)
+    manifest = {}
+    for source_dir in source_dirs:
+        for root, _, files in os.walk(os.path.join(static_folder, source_dir)):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, static_folder).replace(os.sep, '/')
+                stem, ext = os.path.splitext(rel_path)
+
+                with open(path, 'rb') as f:
+                    data = f.read()
+                minify = MINIFIERS.get(ext)
+                if minify:
+                    data = minify(data.decode('utf-8')).encode('utf-8')
+
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                built_rel = f"{DIST_DIR}/{stem}.{digest}{ext}"
+                built_path = os.path.join(static_folder, built_rel)
+                os.makedirs(os.path.dirname(built_path), exist_ok=True)
+                if not os.path.exists(built_path):
+                    _write_atomic(built_path, data)
+                    if compress and ext in COMPRESSIBLE:
+                        _write_atomic(built_path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                        if brotli:
+                            _write_atomic(built_path + '.br', brotli.compress(data, quality=11))
+                manifest[rel_path] = built_rel
+
+    os.makedirs(dist_root, exist_ok=True)
+    _write_atomic(os.path.join(dist_root, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def init_app(app):
+    """Serve built assets: rewrite static URLs through the manifest and send
+    precompressed, immutable responses for fingerprinted files.
+    """
+    manifest = load_manifest(app.static_folder)
+    app.extensions['asset_manifest'] = manifest
+
+    if manifest and not os.environ.get('ASSETS_DEBUG'):
+        @app.url_defaults
+        def fingerprint_static_urls(endpoint, values):
+            if endpoint == 'static':
+                built = manifest.get(values.get('filename'))
+                if built:
+                    values['filename'] = built
+
+    serve_static = app.view_functions['static']
+
+    def static(filename):
+        if not filename.startswith(IMMUTABLE_PREFIXES):
+            return serve_static(filename=filename)
+
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if _accepts(encoding) and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype,
+                                               max_age=31536000)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, max_age=31536000)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+    app.view_functions['static'] = static
+    app.cli.add_command(assets_cli)
+
+
+assets_cli = AppGroup('assets', help='Build static assets.')
+
+
+@assets_cli.command('build')
+@click.option('--no-compress', is_flag=True, help='Skip the .gz/.br variants.')
+def build_command(no_compress):
+    """Minify, fingerprint and precompress static/css and static/js"""
+    manifest = build_assets(current_app.static_folder, compress=not no_compress)
+    click.echo(f"Built {len(manifest)} assets into {os.path.join(current_app.static_folder, DIST_DIR)}")
+    if brotli is None:
+        click.echo("brotli is not installed; only .gz variants were written")
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, current_app, request, session
+
+PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 512))
+# Seconds a cached page is served before it is rendered again; 0 disables the page cache
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', 300))
+
+
+class LRUCache:
+    """Thread-safe mapping bounded by entry count, with an optional per-entry TTL"""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+
+_MISSING = object()
+
+
+class CachedPage:
+    __slots__ = ('body', 'status', 'headers', 'etag')
+
+    def __init__(self, body, status, headers):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.etag = hashlib.sha1(body).hexdigest()
+
+
+# Rendered catalog pages; cleared whenever the catalog is replaced
+page_cache = LRUCache(PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_TTL)
+
+# Per-response headers that must not be replayed from the cache
+_UNCACHED_HEADERS = {'set-cookie', 'content-length', 'etag', 'vary', 'x-cache'}
+
+
+def _page_key(version):
+    return (request.endpoint,
+            tuple(sorted((request.view_args or {}).items())),
+            tuple(sorted(request.args.items(multi=True))),
+            version)
+
+
+def _respond(page, cache_status):
+    response = Response(page.body, status=page.status, headers=page.headers)
+    response.set_etag(page.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Cache'] = cache_status
+    return response.make_conditional(request)
+
+
+def cache_page(version):
+    """Serve a GET view from page_cache, keyed by its arguments and version().
+
+    version is called per request and should change whenever the content
+    the view renders from changes (e.g. the catalog version). The cache is
+    bypassed when the session has pending flash messages, and a render that
+    reads the session is never stored, since its output is per-visitor.
+    Streamed responses are passed through to the client and stored once the
+    stream completes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not PAGE_CACHE_TTL or request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            key = _page_key(version())
+            page = page_cache.get(key)
+            if page is not None:
+                return _respond(page, 'HIT')
+
+            sess = session._get_current_object()
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _UNCACHED_HEADERS]
+
+            def store(body):
+                if sess.accessed:
+                    return
+                page_cache.set(key, CachedPage(body, response.status_code, headers))
+
+            if response.is_streamed:
+                response.response = _tee(response.response, store)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+
+            page = CachedPage(response.get_data(), response.status_code, headers)
+            store(page.body)
+            return _respond(page, 'MISS')
+        return wrapper
+    return decorator
+
+
+def _tee(chunks, store):
+    """Yield chunks through to the client, handing the full body to store() at the end"""
+    body = []
+    try:
+        for chunk in chunks:
+            body.append(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+    # Only reached if the client read the whole page
+    store(b''.join(body))
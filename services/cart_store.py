@@ -0,0 +1,262 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask import session, url_for
+
+from services import instance_path
+from services.catalog import get_catalog
+from services.sqlite import SQLiteStore
+
+CART_STORE = os.environ.get('CART_STORE', 'sqlite')
+CART_DB_PATH = os.environ.get('CART_DB_PATH') or instance_path('carts.sqlite3')
+
+MAX_QUANTITY = 99
+# Carts untouched for this long are dropped
+CART_TTL = 30 * 24 * 3600
+# In-process backend: number of carts kept before the least recently used is evicted
+MEMORY_MAX_CARTS = 10000
+
+
+def _clamp(quantity):
+    return max(0, min(MAX_QUANTITY, int(quantity)))
+
+
+class MemoryCartStore:
+    """Carts held in this process only; fine for a single worker or development"""
+
+    def __init__(self, max_carts=MEMORY_MAX_CARTS, ttl=CART_TTL):
+        self.max_carts = max_carts
+        self.ttl = ttl
+        self._carts = OrderedDict()  # cart_id -> (updated_at, {product_id: quantity})
+        self._lock = threading.Lock()
+
+    def _cart(self, cart_id, create=False):
+        entry = self._carts.get(cart_id)
+        if entry and time.time() - entry[0] > self.ttl:
+            del self._carts[cart_id]
+            entry = None
+        if entry is None:
+            if not create:
+                return None
+            entry = (time.time(), {})
+        else:
+            entry = (time.time(), entry[1])
+        self._carts[cart_id] = entry
+        self._carts.move_to_end(cart_id)
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+        return entry[1]
+
+    def get(self, cart_id):
+        with self._lock:
+            items = self._cart(cart_id)
+            return list(items.items()) if items else []
+
+    def add(self, cart_id, product_id, quantity=1):
+        with self._lock:
+            items = self._cart(cart_id, create=True)
+            items[product_id] = _clamp(items.get(product_id, 0) + quantity)
+            if not items[product_id]:
+                del items[product_id]
+
+    def set(self, cart_id, product_id, quantity):
+        with self._lock:
+            items = self._cart(cart_id, create=True)
+            quantity = _clamp(quantity)
+            if quantity:
+                items[product_id] = quantity
+            else:
+                items.pop(product_id, None)
+
+    def remove(self, cart_id, product_id):
+        self.set(cart_id, product_id, 0)
+
+    def replace(self, cart_id, items):
+        with self._lock:
+            cart = self._cart(cart_id, create=True)
+            cart.clear()
+            for product_id, quantity in items:
+                quantity = _clamp(cart.get(product_id, 0) + quantity)
+                if quantity:
+                    cart[product_id] = quantity
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+
+class SQLiteCartStore(SQLiteStore):
+    """Carts in a local SQLite database, shared by every worker on the host"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cart_items (
+            cart_id TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            added_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (cart_id, product_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS cart_items_updated ON cart_items (updated_at);
+    """
+
+    def __init__(self, path=CART_DB_PATH, ttl=CART_TTL):
+        super().__init__(path)
+        self.ttl = ttl
+
+    def get(self, cart_id):
+        rows = self.conn.execute(
+            'SELECT product_id, quantity FROM cart_items WHERE cart_id = ? AND updated_at > ? ORDER BY added_at',
+            (cart_id, time.time() - self.ttl)).fetchall()
+        return rows
+
+    def add(self, cart_id, product_id, quantity=1):
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT INTO cart_items (cart_id, product_id, quantity, added_at, updated_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (cart_id, product_id) DO UPDATE SET '
+                'quantity = MAX(0, MIN(?, quantity + ?)), updated_at = excluded.updated_at',
+                (cart_id, product_id, _clamp(quantity), now, now, MAX_QUANTITY, int(quantity)))
+            conn.execute('DELETE FROM cart_items WHERE cart_id = ? AND product_id = ? AND quantity <= 0',
+                         (cart_id, product_id))
+            self._touch(cart_id, now)
+
+    def set(self, cart_id, product_id, quantity):
+        now = time.time()
+        quantity = _clamp(quantity)
+        with self.transaction() as conn:
+            if quantity:
+                conn.execute(
+                    'INSERT INTO cart_items (cart_id, product_id, quantity, added_at, updated_at) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (cart_id, product_id) DO UPDATE SET '
+                    'quantity = excluded.quantity, updated_at = excluded.updated_at',
+                    (cart_id, product_id, quantity, now, now))
+            else:
+                conn.execute('DELETE FROM cart_items WHERE cart_id = ? AND product_id = ?', (cart_id, product_id))
+            self._touch(cart_id, now)
+
+    def remove(self, cart_id, product_id):
+        self.set(cart_id, product_id, 0)
+
+    def replace(self, cart_id, items):
+        now = time.time()
+        merged = OrderedDict()
+        for product_id, quantity in items:
+            merged[product_id] = _clamp(merged.get(product_id, 0) + quantity)
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM cart_items WHERE cart_id = ?', (cart_id,))
+            conn.executemany(
+                'INSERT INTO cart_items (cart_id, product_id, quantity, added_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(cart_id, product_id, quantity, now + i * 1e-6, now)
+                 for i, (product_id, quantity) in enumerate(merged.items()) if quantity])
+
+    def clear(self, cart_id):
+        self.conn.execute('DELETE FROM cart_items WHERE cart_id = ?', (cart_id,))
+
+    def purge_expired(self):
+        """Delete carts nobody has touched within the TTL"""
+        return self.conn.execute('DELETE FROM cart_items WHERE updated_at <= ?', (time.time() - self.ttl,)).rowcount
+
+    def _touch(self, cart_id, now):
+        # Any change keeps the whole cart alive, not just the edited line
+        self.conn.execute('UPDATE cart_items SET updated_at = ? WHERE cart_id = ?', (now, cart_id))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_cart_store():
+    """Return the configured cart backend (CART_STORE=sqlite or memory)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if CART_STORE == 'memory':
+                    _store = MemoryCartStore()
+                elif CART_STORE == 'sqlite':
+                    _store = SQLiteCartStore()
+                else:
+                    raise ValueError(f"Unknown CART_STORE backend: {CART_STORE!r}")
+    return _store
+
+
+def get_cart_id(create=False):
+    """Opaque cart id kept in the session cookie; the cart itself stays server-side"""
+    cart_id = session.get('cart_id')
+    if cart_id is None and create:
+        cart_id = session['cart_id'] = secrets.token_urlsafe(16)
+    return cart_id
+
+
+def as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def migrate_session_cart():
+    """Move a cart left in the cookie by older versions into the store"""
+    legacy = session.pop('cart', None)
+    if legacy:
+        replace_cart(legacy)
+
+
+def load_cart():
+    """Current visitor's cart lines, priced and described from the catalog"""
+    migrate_session_cart()
+    cart_id = get_cart_id()
+    if cart_id is None:
+        return []
+
+    catalog = get_catalog()
+    items = []
+    for product_id, quantity in get_cart_store().get(cart_id):
+        product = catalog.get(product_id)
+        if product is None:
+            continue  # dropped from the catalog since it was added
+        items.append({
+            'id': product['id'],
+            'name': product['name'],
+            'price': product['price'],
+            'quantity': quantity,
+            'category': product['category'],
+            'image': url_for('static', filename='images/' + product['image']),
+        })
+    return items
+
+
+def cart_item_count():
+    cart_id = get_cart_id()
+    if cart_id is None:
+        return 0
+    return sum(quantity for _, quantity in get_cart_store().get(cart_id))
+
+
+def replace_cart(cart_items):
+    """Replace the whole cart from a list of {'id', 'quantity'} dicts.
+
+    Returns the ids that are not in the catalog and were skipped.
+    """
+    session.pop('cart', None)
+    catalog = get_catalog()
+    items, skipped = [], []
+    for item in cart_items:
+        product_id = as_int(item.get('id'))
+        if product_id is None or catalog.get(product_id) is None:
+            skipped.append(item.get('id'))
+            continue
+        items.append((product_id, as_int(item.get('quantity', 1)) or 0))
+    get_cart_store().replace(get_cart_id(create=True), items)
+    return skipped
+
+
+def clear_cart():
+    cart_id = get_cart_id()
+    if cart_id is not None:
+        get_cart_store().clear(cart_id)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+
+from blinker import Namespace
+
+from services import BASE_DIR
+from services.related import RelatedIndex
+from services.search import SearchIndex
+from services.suggest import SuggestIndex
+
+CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(BASE_DIR, 'data', 'catalog.jsonl'))
+
+# Category display names
+CATEGORY_NAMES = {
+    'indoor': 'Indoor Plants',
+    'outdoor': 'Outdoor Plants',
+    'accessories': 'Accessories',
+    'pot': 'Pots & Planters'
+}
+
+# Boolean product flags that get their own index
+FLAGS = ('is_popular', 'is_new', 'is_on_sale')
+
+# Sent with the new catalog as sender each time a reloaded catalog replaces the current one
+catalog_loaded = Namespace().signal('catalog-loaded')
+
+
+class Catalog:
+    """Read-only product catalog with lookup indexes built once at load time"""
+
+    def __init__(self, products, version=None, source_stat=None):
+        self.products = products
+        self.version = version
+        # (mtime_ns, size) of the file it was read from, to notice when that file is replaced
+        self.source_stat = source_stat
+        self.by_id = {}
+        self.by_category = {}
+        self.by_flag = {flag: [] for flag in FLAGS}
+
+        for product in products:
+            self.by_id[product['id']] = product
+            self.by_category.setdefault(product['category'], []).append(product)
+            for flag in FLAGS:
+                if product.get(flag):
+                    self.by_flag[flag].append(product)
+
+        self.category_counts = {category: len(items) for category, items in self.by_category.items()}
+        self.category_counts['total'] = len(products)
+
+        self.search_index = SearchIndex(products, self.by_category, self.by_flag)
+        self.related_index = RelatedIndex(products, self.by_category)
+        self.suggest_index = SuggestIndex(products, self.by_category, CATEGORY_NAMES, self.search_index.postings)
+
+    def __len__(self):
+        return len(self.products)
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+    def in_category(self, category):
+        return self.by_category.get(category, [])
+
+    def flagged(self, flag):
+        return self.by_flag.get(flag, [])
+
+    def related(self, product_id):
+        """The products precomputed as related to product_id, best first"""
+        return [self.by_id[related_id] for related_id in self.related_index.get(product_id)]
+
+
+def read_products(path):
+    """Read one product per line from a JSONL catalog file"""
+    products = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                products.append(json.loads(line))
+    return products
+
+
+def file_stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_catalog(path=None):
+    """Load the catalog file and build its indexes"""
+    path = path or CATALOG_PATH
+    # Taken first, so a file replaced while it is being read is noticed again later
+    source_stat = file_stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return Catalog(read_products(path), version=digest.hexdigest()[:12], source_stat=source_stat)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the process-wide catalog, loading it on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = load_catalog()
+    return _catalog
+
+
+def reload_catalog(path=None):
+    """Build a catalog from the file, then make it current in one step.
+
+    Requests keep using the old catalog, indexes and all, until the new one
+    is complete; a file that fails to load leaves the old one in place.
+    """
+    global _catalog
+    catalog = load_catalog(path)
+    with _catalog_lock:
+        _catalog = catalog
+    catalog_loaded.send(catalog)
+    return catalog
+
+
+def catalog_version():
+    """Version of the loaded catalog, for keying anything rendered from it"""
+    return get_catalog().version
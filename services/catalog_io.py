@@ -0,0 +1,299 @@
+import csv
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+import click
+from flask.cli import AppGroup
+
+from services.cache import page_cache
+from services.catalog import CATALOG_PATH, catalog_loaded, file_stat, get_catalog, load_catalog, reload_catalog
+from services.pricing import quote_cache
+from services.suggest import suggest_cache
+from services.template_cache import fragment_cache
+
+# Seconds between checks of the catalog file for a newer version; 0 turns hot reload off
+CATALOG_WATCH_INTERVAL = float(os.environ.get('CATALOG_WATCH_INTERVAL', 5))
+
+# CSV columns, in export order; JSONL keeps every field a product has
+FIELDS = ('id', 'name', 'price', 'category', 'image', 'rating', 'summary', 'description',
+          'is_popular', 'is_new', 'is_on_sale', 'stock')
+REQUIRED_FIELDS = ('id', 'name', 'price', 'category', 'image')
+FORMATS = ('jsonl', 'csv')
+# Invalid rows reported before an import gives up
+MAX_REPORTED_ERRORS = 20
+
+_TRUE = {'1', 'true', 'yes', 'y', 'on'}
+_FALSE = {'', '0', 'false', 'no', 'n', 'off'}
+
+
+class CatalogError(ValueError):
+    """Raised when catalog rows cannot be imported; errors lists each bad row"""
+
+    def __init__(self, message, errors=()):
+        super().__init__(message)
+        self.errors = list(errors) or [message]
+
+
+def _row_error(number, message):
+    return CatalogError(f"Row {number}: {message}")
+
+
+def detect_format(path, default='jsonl'):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    return extension if extension in FORMATS else default
+
+
+def read_rows(f, fmt):
+    """Yield (row number, raw dict) from a text stream, one row at a time"""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(f), start=2):
+            yield number, {key: value for key, value in row.items() if key is not None}
+        return
+    for number, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise _row_error(number, f"invalid JSON ({e})")
+        if not isinstance(row, dict):
+            raise _row_error(number, "expected a JSON object")
+        yield number, row
+
+
+def _number(value, kind, field, number):
+    try:
+        result = kind(value)
+    except (TypeError, ValueError):
+        raise _row_error(number, f"{field} must be a number, got {value!r}")
+    if isinstance(result, float) and not math.isfinite(result):
+        raise _row_error(number, f"{field} must be finite")
+    return result
+
+
+def _flag(value, field, number):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise _row_error(number, f"{field} must be true or false, got {value!r}")
+
+
+def validate_product(row, number):
+    """Check one raw row and return it as a product dict with proper types.
+
+    CSV cells arrive as strings, so numbers and flags are converted; empty
+    optional cells are dropped. Fields other than FIELDS are kept as given.
+    """
+    product = {key: value for key, value in row.items() if value not in ('', None)}
+    for field in REQUIRED_FIELDS:
+        if field not in product:
+            raise _row_error(number, f"missing {field}")
+
+    product_id = _number(product['id'], int, 'id', number)
+    if product_id <= 0 or str(product['id']).strip() != str(product_id):
+        raise _row_error(number, f"id must be a positive whole number, got {product['id']!r}")
+    product['id'] = product_id
+
+    for field in ('name', 'category', 'image'):
+        product[field] = str(product[field]).strip()
+        if not product[field]:
+            raise _row_error(number, f"{field} is empty")
+
+    product['price'] = round(_number(product['price'], float, 'price', number), 2)
+    if product['price'] < 0:
+        raise _row_error(number, "price is negative")
+
+    if 'rating' in product:
+        product['rating'] = _number(product['rating'], float, 'rating', number)
+        if not 0 <= product['rating'] <= 5:
+            raise _row_error(number, "rating must be between 0 and 5")
+        if product['rating'].is_integer():
+            product['rating'] = int(product['rating'])
+
+    if 'stock' in product:
+        product['stock'] = _number(product['stock'], int, 'stock', number)
+        if product['stock'] < 0:
+            raise _row_error(number, "stock is negative")
+
+    for flag in ('is_popular', 'is_new', 'is_on_sale'):
+        product[flag] = _flag(product.get(flag), flag, number)
+    return product
+
+
+def import_catalog(source, fmt, target=None, check=False):
+    """Validate products from source and install them as the catalog file.
+
+    Rows are streamed to a temporary file beside target, so memory use does
+    not grow with the catalog; only the set of ids seen is kept. With check,
+    the indexes are then built from that file to prove it loads. The file
+    replaces target in one rename, so running workers see either the old
+    catalog or the complete new one. Raises CatalogError listing the first
+    invalid rows, and leaves target untouched, if any row is bad.
+    Returns the number of products imported.
+    """
+    target = target or CATALOG_PATH
+    directory = os.path.dirname(os.path.abspath(target))
+    fd, temp_path = tempfile.mkstemp(prefix='.catalog-', suffix='.jsonl', dir=directory)
+    try:
+        seen = set()
+        errors = []
+        with os.fdopen(fd, 'w', encoding='utf-8') as out:
+            rows = read_rows(source, fmt)
+            while len(errors) < MAX_REPORTED_ERRORS:
+                try:
+                    number, row = next(rows)
+                    product = validate_product(row, number)
+                    if product['id'] in seen:
+                        raise _row_error(number, f"duplicate id {product['id']}")
+                except StopIteration:
+                    break
+                except CatalogError as e:
+                    errors.append(str(e))
+                    continue
+                seen.add(product['id'])
+                out.write(json.dumps(product, ensure_ascii=False) + '\n')
+        if errors:
+            raise CatalogError(f"{len(errors)} invalid row(s); nothing was imported", errors)
+        if not seen:
+            raise CatalogError("No products in the source; nothing was imported")
+        if check:
+            load_catalog(temp_path)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return len(seen)
+
+
+def export_catalog(out, fmt, path=None):
+    """Write the catalog file to a text stream as JSONL or CSV, one product at a time"""
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, FIELDS, extrasaction='ignore', lineterminator='\n')
+        writer.writeheader()
+    count = 0
+    with open(path or CATALOG_PATH, 'r', encoding='utf-8') as f:
+        for number, product in read_rows(f, 'jsonl'):
+            if writer:
+                writer.writerow(product)
+            else:
+                out.write(json.dumps(product, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+class CatalogWatcher:
+    """Reloads the catalog in the background when its file is replaced.
+
+    Requests call check(), which looks at the file's mtime and size at most
+    once per interval. A change starts a reload thread that builds the new
+    catalog and its indexes while requests go on using the old one, then
+    swaps it in. A file that fails to load is logged and left alone until
+    it changes again.
+    """
+
+    def __init__(self, interval=CATALOG_WATCH_INTERVAL, path=None):
+        self.interval = interval
+        self.path = path or CATALOG_PATH
+        self.next_check = 0.0
+        self.failed_stat = None
+        self._reloading = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+        with self._lock:
+            if now < self.next_check or (self._reloading and self._reloading.is_alive()):
+                return
+            self.next_check = now + self.interval
+            try:
+                stat = file_stat(self.path)
+            except OSError:
+                return
+            if stat == get_catalog().source_stat or stat == self.failed_stat:
+                return
+            self._reloading = threading.Thread(target=self._reload, args=(stat,), name='catalog-reload',
+                                               daemon=True)
+            self._reloading.start()
+
+    def _reload(self, stat):
+        started = time.perf_counter()
+        try:
+            catalog = reload_catalog(self.path)
+        except Exception as e:
+            self.failed_stat = stat
+            print(f"Catalog reload failed, still serving version {get_catalog().version}: {e}")
+            return
+        print(f"Reloaded catalog version {catalog.version} ({len(catalog)} products) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+
+@catalog_loaded.connect
+def _clear_caches(catalog, **extra):
+    # Entries are keyed by catalog version, so none would be served again; free the memory now
+    for cache in (page_cache, fragment_cache, quote_cache, suggest_cache):
+        cache.clear()
+
+
+def init_app(app):
+    app.cli.add_command(catalog_cli)
+    if CATALOG_WATCH_INTERVAL > 0:
+        watcher = CatalogWatcher()
+        app.before_request(watcher.check)
+
+
+def _open(path, mode):
+    # newline='' so the csv module sees line endings inside quoted cells as written
+    if path == '-':
+        return nullcontext(click.get_text_stream('stdin' if mode == 'r' else 'stdout', encoding='utf-8'))
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+catalog_cli = AppGroup('catalog', help='Import and export the product catalog.')
+
+
+@catalog_cli.command('import')
+@click.argument('source', type=click.Path(allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Input format (default: from the file extension).')
+@click.option('--check', is_flag=True, help='Also build the indexes from the new file before installing it.')
+def import_command(source, fmt, check):
+    """Validate SOURCE (CSV or JSONL, - for stdin) and make it the catalog"""
+    fmt = fmt or detect_format(source)
+    started = time.perf_counter()
+    try:
+        with _open(source, 'r') as f:
+            count = import_catalog(f, fmt, check=check)
+    except CatalogError as e:
+        for error in e.errors:
+            click.echo(error, err=True)
+        raise click.ClickException(str(e))
+    click.echo(f"Imported {count} products into {CATALOG_PATH} in {time.perf_counter() - started:.1f}s; "
+               f"running workers pick it up within {CATALOG_WATCH_INTERVAL:g}s")
+
+
+@catalog_cli.command('export')
+@click.argument('destination', type=click.Path(allow_dash=True), default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Output format (default: from the file extension).')
+def export_command(destination, fmt):
+    """Write the catalog to DESTINATION (default: stdout) as CSV or JSONL"""
+    fmt = fmt or detect_format(destination)
+    with _open(destination, 'w') as f:
+        count = export_catalog(f, fmt)
+    if destination != '-':
+        click.echo(f"Exported {count} products to {destination}")
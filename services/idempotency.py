@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app, g, jsonify, request, session
+from flask.sessions import session_json_serializer
+
+from services import instance_path
+from services.sqlite import SQLiteStore
+
+IDEMPOTENCY_DB_PATH = os.environ.get('IDEMPOTENCY_DB_PATH') or instance_path('idempotency.sqlite3')
+
+HEADER = 'Idempotency-Key'
+FORM_FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 255
+
+# How long a finished request's response is kept for replay
+RESULT_TTL = 24 * 3600
+# A request still running after this long is assumed dead and its key can be taken over
+LEASE_SECONDS = 60
+# How long a duplicate waits for the original to finish before giving up with a 409
+WAIT_TIMEOUT = 30
+POLL_INTERVAL = 0.05
+# Expired keys are deleted once every this many claims
+PURGE_INTERVAL = 1000
+
+# Per-response headers that must not be replayed; the session is restored separately
+_UNSTORED_HEADERS = {'set-cookie', 'content-length', 'date'}
+
+
+class StoredResponse:
+    __slots__ = ('status', 'headers', 'body', 'session')
+
+    def __init__(self, status, headers, body, session):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.session = session
+
+
+class IdempotencyStore(SQLiteStore):
+    """Responses of finished requests by key, in SQLite so every worker sees them.
+
+    A key is first claimed as pending, with a lease, by the request that will
+    do the work. Duplicates arriving meanwhile see it pending and wait. Once
+    the work is done the response is stored against the key until RESULT_TTL
+    runs out. Each lookup is a single primary-key read.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            state TEXT NOT NULL,
+            status INTEGER,
+            headers TEXT,
+            body BLOB,
+            session TEXT,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idempotency_keys_expires ON idempotency_keys (expires_at);
+    """
+
+    def __init__(self, path=IDEMPOTENCY_DB_PATH):
+        super().__init__(path)
+        self._claims = 0
+
+    def claim(self, key, fingerprint):
+        """Try to take key for a new request.
+
+        Returns ('claimed', None) if the caller should do the work,
+        ('done', StoredResponse) if it has been done, ('pending', None) while
+        another request holds it, or ('mismatch', None) if the key was used
+        for a different request body.
+        """
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute(
+                'SELECT fingerprint, state, status, headers, body, session, expires_at '
+                'FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+            if row is None or row[6] <= now:
+                conn.execute(
+                    'INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, state, expires_at) '
+                    'VALUES (?, ?, ?, ?)', (key, fingerprint, 'pending', now + LEASE_SECONDS))
+                result = ('claimed', None)
+            elif row[0] != fingerprint:
+                result = ('mismatch', None)
+            elif row[1] == 'done':
+                result = ('done', StoredResponse(row[2], json.loads(row[3]), row[4], row[5]))
+            else:
+                result = ('pending', None)
+
+        self._claims += 1
+        if self._claims % PURGE_INTERVAL == 0:
+            self.purge_expired()
+        return result
+
+    def complete(self, key, stored, ttl=RESULT_TTL):
+        self.conn.execute(
+            'UPDATE idempotency_keys SET state = ?, status = ?, headers = ?, body = ?, session = ?, expires_at = ? '
+            'WHERE key = ?',
+            ('done', stored.status, json.dumps(stored.headers), stored.body, stored.session, time.time() + ttl, key))
+
+    def release(self, key):
+        """Forget a pending key so a retry runs the request again"""
+        self.conn.execute('DELETE FROM idempotency_keys WHERE key = ? AND state = ?', (key, 'pending'))
+
+    def purge_expired(self):
+        return self.conn.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IdempotencyStore()
+    return _store
+
+
+def new_key():
+    """A fresh key for a form to submit with, so resubmitting it is recognised"""
+    return secrets.token_urlsafe(16)
+
+
+def _request_key():
+    key = request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+    if key is None and request.is_json:
+        key = (request.get_json(silent=True) or {}).get(FORM_FIELD)
+    return key
+
+
+def _fingerprint():
+    payload = json.dumps([sorted(request.form.items(multi=True)), request.get_json(silent=True)],
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _error(message, status):
+    response = jsonify({'success': False, 'message': message})
+    response.status_code = status
+    return response
+
+
+def _replay(stored):
+    # Put the session back the way the original response left it (new customer id, flashes)
+    session.clear()
+    session.update(session_json_serializer.loads(stored.session))
+    response = Response(stored.body, status=stored.status, headers=stored.headers)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def allow_retry():
+    """Keep the current response from being replayed, for failures that are worth retrying"""
+    g.idempotency_retry = True
+
+
+def idempotent(view):
+    """Run a POST view at most once per Idempotency-Key.
+
+    The key comes from the Idempotency-Key header or an idempotency_key
+    form/JSON field, and is scoped to the visitor's cart. A repeat of a
+    finished request gets the stored response without running the view. A
+    repeat that arrives while the first is still running waits for it. The
+    same key with a different body is rejected with 422. Server errors,
+    429s and responses the view marked with allow_retry() are not stored,
+    so those can be retried. Requests without a key run as usual.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = _request_key()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error('Idempotency key is too long', 400)
+
+        scoped_key = f"{request.endpoint}:{session.get('cart_id', '')}:{key}"
+        fingerprint = _fingerprint()
+        store = get_idempotency_store()
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while True:
+            state, stored = store.claim(scoped_key, fingerprint)
+            if state == 'claimed':
+                break
+            if state == 'done':
+                return _replay(stored)
+            if state == 'mismatch':
+                return _error('Idempotency key was already used for a different request', 422)
+            if time.monotonic() >= deadline:
+                return _error('A request with this idempotency key is still in progress', 409)
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except BaseException:
+            store.release(scoped_key)
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429 or g.pop('idempotency_retry', False):
+            store.release(scoped_key)
+        else:
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _UNSTORED_HEADERS]
+            store.complete(scoped_key, StoredResponse(response.status_code, headers, response.get_data(),
+                                                      session_json_serializer.dumps(dict(session))))
+        return response
+    return wrapper
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # derivatives cannot be built; templates fall back to the originals
+    Image = ImageOps = None
+
+# Derivatives go under static/<DERIVED_DIR>/ next to a manifest describing them
+DERIVED_DIR = 'derived'
+MANIFEST_NAME = 'manifest.json'
+SOURCE_DIR = 'images'
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+WIDTHS = (320, 640, 960, 1280)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+
+# Product cards are a third of the row on desktop, half on tablets, full width on phones
+CARD_SIZES = '(min-width: 1200px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+
+def _content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def _save(image, path, fmt, **options):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    image.save(tmp_path, fmt, **options)
+    os.replace(tmp_path, path)
+
+
+def build_image(static_folder, rel_path, digest):
+    """Write every width and format of one image; runs in a worker process"""
+    with Image.open(os.path.join(static_folder, rel_path)) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA', 'P')
+        original = original.convert('RGBA' if has_alpha else 'RGB')
+        width, height = original.size
+
+        stem, ext = os.path.splitext(rel_path)
+        fallback_ext = '.png' if has_alpha else '.jpg'
+        entry = {'hash': digest, 'width': width, 'height': height, 'fallback': [], 'webp': []}
+
+        # Never upscale; the largest derivative is the original size if it is smaller than WIDTHS[-1]
+        widths = sorted({w for w in WIDTHS if w < width} | {min(width, WIDTHS[-1])})
+        for target in widths:
+            resized = original if target == width else original.resize(
+                (target, round(height * target / width)), Image.LANCZOS)
+            base = f"{DERIVED_DIR}/{stem}.{digest}.{target}"
+
+            fallback_path = base + fallback_ext
+            if has_alpha:
+                _save(resized, os.path.join(static_folder, fallback_path), 'PNG', optimize=True)
+            else:
+                _save(resized, os.path.join(static_folder, fallback_path), 'JPEG',
+                      quality=JPEG_QUALITY, optimize=True, progressive=True)
+            _save(resized, os.path.join(static_folder, base + '.webp'), 'WEBP', quality=WEBP_QUALITY, method=6)
+
+            entry['fallback'].append([target, fallback_path])
+            entry['webp'].append([target, base + '.webp'])
+    return rel_path, entry
+
+
+def build_derivatives(static_folder, workers=None, force=False):
+    """Generate resized JPEG/PNG and WebP copies of every image under static/images.
+
+    Images whose content hash matches the existing manifest are skipped, so
+    re-running after adding a product only processes the new image. Returns
+    (manifest, number of images built).
+    """
+    if Image is None:
+        raise click.ClickException("Pillow is required to build image derivatives: pip install Pillow")
+
+    manifest = load_manifest(static_folder)
+    jobs = []
+    seen = set()
+    for root, _, files in os.walk(os.path.join(static_folder, SOURCE_DIR)):
+        for name in sorted(files):
+            if not name.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            seen.add(rel_path)
+            digest = _content_hash(path)
+            entry = manifest.get(rel_path)
+            if not force and entry and entry['hash'] == digest and all(
+                    os.path.exists(os.path.join(static_folder, p)) for _, p in entry['fallback'] + entry['webp']):
+                continue
+            os.makedirs(os.path.join(static_folder, DERIVED_DIR, os.path.dirname(rel_path)), exist_ok=True)
+            jobs.append((rel_path, digest))
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build_image, static_folder, rel_path, digest) for rel_path, digest in jobs]
+            for future in futures:
+                rel_path, entry = future.result()
+                manifest[rel_path] = entry
+
+    # Drop entries for images that no longer exist
+    manifest = {path: entry for path, entry in manifest.items() if path in seen}
+    manifest_path = os.path.join(static_folder, DERIVED_DIR, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return manifest, len(jobs)
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DERIVED_DIR, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _srcset(variants):
+    return ', '.join(f"{url_for('static', filename=path)} {width}w" for width, path in variants)
+
+
+def responsive_image(filename, alt='', sizes=CARD_SIZES, lazy=True, **attrs):
+    """Render a <picture> with WebP and JPEG/PNG srcsets for a static image.
+
+    Falls back to a plain lazy-loaded <img> of the original when no
+    derivatives have been built. Extra keyword arguments become attributes
+    of the <img>; use class_ for the class attribute.
+    """
+    entry = current_app.extensions.get('image_manifest', {}).get(filename)
+
+    img_attrs = {'alt': alt}
+    if lazy:
+        img_attrs.update(loading='lazy', decoding='async')
+    for name, value in attrs.items():
+        img_attrs[name.rstrip('_').replace('_', '-')] = value
+
+    if entry is None:
+        img_attrs['src'] = url_for('static', filename=filename)
+        return Markup(_tag('img', img_attrs))
+
+    img_attrs.update(src=url_for('static', filename=entry['fallback'][-1][1]),
+                     srcset=_srcset(entry['fallback']), sizes=sizes,
+                     width=entry['width'], height=entry['height'])
+    source = _tag('source', {'type': 'image/webp', 'srcset': _srcset(entry['webp']), 'sizes': sizes})
+    return Markup(f"<picture>{source}{_tag('img', img_attrs)}</picture>")
+
+
+def _tag(name, attrs):
+    rendered = ' '.join(f'{key}="{escape(value)}"' for key, value in attrs.items() if value is not None)
+    return f"<{name} {rendered}>"
+
+
+def init_app(app):
+    app.extensions['image_manifest'] = load_manifest(app.static_folder)
+    app.jinja_env.globals['responsive_image'] = responsive_image
+    app.cli.add_command(images_cli)
+
+
+images_cli = AppGroup('images', help='Build responsive image derivatives.')
+
+
+@images_cli.command('build')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: one per CPU).')
+@click.option('--force', is_flag=True, help='Rebuild images even if they are unchanged.')
+def build_command(workers, force):
+    """Resize static/images into WebP and JPEG/PNG derivatives"""
+    manifest, built = build_derivatives(current_app.static_folder, workers=workers, force=force)
+    click.echo(f"Built {built} image(s); {len(manifest) - built} unchanged")
@@ -0,0 +1,240 @@
+import os
+import secrets
+import threading
+import time
+
+from services import instance_path
+from services.catalog import catalog_loaded, get_catalog
+from services.sqlite import SQLiteStore
+
+INVENTORY_DB_PATH = os.environ.get('INVENTORY_DB_PATH') or instance_path('inventory.sqlite3')
+# Stock given to catalog products that do not set their own "stock" field
+DEFAULT_STOCK = int(os.environ.get('INVENTORY_DEFAULT_STOCK', 100))
+# How long checkout holds stock for a visitor before it goes back on sale
+RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL', 15 * 60))
+# Seconds between sweeps for expired reservations
+SWEEP_INTERVAL = float(os.environ.get('INVENTORY_SWEEP_INTERVAL', 30))
+
+
+def _merge(items):
+    """Sum (product_id, quantity) pairs per product, in product order so writers lock rows alike"""
+    merged = {}
+    for product_id, quantity in items:
+        if quantity > 0:
+            merged[product_id] = merged.get(product_id, 0) + quantity
+    return sorted(merged.items())
+
+
+class OutOfStock(ValueError):
+    """Raised when a reservation asks for more than is available"""
+
+    def __init__(self, product_id, requested, available):
+        super().__init__(f"Only {available} left of product {product_id}")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+class ReservationExpired(LookupError):
+    """Raised when committing a reservation that expired or was already released"""
+
+
+class Inventory(SQLiteStore):
+    """Stock counts and reservations in a local SQLite database, shared by every worker on the host.
+
+    Every change is a conditional UPDATE inside a BEGIN IMMEDIATE transaction,
+    so concurrent checkouts across processes can never push reserved stock
+    above what is on hand. A reservation holds stock for RESERVATION_TTL
+    seconds. Committing it takes the stock off the shelf, and releasing it
+    (or letting it expire) puts the stock back.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS stock (
+            product_id INTEGER PRIMARY KEY,
+            on_hand INTEGER NOT NULL CHECK (on_hand >= 0),
+            reserved INTEGER NOT NULL DEFAULT 0 CHECK (reserved >= 0 AND reserved <= on_hand)
+        );
+        CREATE TABLE IF NOT EXISTS reservations (
+            reservation_id TEXT PRIMARY KEY,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS reservations_expires ON reservations (expires_at);
+        CREATE TABLE IF NOT EXISTS reservation_lines (
+            reservation_id TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (reservation_id, product_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS inventory_meta (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    # Checkouts of a hot product queue for the write lock; give them time
+    TIMEOUT = 30
+
+    def __init__(self, path=INVENTORY_DB_PATH):
+        super().__init__(path)
+        self._sweeper = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    # -- Stock levels --------------------------------------------------------
+
+    def seed(self, products, version=None, default=DEFAULT_STOCK):
+        """Give every product without a stock row its catalog "stock" (or default).
+
+        Existing counts are never overwritten, since they reflect sales. With
+        version, a catalog already seeded is skipped without touching its rows.
+        """
+        with self.transaction() as conn:
+            if version is not None:
+                row = conn.execute("SELECT value FROM inventory_meta WHERE name = 'seeded_version'").fetchone()
+                if row and row[0] == version:
+                    return
+            conn.executemany('INSERT OR IGNORE INTO stock (product_id, on_hand) VALUES (?, ?)',
+                             [(p['id'], max(0, int(p.get('stock', default)))) for p in products])
+            if version is not None:
+                conn.execute("INSERT OR REPLACE INTO inventory_meta (name, value) VALUES ('seeded_version', ?)",
+                             (version,))
+
+    def set_stock(self, product_id, on_hand):
+        """Set the stock on hand; fails if that is less than what is currently reserved"""
+        self.conn.execute(
+            'INSERT INTO stock (product_id, on_hand) VALUES (?, ?) '
+            'ON CONFLICT (product_id) DO UPDATE SET on_hand = excluded.on_hand', (product_id, on_hand))
+
+    def available(self, product_id):
+        """Stock on hand minus reservations; None for products that are not tracked"""
+        row = self.conn.execute('SELECT on_hand - reserved FROM stock WHERE product_id = ?', (product_id,)).fetchone()
+        return row[0] if row else None
+
+    # -- Reservations --------------------------------------------------------
+
+    def reserve(self, items, ttl=RESERVATION_TTL):
+        """Hold (product_id, quantity) pairs for ttl seconds and return the reservation id.
+
+        All lines are held or none are: the first line that cannot be met
+        raises OutOfStock and nothing is reserved. Products without a stock
+        row are not tracked and always succeed.
+        """
+        reservation_id = secrets.token_urlsafe(16)
+
+        with self.transaction() as conn:
+            for product_id, quantity in _merge(items):
+                updated = conn.execute(
+                    'UPDATE stock SET reserved = reserved + ? WHERE product_id = ? AND on_hand - reserved >= ?',
+                    (quantity, product_id, quantity)).rowcount
+                if not updated:
+                    row = conn.execute('SELECT on_hand - reserved FROM stock WHERE product_id = ?',
+                                       (product_id,)).fetchone()
+                    if row is not None:
+                        raise OutOfStock(product_id, quantity, row[0])
+                    continue
+                conn.execute('INSERT INTO reservation_lines (reservation_id, product_id, quantity) VALUES (?, ?, ?)',
+                             (reservation_id, product_id, quantity))
+            conn.execute('INSERT INTO reservations (reservation_id, expires_at) VALUES (?, ?)',
+                         (reservation_id, time.time() + ttl))
+        self._start_sweeper()
+        return reservation_id
+
+    def commit(self, reservation_id):
+        """Turn a reservation into a sale, taking its stock off hand.
+
+        Raises ReservationExpired if it has expired or was already
+        committed or released.
+        """
+        with self.transaction() as conn:
+            row = conn.execute('SELECT expires_at FROM reservations WHERE reservation_id = ?',
+                               (reservation_id,)).fetchone()
+            expired = row is None or row[0] <= time.time()
+            if expired:
+                if row is not None:
+                    self._release(conn, reservation_id)
+            else:
+                for product_id, quantity in self._lines(conn, reservation_id):
+                    conn.execute('UPDATE stock SET on_hand = on_hand - ?, reserved = reserved - ? '
+                                 'WHERE product_id = ?', (quantity, quantity, product_id))
+                self._forget(conn, reservation_id)
+        if expired:
+            raise ReservationExpired(reservation_id)
+
+    def release(self, reservation_id):
+        """Put a reservation's stock back on sale; releasing twice is harmless"""
+        with self.transaction() as conn:
+            self._release(conn, reservation_id)
+
+    def restock(self, items):
+        """Put sold (product_id, quantity) pairs back on hand, undoing a commit"""
+        with self.transaction() as conn:
+            conn.executemany('UPDATE stock SET on_hand = on_hand + ? WHERE product_id = ?',
+                             ((quantity, product_id) for product_id, quantity in _merge(items)))
+
+    def sweep(self):
+        """Release every expired reservation, returning how many there were"""
+        expired = [row[0] for row in self.conn.execute(
+            'SELECT reservation_id FROM reservations WHERE expires_at <= ?', (time.time(),))]
+        for reservation_id in expired:
+            self.release(reservation_id)
+        return len(expired)
+
+    def _lines(self, conn, reservation_id):
+        return conn.execute('SELECT product_id, quantity FROM reservation_lines WHERE reservation_id = ?',
+                            (reservation_id,)).fetchall()
+
+    def _release(self, conn, reservation_id):
+        if conn.execute('SELECT 1 FROM reservations WHERE reservation_id = ?', (reservation_id,)).fetchone() is None:
+            return
+        for product_id, quantity in self._lines(conn, reservation_id):
+            conn.execute('UPDATE stock SET reserved = reserved - ? WHERE product_id = ?', (quantity, product_id))
+        self._forget(conn, reservation_id)
+
+    def _forget(self, conn, reservation_id):
+        conn.execute('DELETE FROM reservation_lines WHERE reservation_id = ?', (reservation_id,))
+        conn.execute('DELETE FROM reservations WHERE reservation_id = ?', (reservation_id,))
+
+    # -- Background sweeper --------------------------------------------------
+
+    def _start_sweeper(self):
+        if self._pid == os.getpid() and self._sweeper.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._sweeper.is_alive():
+                return
+            self._pid = os.getpid()
+            self._sweeper = threading.Thread(target=self._sweep_forever, name='inventory-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Inventory sweep failed: {e}")
+
+
+_inventory = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory():
+    """Return the process-wide inventory, seeded with any products new in the current catalog"""
+    global _inventory
+    if _inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                inventory = Inventory()
+                catalog = get_catalog()
+                inventory.seed(catalog.products, catalog.version)
+                _inventory = inventory
+    return _inventory
+
+
+@catalog_loaded.connect
+def _seed_new_products(catalog, **extra):
+    # Products added by a catalog import get their starting stock; existing counts are kept
+    if _inventory is not None:
+        _inventory.seed(catalog.products, catalog.version)
@@ -0,0 +1,344 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+from flask import Response, request, template_rendered, before_render_template, g
+from flask.sessions import SecureCookieSessionInterface
+
+from services.cache import page_cache
+from services.pricing import quote_cache
+from services.suggest import suggest_cache
+from services.template_cache import fragment_cache
+
+# Seconds; the Prometheus client defaults, which suit page latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds between stack samples taken by the ?__profile profiler
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.0005))
+PROFILE_PARAM = '__profile'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named family of samples keyed by label values, rendered in Prometheus text format"""
+
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(list(zip(self.labelnames, key)), value))
+        return lines
+
+    def _samples(self, pairs, value):
+        return [f"{self.name}{_format_labels(pairs)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then the sum
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, pairs, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(counts[-1])}")
+        lines.append(f"{self.name}_count{_format_labels(pairs)} {cumulative}")
+        return lines
+
+
+class CacheStats:
+    """Exports hit/miss/size counters of LRUCache instances, read at scrape time"""
+
+    def __init__(self):
+        self.caches = {}
+        REGISTRY.append(self)
+
+    def register(self, name, cache):
+        self.caches[name] = cache
+
+    def render(self):
+        lines = []
+        for metric, kind, help, attr in (
+                ('cache_hits_total', 'counter', 'Cache lookups that found an entry.', 'hits'),
+                ('cache_misses_total', 'counter', 'Cache lookups that found nothing.', 'misses'),
+                ('cache_entries', 'gauge', 'Entries currently held.', '__len__')):
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+            for name, cache in sorted(self.caches.items()):
+                value = len(cache) if attr == '__len__' else getattr(cache, attr)
+                lines.append(f"{metric}{_format_labels([('cache', name)])} {value}")
+        return lines
+
+
+# Every metric renders itself into /metrics in registration order
+REGISTRY = []
+
+request_latency = Histogram('http_request_duration_seconds',
+                            'Time from receiving a request until its response body was sent.',
+                            ('blueprint', 'endpoint', 'method'))
+request_count = Counter('http_requests_total', 'Requests handled, by endpoint and status code.',
+                        ('blueprint', 'endpoint', 'method', 'status'))
+requests_in_flight = Gauge('http_requests_in_flight', 'Requests currently being handled.')
+template_latency = Histogram('template_render_duration_seconds', 'Time spent rendering a Jinja template.',
+                             ('template',))
+session_save_latency = Histogram('session_save_duration_seconds',
+                                 'Time spent serializing and signing the session cookie.')
+telegram_latency = Histogram('telegram_request_duration_seconds', 'Duration of one Telegram sendMessage call.',
+                             ('outcome',))
+cache_stats = CacheStats()
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault('_template_starts', []).append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    starts = g.get('_template_starts')
+    if starts:
+        template_latency.observe(time.perf_counter() - starts.pop(), template=template.name or '<string>')
+
+
+class TimedSessionInterface(SecureCookieSessionInterface):
+    def save_session(self, app, session, response):
+        with session_save_latency.time():
+            return super().save_session(app, session, response)
+
+
+def _folded(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class StackSampler:
+    """Samples one thread's Python stack on an interval into collapsed-stack counts.
+
+    The output is the folded format read by flamegraph.pl, speedscope and
+    most other flame graph tools: one ``frame;frame;frame count`` per line.
+    """
+
+    def __init__(self, thread_id, interval=PROFILER_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = _Tally()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_folded(frame)] += 1
+
+    def __enter__(self):
+        # The sampler needs the GIL to take a sample; by default a busy thread only gives it up every 5ms
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 10))
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class InstrumentedApp:
+    """WSGI middleware timing each request through to the last byte of its body.
+
+    The endpoint and blueprint are left in the environ by a before_request
+    hook, so the labels match the Flask routing. With PROFILER_ENABLED set,
+    a request carrying ?__profile is run under StackSampler and answered
+    with the folded profile instead of the page.
+    """
+
+    def __init__(self, app, wsgi_app):
+        self.app = app
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        if self.app.config.get('PROFILER_ENABLED') and PROFILE_PARAM in parse_qs(
+                environ.get('QUERY_STRING', ''), keep_blank_values=True):
+            return self._profile(environ, start_response)
+
+        start = time.perf_counter()
+        status = []
+
+        def capture_status(status_line, headers, exc_info=None):
+            status[:] = [status_line.split(' ', 1)[0]]
+            return start_response(status_line, headers, exc_info)
+
+        requests_in_flight.inc()
+        try:
+            body = self.wsgi_app(environ, capture_status)
+        except BaseException:
+            requests_in_flight.dec()
+            self._record(environ, '500', start)
+            raise
+        return _ClosingIterator(body, lambda: (requests_in_flight.dec(),
+                                               self._record(environ, status[0] if status else '500', start)))
+
+    def _record(self, environ, status, start):
+        labels = {'blueprint': environ.get('metrics.blueprint') or '',
+                  'endpoint': environ.get('metrics.endpoint') or 'unmatched',
+                  'method': environ.get('REQUEST_METHOD', '')}
+        request_latency.observe(time.perf_counter() - start, **labels)
+        request_count.inc(status=status, **labels)
+
+    def _profile(self, environ, start_response):
+        with StackSampler(threading.get_ident()) as sampler:
+            body = self.wsgi_app(environ, lambda *args, **kwargs: (lambda data: None))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                close = getattr(body, 'close', None)
+                if close:
+                    close()
+        path = environ.get('PATH_INFO', '/').strip('/').replace('/', '_') or 'index'
+        response = Response(sampler.folded(), mimetype='text/plain')
+        response.headers['Content-Disposition'] = f'attachment; filename="{path}-{int(time.time())}.folded"'
+        return response(environ, start_response)
+
+
+class _ClosingIterator:
+    def __init__(self, iterable, on_close):
+        self.iterable = iterable
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            close = getattr(self.iterable, 'close', None)
+            if close:
+                close()
+        finally:
+            self.on_close()
+
+
+def init_app(app):
+    """Instrument app and serve its metrics at /metrics.
+
+    Metrics are kept per process, so under several gunicorn workers each
+    scrape sees the worker that answered it.
+    """
+    app.config.setdefault('PROFILER_ENABLED', os.environ.get('PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes'))
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+
+    @app.before_request
+    def label_request():
+        request.environ['metrics.endpoint'] = request.endpoint
+        request.environ['metrics.blueprint'] = request.blueprint
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.session_interface = TimedSessionInterface()
+    cache_stats.register('page', page_cache)
+    cache_stats.register('fragment', fragment_cache)
+    cache_stats.register('quote', quote_cache)
+    cache_stats.register('suggest', suggest_cache)
+    app.wsgi_app = InstrumentedApp(app, app.wsgi_app)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,225 @@
+import json
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from blinker import Namespace
+from flask import session
+
+from services import instance_path
+from services.sqlite import SQLiteStore, transaction
+
+ORDER_DB_PATH = os.environ.get('ORDER_DB_PATH') or instance_path('orders.sqlite3')
+
+# Order numbers reserved from the database per round trip; a process that
+# exits early leaves a gap in the sequence but never reuses a number
+ID_BLOCK_SIZE = 50
+ORDER_ID_PREFIX = 'GB'
+
+# Writes queued within this window share a single commit
+GROUP_COMMIT_WINDOW = 0.002
+GROUP_COMMIT_MAX = 100
+
+ORDERS_PAGE_SIZE = 10
+
+# Sent with the order dict as sender once checkout has saved an order
+order_placed = Namespace().signal('order-placed')
+
+
+class OrderStore(SQLiteStore):
+    """Orders in a local SQLite database (WAL mode), shared by every worker on the host.
+
+    Lookups by order id use the primary key and a customer's history uses the
+    (customer_id, created_at) index. Writes are handed to a single writer
+    thread, which commits whatever has queued up together, so a burst of
+    checkouts costs one fsync instead of one each.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            customer_id TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            status TEXT NOT NULL,
+            total REAL NOT NULL,
+            data TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS orders_by_customer ON orders (customer_id, created_at, order_id);
+        CREATE TABLE IF NOT EXISTS id_blocks (
+            name TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        );
+    """
+
+    # Orders are money; a power cut must not lose one already acknowledged
+    SYNCHRONOUS = 'FULL'
+
+    def __init__(self, path=ORDER_DB_PATH, block_size=ID_BLOCK_SIZE):
+        super().__init__(path)
+        self.block_size = block_size
+        self._id_lock = threading.Lock()
+        self._next_id = self._id_limit = 0
+        self._id_pid = None
+        self._writes = None
+        self._writer = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    # -- Order ids -----------------------------------------------------------
+
+    def next_order_id(self):
+        """Return a new order id, unique across threads and processes.
+
+        Numbers are reserved in blocks (hi/lo), so only one request in
+        ID_BLOCK_SIZE touches the database. Ids increase within a process;
+        across processes they are unique but only roughly ordered.
+        """
+        with self._id_lock:
+            # A forked child must not hand out numbers from the parent's block
+            if self._id_pid != os.getpid() or self._next_id >= self._id_limit:
+                self._next_id, self._id_limit = self._reserve_block()
+                self._id_pid = os.getpid()
+            number = self._next_id
+            self._next_id += 1
+        return f"{ORDER_ID_PREFIX}{number:010d}"
+
+    def _reserve_block(self):
+        with self.transaction() as conn:
+            conn.execute('INSERT OR IGNORE INTO id_blocks (name, next_value) VALUES (?, 1)', ('orders',))
+            start = conn.execute('SELECT next_value FROM id_blocks WHERE name = ?', ('orders',)).fetchone()[0]
+            conn.execute('UPDATE id_blocks SET next_value = ? WHERE name = ?', (start + self.block_size, 'orders'))
+        return start, start + self.block_size
+
+    # -- Writes --------------------------------------------------------------
+
+    def save(self, order, customer_id):
+        """Persist an order, returning once it has been committed"""
+        done = threading.Event()
+        job = {'row': self._row(order, customer_id), 'done': done, 'error': None}
+        self._start()
+        self._writes.put(job)
+        done.wait()
+        if job['error'] is not None:
+            raise job['error']
+
+    def save_many(self, orders, customer_id):
+        """Persist several orders in one transaction (used for migrations)"""
+        rows = [self._row(order, customer_id) for order in orders]
+        with self.transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO orders VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def _row(self, order, customer_id):
+        return (order['order_id'], customer_id, order.get('created_at', time.time()),
+                order.get('status', 'confirmed'), order['order_summary']['total'],
+                json.dumps(order, ensure_ascii=False))
+
+    def _start(self):
+        if self._pid == os.getpid() and self._writer.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._writer.is_alive():
+                return
+            self._writes = queue.Queue()
+            self._pid = os.getpid()
+            self._writer = threading.Thread(target=self._run, name='order-writer', daemon=True)
+            self._writer.start()
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = [self._writes.get()]
+            deadline = time.monotonic() + GROUP_COMMIT_WINDOW
+            while len(batch) < GROUP_COMMIT_MAX:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._writes.get(timeout=remaining) if remaining > 0 else self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(conn, batch)
+
+    def _commit(self, conn, batch):
+        try:
+            with transaction(conn):
+                conn.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)', [job['row'] for job in batch])
+        except sqlite3.IntegrityError:
+            # One bad row must not fail the rest of the group; retry individually
+            for job in batch:
+                try:
+                    conn.execute('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?)', job['row'])
+                except Exception as e:
+                    job['error'] = e
+        except Exception as e:
+            print(f"Order store write failed: {e}")
+            for job in batch:
+                job['error'] = e
+        for job in batch:
+            job['done'].set()
+
+    # -- Reads ---------------------------------------------------------------
+
+    def get(self, order_id, customer_id=None):
+        """Look up one order; with customer_id, only if it belongs to that customer"""
+        row = self.conn.execute('SELECT customer_id, data FROM orders WHERE order_id = ?', (order_id,)).fetchone()
+        if row is None or (customer_id is not None and row[0] != customer_id):
+            return None
+        return json.loads(row[1])
+
+    def for_customer(self, customer_id, limit=ORDERS_PAGE_SIZE, cursor=None):
+        """Newest-first page of a customer's orders.
+
+        Returns (orders, next_cursor); the cursor is the id of the last order
+        on the page.
+        """
+        params = [customer_id]
+        where = 'customer_id = ?'
+        if cursor:
+            where += (' AND (created_at, order_id) < '
+                      '(SELECT created_at, order_id FROM orders WHERE order_id = ? AND customer_id = ?)')
+            params += [cursor, customer_id]
+        rows = self.conn.execute(
+            f'SELECT order_id, data FROM orders WHERE {where} ORDER BY created_at DESC, order_id DESC LIMIT ?',
+            params + [limit + 1]).fetchall()
+        orders = [json.loads(data) for _, data in rows[:limit]]
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return orders, next_cursor
+
+    def count_for_customer(self, customer_id):
+        return self.conn.execute('SELECT COUNT(*) FROM orders WHERE customer_id = ?', (customer_id,)).fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_order_store():
+    """Return the process-wide order store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = OrderStore()
+    return _store
+
+
+def get_customer_id(create=False):
+    """Opaque customer id kept in the session cookie; orders are looked up by it"""
+    customer_id = session.get('customer_id')
+    if customer_id is None and create:
+        customer_id = session['customer_id'] = secrets.token_urlsafe(16)
+    return customer_id
+
+
+def migrate_session_orders():
+    """Move orders left in the cookie by older versions into the store"""
+    legacy = session.pop('orders', None)
+    if legacy:
+        for order in legacy:
+            try:
+                order.setdefault('created_at', datetime.fromisoformat(order['order_date']).timestamp())
+            except (KeyError, ValueError):
+                order.setdefault('created_at', time.time())
+        get_order_store().save_many(legacy, get_customer_id(create=True))
@@ -0,0 +1,163 @@
+import hashlib
+import json
+from decimal import Decimal, ROUND_HALF_UP
+
+from services.cache import LRUCache
+from services.catalog import get_catalog
+
+CENT = Decimal('0.01')
+TAX_RATE = Decimal('0.08')  # 8% tax
+FREE_SHIPPING_THRESHOLD = Decimal('50')
+
+# Standard shipping is free once the subtotal (before coupons) reaches the threshold
+SHIPPING_METHODS = {
+    'standard': {'label': 'Standard Shipping', 'cost': Decimal('9.99'), 'free_over_threshold': True},
+    'express': {'label': 'Express Shipping', 'cost': Decimal('9.99'), 'free_over_threshold': False},
+    'overnight': {'label': 'Overnight Shipping', 'cost': Decimal('19.99'), 'free_over_threshold': False},
+}
+DEFAULT_SHIPPING_METHOD = 'standard'
+
+COUPON_CODES = {
+    'WELCOME10': {'type': 'percentage', 'value': Decimal('0.10'), 'description': '10% off'},
+    'PLANT20': {'type': 'percentage', 'value': Decimal('0.20'), 'description': '20% off'},
+    'SAVE5': {'type': 'fixed', 'value': Decimal('5'), 'description': '$5 off'},
+    'FREESHIP': {'type': 'freeship', 'value': Decimal('0'), 'description': 'Free shipping'},
+}
+
+QUOTE_CACHE_MAX_ENTRIES = 4096
+
+# Quotes keyed by a hash of the cart contents, options and catalog version
+quote_cache = LRUCache(QUOTE_CACHE_MAX_ENTRIES)
+
+
+class PricingError(ValueError):
+    """Raised for an unknown coupon code or shipping method"""
+
+
+def money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def normalize_coupon(code):
+    return (code or '').strip().upper() or None
+
+
+class Quote:
+    """Priced cart: lines repriced from the catalog plus shipping, discount and tax"""
+
+    __slots__ = ('lines', 'unknown_ids', 'items_count', 'subtotal', 'discount', 'shipping_cost',
+                 'tax_amount', 'total', 'coupon', 'shipping_method')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    def summary(self):
+        """Totals in the shape stored on orders and rendered by the checkout templates"""
+        return {
+            'subtotal': float(self.subtotal),
+            'discount': float(self.discount),
+            'shipping_cost': float(self.shipping_cost),
+            'tax_amount': float(self.tax_amount),
+            'total': float(self.total),
+            'items_count': self.items_count,
+            'coupon': self.coupon,
+            'shipping_method': self.shipping_method,
+        }
+
+    def to_json(self):
+        data = self.summary()
+        data['lines'] = [{**line, 'price': float(line['price']), 'line_total': float(line['line_total'])}
+                         for line in self.lines]
+        data['unknown_ids'] = list(self.unknown_ids)
+        data['coupon_description'] = COUPON_CODES[self.coupon]['description'] if self.coupon else None
+        return data
+
+
+def _cart_key(items, coupon, shipping_method, version):
+    merged = {}
+    for product_id, quantity in items:
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    payload = json.dumps([sorted(merged.items(), key=lambda kv: str(kv[0])), coupon, shipping_method, version],
+                         default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def quote(items, coupon=None, shipping_method=None):
+    """Price (product_id, quantity) pairs against the current catalog.
+
+    Client-supplied prices are never used. Unknown product ids are skipped
+    and reported in unknown_ids. Results are memoized per cart contents, so
+    toggling between shipping options or re-rendering checkout is a lookup.
+    """
+    coupon = normalize_coupon(coupon)
+    shipping_method = shipping_method or DEFAULT_SHIPPING_METHOD
+    if coupon is not None and coupon not in COUPON_CODES:
+        raise PricingError('Invalid coupon code')
+    if shipping_method not in SHIPPING_METHODS:
+        raise PricingError('Unknown shipping method')
+
+    catalog = get_catalog()
+    items = list(items)
+    key = _cart_key(items, coupon, shipping_method, catalog.version)
+    cached = quote_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = _price(catalog, items, coupon, shipping_method)
+    quote_cache.set(key, result)
+    return result
+
+
+def _price(catalog, items, coupon, shipping_method):
+    lines, unknown_ids, by_id = [], [], {}
+    for product_id, quantity in items:
+        product = catalog.get(product_id)
+        if product is None or quantity <= 0:
+            if product is None:
+                unknown_ids.append(product_id)
+            continue
+        if product_id in by_id:
+            line = by_id[product_id]
+            line['quantity'] += quantity
+            line['line_total'] = line['price'] * line['quantity']
+            continue
+        price = money(product['price'])
+        line = by_id[product_id] = {'id': product['id'], 'name': product['name'], 'price': price,
+                                    'quantity': quantity, 'line_total': price * quantity}
+        lines.append(line)
+
+    subtotal = sum((line['line_total'] for line in lines), Decimal('0'))
+    offer = COUPON_CODES.get(coupon)
+
+    discount = Decimal('0')
+    if offer and offer['type'] == 'percentage':
+        discount = money(subtotal * offer['value'])
+    elif offer and offer['type'] == 'fixed':
+        discount = min(subtotal, offer['value'])
+    discounted = subtotal - discount
+
+    method = SHIPPING_METHODS[shipping_method]
+    shipping_cost = method['cost']
+    if not lines or (offer and offer['type'] == 'freeship') or (
+            method['free_over_threshold'] and subtotal >= FREE_SHIPPING_THRESHOLD):
+        shipping_cost = Decimal('0')
+
+    tax_amount = money(discounted * TAX_RATE)
+    return Quote(
+        lines=tuple(lines),
+        unknown_ids=tuple(unknown_ids),
+        items_count=sum(line['quantity'] for line in lines),
+        subtotal=money(subtotal),
+        discount=money(discount),
+        shipping_cost=money(shipping_cost),
+        tax_amount=tax_amount,
+        total=money(discounted + shipping_cost + tax_amount),
+        coupon=coupon,
+        shipping_method=shipping_method,
+    )
+
+
+def quote_cart(cart_items, coupon=None, shipping_method=None):
+    """Quote a list of cart item dicts as returned by cart_store.load_cart()"""
+    return quote(((item['id'], item['quantity']) for item in cart_items), coupon, shipping_method)
@@ -0,0 +1,362 @@
+import atexit
+import math
+import os
+import threading
+import time
+from heapq import heapify, heappop, heappush
+
+from services import instance_path
+from services.catalog import catalog_loaded, catalog_version, get_catalog
+from services.order_store import order_placed
+from services.sqlite import SQLiteStore
+
+RANKINGS_DB_PATH = os.environ.get('RANKINGS_DB_PATH') or instance_path('rankings.sqlite3')
+# A sale counts half as much after this many days
+HALF_LIFE = float(os.environ.get('RANKINGS_HALF_LIFE_DAYS', 7)) * 24 * 3600
+# Best sellers kept per category, and for the whole catalog
+TOP_K = int(os.environ.get('RANKINGS_TOP_K', 12))
+# Seconds between writing this process's sales to disk and reading back every worker's
+SYNC_INTERVAL = float(os.environ.get('RANKINGS_SYNC_INTERVAL', 60))
+# Decayed units sold before a best seller gets the Popular badge; two sales stay above it for about 3 days
+POPULAR_MIN_SALES = 1.5
+# Products first seen in the catalog within this many days are new arrivals
+NEW_ARRIVAL_DAYS = 30
+
+ALL = '*'
+
+_TAU = HALF_LIFE / math.log(2)
+# Scores grow by e^(age / tau) since the landmark; past this exponent the landmark moves up to now
+# and stored scores are scaled down to match, long before a float would overflow (around 709)
+_MAX_EXPONENT = 40
+# Scores this far below a fresh sale after rescaling are dropped
+_MIN_SCORE = 1e-9
+
+
+class TopK:
+    """The k highest-scoring products, for scores that only ever go up.
+
+    A min-heap holds the current members; an improved score pushes a new
+    heap entry and leaves the old one behind, to be skipped when it reaches
+    the top. Since scores never fall, a product that drops out can only come
+    back through its own update, so each offer is O(log k). Not thread-safe:
+    Rankings only touches its TopKs while holding its lock.
+    """
+
+    __slots__ = ('k', 'scores', 'heap')
+
+    def __init__(self, k):
+        self.k = k
+        self.scores = {}
+        self.heap = []
+
+    def offer(self, product_id, score):
+        if product_id in self.scores:
+            self.scores[product_id] = score
+            heappush(self.heap, (score, product_id))
+            if len(self.heap) > 4 * self.k:
+                self.heap = [(s, i) for i, s in self.scores.items()]
+                heapify(self.heap)
+            return
+        if len(self.scores) >= self.k:
+            floor_score, floor_id = self._floor()
+            if score <= floor_score:
+                return
+            heappop(self.heap)
+            del self.scores[floor_id]
+        self.scores[product_id] = score
+        heappush(self.heap, (score, product_id))
+
+    def _floor(self):
+        heap, scores = self.heap, self.scores
+        while scores.get(heap[0][1]) != heap[0][0]:
+            heappop(heap)
+        return heap[0]
+
+    def ranked(self):
+        return sorted(self.scores, key=lambda product_id: (-self.scores[product_id], product_id))
+
+
+class Rankings(SQLiteStore):
+    """Best sellers by time-decayed units sold, and new arrivals by when products joined the catalog.
+
+    Sales use forward decay: a sale at time t adds quantity * 2^((t - t0) /
+    half-life) for a fixed landmark t0, so a product's score never has to be
+    decayed again and recording a sale is one addition plus a TopK offer.
+    Comparing scores at any moment ranks products exactly as decaying every
+    count to that moment would. Scores grow exponentially with the time
+    since t0, so once they get large a sync moves t0 up to the present and
+    scales every stored score down by the same factor.
+
+    Each worker records its own orders as they happen. Every SYNC_INTERVAL
+    seconds it adds them to the shared SQLite totals and reloads those, so
+    all workers converge and the rankings survive restarts. version changes
+    whenever a sync changes what the lists show, for keying cached pages.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS product_sales (
+            product_id INTEGER PRIMARY KEY,
+            score REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS product_first_seen (
+            product_id INTEGER PRIMARY KEY,
+            first_seen REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rankings_meta (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        );
+    """
+
+    TIMEOUT = 30
+
+    def __init__(self, catalog, path=RANKINGS_DB_PATH):
+        super().__init__(path)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._syncer = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.version = 0
+        self._published = None
+
+        now = time.time()
+        # The landmark is shared by every worker; only a sync moves it, rescaling the stored scores with it
+        self.landmark = self._meta('landmark', now)
+        self.seeded_at = self._meta('seeded_at', now)
+        self.scores = {}
+        self.use_catalog(catalog)
+        self.sync()
+
+    def _meta(self, name, default):
+        self.conn.execute('INSERT OR IGNORE INTO rankings_meta (name, value) VALUES (?, ?)', (name, default))
+        return self.conn.execute('SELECT value FROM rankings_meta WHERE name = ?', (name,)).fetchone()[0]
+
+    # -- Catalog -------------------------------------------------------------
+
+    def use_catalog(self, catalog):
+        """Rank the products of catalog, recording when any new ones were first seen"""
+        now = time.time()
+        with self.transaction() as conn:
+            # The first catalog this database sees is the starting range, not a batch of new arrivals
+            first = conn.execute('SELECT 1 FROM product_first_seen LIMIT 1').fetchone() is None
+            seen_at = self.seeded_at if first else now
+            conn.executemany('INSERT OR IGNORE INTO product_first_seen (product_id, first_seen) VALUES (?, ?)',
+                             ((p['id'], seen_at) for p in catalog.products))
+        first_seen = dict(conn.execute('SELECT product_id, first_seen FROM product_first_seen'))
+
+        # Products there from the start have no arrival date worth showing; their is_new flag decides
+        cutoff = now - NEW_ARRIVAL_DAYS * 24 * 3600
+        arrivals = {}
+        new_ids = set()
+        for product in catalog.products:
+            seen = first_seen.get(product['id'], now)
+            if seen > self.seeded_at:
+                is_new = seen >= cutoff
+            else:
+                is_new = bool(product.get('is_new'))
+            if is_new:
+                new_ids.add(product['id'])
+            arrivals[product['id']] = (is_new, seen, product['id'])
+        new_arrivals = {}
+        for key, products in [(ALL, catalog.products)] + list(catalog.by_category.items()):
+            ordered = sorted(products, key=lambda p: arrivals[p['id']], reverse=True)
+            new_arrivals[key] = [p['id'] for p in ordered[:TOP_K]]
+
+        # Fallback for a store with few sales: flagged favourites, then the best rated
+        fallback = {}
+        for key, products in [(ALL, catalog.products)] + list(catalog.by_category.items()):
+            ordered = sorted(products, key=lambda p: (bool(p.get('is_popular')), p.get('rating') or 0, -p['id']),
+                             reverse=True)
+            fallback[key] = [p['id'] for p in ordered[:TOP_K]]
+
+        with self._lock:
+            self.catalog = catalog
+            self.new_ids = frozenset(new_ids)
+            self.new_arrivals = new_arrivals
+            self.fallback = fallback
+            self._rebuild()
+            self._publish(force=True)
+
+    def _publish(self, force=False):
+        # Caller holds the lock; bump version if the lists differ from the last published ones
+        ranked = {key: top.ranked() for key, top in self.top.items()}
+        if force or ranked != self._published:
+            self._published = ranked
+            self.version += 1
+
+    def _rebuild(self):
+        # Caller holds the lock
+        category_of = {p['id']: p['category'] for p in self.catalog.products}
+        top = {ALL: TopK(TOP_K)}
+        for category in self.catalog.by_category:
+            top[category] = TopK(TOP_K)
+        for product_id, score in self.scores.items():
+            category = category_of.get(product_id)
+            if category is not None:
+                top[ALL].offer(product_id, score)
+                top[category].offer(product_id, score)
+        self.category_of = category_of
+        self.top = top
+
+    # -- Sales ---------------------------------------------------------------
+
+    def record(self, product_id, quantity, when=None):
+        """Count quantity units of product_id sold at when (default now)"""
+        category = self.category_of.get(product_id)
+        if category is None or quantity <= 0:
+            return
+        when = when or time.time()
+        with self._lock:
+            # Under the lock, so a sync moving the landmark cannot slip in between
+            weight = quantity * math.exp((when - self.landmark) / _TAU)
+            score = self.scores.get(product_id, 0.0) + weight
+            self.scores[product_id] = score
+            self._pending[product_id] = self._pending.get(product_id, 0.0) + weight
+            self.top[ALL].offer(product_id, score)
+            self.top[category].offer(product_id, score)
+        self._start_syncer()
+
+    def sales(self, product_id, now=None):
+        """Units of product_id sold, each decayed to now"""
+        return self.scores.get(product_id, 0.0) * math.exp(-((now or time.time()) - self.landmark) / _TAU)
+
+    def sync(self):
+        """Add this process's new sales to the shared totals and load every worker's"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            landmark = self.landmark
+        try:
+            with self.transaction() as conn:
+                shared = conn.execute("SELECT value FROM rankings_meta WHERE name = 'landmark'").fetchone()[0]
+                now = time.time()
+                if (now - shared) / _TAU > _MAX_EXPONENT:
+                    conn.execute('UPDATE product_sales SET score = score * ?', (math.exp((shared - now) / _TAU),))
+                    conn.execute('DELETE FROM product_sales WHERE score < ?', (_MIN_SCORE,))
+                    conn.execute("UPDATE rankings_meta SET value = ? WHERE name = 'landmark'", (now,))
+                    shared = now
+                # Sales recorded against this process's landmark, restated against the shared one
+                scale = math.exp((landmark - shared) / _TAU)
+                conn.executemany(
+                    'INSERT INTO product_sales (product_id, score) VALUES (?, ?) '
+                    'ON CONFLICT (product_id) DO UPDATE SET score = score + excluded.score',
+                    [(product_id, weight * scale) for product_id, weight in pending.items()])
+                scores = dict(conn.execute('SELECT product_id, score FROM product_sales'))
+        except BaseException:
+            with self._lock:
+                for product_id, weight in pending.items():
+                    self._pending[product_id] = self._pending.get(product_id, 0.0) + weight
+            raise
+
+        with self._lock:
+            # Sales recorded while the totals were being written are not in them yet
+            self._pending = {product_id: weight * scale for product_id, weight in self._pending.items()}
+            for product_id, weight in self._pending.items():
+                scores[product_id] = scores.get(product_id, 0.0) + weight
+            self.landmark = shared
+            self.scores = scores
+            self._rebuild()
+            self._publish()
+
+    # -- Reads ---------------------------------------------------------------
+
+    def best_sellers(self, category=None):
+        """Ids of the best sellers with at least POPULAR_MIN_SALES, best first"""
+        with self._lock:
+            top = self.top.get(category or ALL)
+            if top is None:
+                return []
+            floor = POPULAR_MIN_SALES * math.exp((time.time() - self.landmark) / _TAU)
+            return [product_id for product_id in top.ranked() if top.scores[product_id] >= floor]
+
+    def popular(self, category=None, limit=TOP_K):
+        """Products for a "Most Popular" list: best sellers, topped up with favourites"""
+        ids = self.best_sellers(category)[:limit]
+        for product_id in self.fallback.get(category or ALL, ()):
+            if len(ids) >= limit:
+                break
+            if product_id not in ids:
+                ids.append(product_id)
+        return [self.catalog.by_id[product_id] for product_id in ids]
+
+    def new(self, category=None, limit=TOP_K):
+        """Newest arrivals first"""
+        return [self.catalog.by_id[product_id] for product_id in self.new_arrivals.get(category or ALL, ())[:limit]]
+
+    def is_popular(self, product):
+        category = self.category_of.get(product['id'])
+        if not self.scores:
+            return bool(product.get('is_popular'))
+        return product['id'] in self.best_sellers(category)
+
+    def is_new(self, product):
+        return product['id'] in self.new_ids
+
+    # -- Background sync -----------------------------------------------------
+
+    def _start_syncer(self):
+        if self._pid == os.getpid() and self._syncer.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._syncer.is_alive():
+                return
+            self._pid = os.getpid()
+            self._syncer = threading.Thread(target=self._sync_forever, name='rankings-sync', daemon=True)
+            self._syncer.start()
+            atexit.register(self._final_sync)
+
+    def _sync_forever(self):
+        while True:
+            time.sleep(SYNC_INTERVAL)
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Rankings sync failed: {e}")
+
+    def _final_sync(self):
+        if self._pending:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Rankings sync at exit failed: {e}")
+
+
+_rankings = None
+_rankings_lock = threading.Lock()
+
+
+def get_rankings():
+    """Return the process-wide rankings, loaded from disk on first use"""
+    global _rankings
+    if _rankings is None:
+        with _rankings_lock:
+            if _rankings is None:
+                _rankings = Rankings(get_catalog())
+    _rankings._start_syncer()
+    return _rankings
+
+
+def storefront_version():
+    """Version of everything product listings show: the catalog and the rankings"""
+    return f"{catalog_version()}.{get_rankings().version}"
+
+
+@order_placed.connect
+def _record_order(order, **extra):
+    rankings = get_rankings()
+    when = order.get('created_at')
+    for item in order.get('items', ()):
+        rankings.record(item['id'], item['quantity'], when)
+
+
+@catalog_loaded.connect
+def _use_new_catalog(catalog, **extra):
+    if _rankings is not None:
+        _rankings.use_catalog(catalog)
+
+
+def init_app(app):
+    app.jinja_env.globals.update(
+        is_popular=lambda product: get_rankings().is_popular(product),
+        is_new_arrival=lambda product: get_rankings().is_new(product),
+    )
@@ -0,0 +1,184 @@
+import os
+import secrets
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, request, session
+from werkzeug.exceptions import TooManyRequests
+
+from services import instance_path
+from services.cache import LRUCache
+from services.metrics import Counter
+from services.sqlite import SQLiteStore
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1').lower() not in ('0', 'false', 'no')
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite')
+RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH') or instance_path('rate_limits.sqlite3')
+# In-process backend: buckets kept before the least recently used is evicted
+MEMORY_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+# SQLite backend: expired buckets are deleted once every this many requests
+PURGE_INTERVAL = 1000
+
+decisions = Counter('rate_limit_requests_total', 'Rate-limited requests, by whether the bucket allowed them.',
+                    ('endpoint', 'scope', 'outcome'))
+
+
+class Limit:
+    """A token bucket of capacity requests that refills completely over period seconds.
+
+    scope picks who shares a bucket: 'ip' for the client address or
+    'session' for the browser session.
+    """
+
+    __slots__ = ('scope', 'capacity', 'period')
+
+    def __init__(self, scope, capacity, period):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown rate limit scope: {scope!r}")
+        self.scope = scope
+        self.capacity = capacity
+        self.period = period
+
+    @property
+    def rate(self):
+        return self.capacity / self.period
+
+
+def _take(tokens, updated_at, now, limit):
+    """Refill a bucket to now and try to take one token; returns (tokens, retry_after)"""
+    if tokens is None:
+        tokens = limit.capacity
+    else:
+        tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limit.rate
+
+
+class MemoryBackend:
+    """Buckets in this process only; each worker enforces its own limits"""
+
+    def __init__(self, max_keys=MEMORY_MAX_KEYS):
+        self.buckets = LRUCache(max_keys)
+        self._lock = threading.Lock()
+
+    def consume(self, key, limit):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self.buckets.get(key, (None, now))
+            tokens, retry_after = _take(tokens, updated_at, now, limit)
+            # An idle bucket is full again after one period, so it can be forgotten then
+            self.buckets.set(key, (tokens, now), ttl=limit.period)
+        return retry_after
+
+
+class SQLiteBackend(SQLiteStore):
+    """Buckets in a local SQLite database, so limits hold across every worker on the host"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS rate_limit_buckets_expires ON rate_limit_buckets (expires_at);
+    """
+
+    def __init__(self, path=RATE_LIMIT_DB_PATH):
+        super().__init__(path)
+        self._calls = 0
+
+    def consume(self, key, limit):
+        now = time.time()
+        with self.transaction() as conn:
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, retry_after = _take(row[0] if row else None, row[1] if row else now, now, limit)
+            conn.execute(
+                'INSERT INTO rate_limit_buckets (key, tokens, updated_at, expires_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at, '
+                'expires_at = excluded.expires_at',
+                (key, tokens, now, now + limit.period))
+
+        self._calls += 1
+        if self._calls % PURGE_INTERVAL == 0:
+            self.purge_expired()
+        return retry_after
+
+    def purge_expired(self):
+        """Delete buckets idle long enough to have refilled; they would start full anyway"""
+        return self.conn.execute('DELETE FROM rate_limit_buckets WHERE expires_at <= ?', (time.time(),)).rowcount
+
+
+def _client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def _session_id():
+    client_id = session.get('rate_limit_id')
+    if client_id is None:
+        client_id = session['rate_limit_id'] = secrets.token_urlsafe(12)
+    return client_id
+
+
+SCOPES = {'ip': _client_ip, 'session': _session_id}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured bucket store (RATE_LIMIT_BACKEND=sqlite or memory)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if RATE_LIMIT_BACKEND == 'memory':
+                    _backend = MemoryBackend()
+                elif RATE_LIMIT_BACKEND == 'sqlite':
+                    _backend = SQLiteBackend()
+                else:
+                    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {RATE_LIMIT_BACKEND!r}")
+    return _backend
+
+
+def check(endpoint, limits):
+    """Take a token from every bucket of limits; returns seconds to wait, 0 if allowed"""
+    backend = get_backend()
+    wait = 0.0
+    for limit in limits:
+        retry_after = backend.consume(f"{endpoint}:{limit.scope}:{SCOPES[limit.scope]()}", limit)
+        decisions.inc(endpoint=endpoint, scope=limit.scope, outcome='throttled' if retry_after else 'allowed')
+        wait = max(wait, retry_after)
+    return wait
+
+
+def _throttled(retry_after):
+    seconds = max(1, int(retry_after + 0.999))
+    message = f'Too many requests. Please try again in {seconds} seconds.'
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        response = jsonify({'success': False, 'message': message})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(seconds)
+        return response
+    raise TooManyRequests(message, retry_after=seconds)
+
+
+def rate_limit(*limits, methods=('POST',)):
+    """Answer 429 with Retry-After once a client exhausts any of limits.
+
+    Only requests with one of methods are counted, so a view serving a
+    form on GET and handling it on POST limits just the submissions.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if RATE_LIMIT_ENABLED and request.method in methods:
+                retry_after = check(request.endpoint, limits)
+                if retry_after:
+                    return _throttled(retry_after)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,114 @@
+import math
+import re
+from bisect import bisect_left
+from collections import Counter
+
+# Related products shown on each product page
+RELATED_COUNT = 3
+# Candidates per product: this many neighbours by price on each side, within its category
+PRICE_WINDOW = 8
+# Highest-weighted description terms kept per product; enough to compare, cheap to score
+MAX_TERMS = 12
+# Words of three or more letters; shorter ones are almost all stop words
+TERM_PATTERN = re.compile(r'[a-z0-9]{3,}')
+# Share of the score from description similarity; the rest rewards a similar price
+TEXT_WEIGHT = 0.7
+
+
+def _terms(product):
+    return TERM_PATTERN.findall(f"{product['name']} {product.get('description') or ''}".lower())
+
+
+def _log_price(product):
+    return math.log(product['price']) if product['price'] > 0 else 0.0
+
+
+class RelatedIndex:
+    """Top related products per product id, worked out the first time each product is asked for.
+
+    Candidates are the products nearest in price within the same category.
+    They are ranked by TF-IDF cosine similarity of their descriptions,
+    blended with how close their prices are. Short lists (tiny categories)
+    are filled with the nearest products by price from the whole catalog.
+
+    Loading only counts document frequencies and orders each category by
+    price. A product's list, and the term vectors behind it, are computed on
+    its first lookup and kept on this index, which is rebuilt with every
+    catalog, so a list never outlives the catalog it was computed from.
+    """
+
+    def __init__(self, products, by_category, count=RELATED_COUNT):
+        self.count = count
+        self.by_id = {p['id']: p for p in products}
+
+        document_frequency = Counter()
+        for product in products:
+            document_frequency.update(set(_terms(product)))
+        total = len(products)
+        self.idf = {term: math.log((1 + total) / (1 + df)) for term, df in document_frequency.items()}
+
+        # Product id -> (its category ordered by price, its position there)
+        self.positions = {}
+        for items in by_category.values():
+            ordered = sorted(items, key=lambda p: (p['price'], p['id']))
+            for i, product in enumerate(ordered):
+                self.positions[product['id']] = (ordered, i)
+        self.by_price = sorted((p['price'], p['id']) for p in products)
+
+        # Filled in by get(); concurrent requests may both compute an entry, with the same result
+        self.vectors = {}
+        self.related = {}
+
+    def get(self, product_id):
+        related = self.related.get(product_id)
+        if related is None:
+            product = self.by_id.get(product_id)
+            if product is None:
+                return ()
+            related = self.related[product_id] = self._compute(product)
+        return related
+
+    def _compute(self, product):
+        related = []
+        if product['id'] in self.positions:
+            ordered, i = self.positions[product['id']]
+            vector = self._vector(product)
+            log_price = _log_price(product)
+            scored = []
+            for other in ordered[max(0, i - PRICE_WINDOW):i] + ordered[i + 1:i + 1 + PRICE_WINDOW]:
+                other_vector = self._vector(other)
+                similarity = sum(vector[term] * other_vector[term] for term in vector.keys() & other_vector.keys())
+                # Price closeness is 1 / (1 + |log(a / b)|), so a ratio matters, not a dollar difference
+                closeness = 1.0 / (1.0 + abs(log_price - _log_price(other)))
+                scored.append((-(TEXT_WEIGHT * similarity + (1 - TEXT_WEIGHT) * closeness), other['id']))
+            scored.sort()
+            related = [other_id for _, other_id in scored[:self.count]]
+        if len(related) < self.count:
+            self._fill_by_price(product, related, self.by_price, self.count)
+        return tuple(related)
+
+    def _vector(self, product):
+        """Unit-length TF-IDF vector over the product's name and description, trimmed to MAX_TERMS"""
+        vector = self.vectors.get(product['id'])
+        if vector is None:
+            counts = Counter(_terms(product))
+            weights = sorted(((count * self.idf[term], term) for term, count in counts.items()), reverse=True)[:MAX_TERMS]
+            norm = math.sqrt(sum(weight * weight for weight, _ in weights)) or 1.0
+            vector = self.vectors[product['id']] = {term: weight / norm for weight, term in weights}
+        return vector
+
+    @staticmethod
+    def _fill_by_price(product, related, by_price, count):
+        # Walk outwards from the product's own position in the price order
+        position = bisect_left(by_price, (product['price'], product['id']))
+        low, high = position - 1, position + 1
+        exclude = set(related) | {product['id']}
+        while len(related) < count and (low >= 0 or high < len(by_price)):
+            if high >= len(by_price) or (low >= 0 and product['price'] - by_price[low][0]
+                                         <= by_price[high][0] - product['price']):
+                candidate, low = by_price[low][1], low - 1
+            else:
+                candidate, high = by_price[high][1], high + 1
+            if candidate not in exclude:
+                related.append(candidate)
+                exclude.add(candidate)
@@ -0,0 +1,139 @@
+import re
+from bisect import bisect_left, bisect_right
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Sort keys accepted by the product search, mapped to (key function, reverse)
+SORT_KEYS = {
+    'featured': (None, False),
+    'name': (lambda p: (p['name'].lower(), p['id']), False),
+    'name-desc': (lambda p: (p['name'].lower(), p['id']), True),
+    'price': (lambda p: (p['price'], p['id']), False),
+    'price-desc': (lambda p: (p['price'], p['id']), True),
+    'rating': (lambda p: (p.get('rating') or 0, p['id']), True),
+    'newest': (lambda p: (bool(p.get('is_new')), p['id']), True),
+}
+
+# Quick-link filters from the shop sidebar
+QUICK_FILTERS = {
+    'popular': 'is_popular',
+    'new': 'is_new',
+    'sale': 'is_on_sale',
+}
+
+
+def tokenize(text):
+    """Lower-case a string and split it into alphanumeric tokens"""
+    return TOKEN_PATTERN.findall((text or '').lower())
+
+
+class SearchIndex:
+    """Inverted token index plus sorted price/rating indexes over a product list"""
+
+    def __init__(self, products, by_category, by_flag):
+        self.category_ids = {category: frozenset(p['id'] for p in items) for category, items in by_category.items()}
+        self.flag_ids = {flag: frozenset(p['id'] for p in items) for flag, items in by_flag.items()}
+
+        # token -> set of product ids, over name, category and description
+        postings = {}
+        for product in products:
+            text = ' '.join((product['name'], product['category'], product.get('description') or ''))
+            for token in set(tokenize(text)):
+                postings.setdefault(token, set()).add(product['id'])
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+
+        # (price, id) pairs sorted so price ranges are two bisects
+        by_price = sorted((p['price'], p['id']) for p in products)
+        self.prices = [price for price, _ in by_price]
+        self.price_ids = [product_id for _, product_id in by_price]
+
+        # (rating, id) pairs sorted the same way for minimum-rating filters
+        by_rating = sorted((p.get('rating') or 0, p['id']) for p in products)
+        self.ratings = [rating for rating, _ in by_rating]
+        self.rating_ids = [product_id for _, product_id in by_rating]
+
+        # Precomputed orderings for every sort key, plus each product's rank in it
+        self.orderings = {}
+        self.ranks = {}
+        for sort, (key, reverse) in SORT_KEYS.items():
+            ordered = list(products) if key is None else sorted(products, key=key, reverse=reverse)
+            self.orderings[sort] = ordered
+            self.ranks[sort] = {p['id']: rank for rank, p in enumerate(ordered)}
+
+    def match_token(self, token):
+        """Ids of products with any indexed word starting with ``token``"""
+        exact = self.postings.get(token)
+        start = bisect_left(self.vocabulary, token)
+        end = bisect_left(self.vocabulary, token + '\uffff', lo=start)
+        if end - start == 1 and exact is not None:
+            return exact
+        matched = set()
+        for term in self.vocabulary[start:end]:
+            matched |= self.postings[term]
+        return matched
+
+    def match_query(self, query):
+        """Ids matching every token of ``query``, or None when the query is empty"""
+        result = None
+        for token in sorted(set(tokenize(query)), key=len, reverse=True):
+            ids = self.match_token(token)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result
+
+    def price_between(self, low, high):
+        start = bisect_left(self.prices, low)
+        end = bisect_right(self.prices, high, lo=start)
+        return set(self.price_ids[start:end])
+
+    def rating_at_least(self, minimum):
+        return set(self.rating_ids[bisect_left(self.ratings, minimum):])
+
+    def search(self, query='', categories=(), price_ranges=(), flag=None, min_rating=None,
+               sort='featured', limit=24, cursor=None):
+        """Return (products, total, next_cursor) for the given filters.
+
+        ``cursor`` is the id of the last product on the previous page; the next
+        page starts right after it in the chosen ordering.
+        """
+        candidates = self.match_query(query)
+
+        def narrow(ids):
+            return ids if candidates is None else candidates & ids
+
+        if categories:
+            candidates = narrow(set().union(*(self.category_ids.get(c, ()) for c in categories)))
+        if price_ranges:
+            candidates = narrow(set().union(*(self.price_between(low, high) for low, high in price_ranges)))
+        if min_rating is not None:
+            candidates = narrow(self.rating_at_least(min_rating))
+        if flag in QUICK_FILTERS:
+            candidates = narrow(self.flag_ids.get(QUICK_FILTERS[flag], frozenset()))
+
+        if sort not in self.orderings:
+            sort = 'featured'
+        ordering = self.orderings[sort]
+        ranks = self.ranks[sort]
+        start = ranks[cursor] + 1 if cursor in ranks else 0
+
+        if candidates is None:
+            total = len(ordering)
+            page = ordering[start:start + limit + 1]
+        elif len(candidates) * 8 < len(ordering):
+            # Small result sets are cheaper to sort by rank than to walk the ordering
+            total = len(candidates)
+            page = [ordering[rank] for rank in sorted(ranks[i] for i in candidates if ranks[i] >= start)[:limit + 1]]
+        else:
+            total = len(candidates)
+            page = []
+            for rank in range(start, len(ordering)):
+                product = ordering[rank]
+                if product['id'] in candidates:
+                    page.append(product)
+                    if len(page) > limit:
+                        break
+
+        next_cursor = page[limit - 1]['id'] if len(page) > limit else None
+        return page[:limit], total, next_cursor
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+
+def connect(path, timeout=10, synchronous='NORMAL'):
+    """Open path in autocommit mode with WAL, so readers never wait for the writer"""
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={synchronous}')
+    return conn
+
+
+@contextmanager
+def transaction(conn):
+    """Run the block inside BEGIN IMMEDIATE ... COMMIT, rolling back if it raises.
+
+    IMMEDIATE takes the write lock up front, so writers in other processes
+    queue on the busy timeout instead of failing halfway through.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+class SQLiteStore:
+    """Base for state kept in a local SQLite file shared by every worker on the host.
+
+    Subclasses set SCHEMA, which is created on construction, and may raise
+    TIMEOUT (seconds to wait for the write lock) or SYNCHRONOUS.
+    """
+
+    SCHEMA = ''
+    TIMEOUT = 10
+    SYNCHRONOUS = 'NORMAL'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with closing(self._connect()) as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        return connect(self.path, self.TIMEOUT, self.SYNCHRONOUS)
+
+    @property
+    def conn(self):
+        # One connection per thread, reopened after a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def transaction(self):
+        return transaction(self.conn)
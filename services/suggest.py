@@ -0,0 +1,123 @@
+import os
+import re
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+
+from services.cache import LRUCache
+from services.search import tokenize
+
+# Suggestions returned when the client does not ask for a number
+SUGGEST_COUNT = 8
+MAX_SUGGEST_COUNT = 20
+# Prefixes matching more keys than this get their top suggestions precomputed;
+# rarer prefixes are ranked on the fly from at most this many keys
+PRECOMPUTE_THRESHOLD = 64
+# Catalog words worth suggesting: four or more letters, used by at least two products
+KEYWORD_PATTERN = re.compile(r'[a-z]{4,}')
+KEYWORD_MIN_PRODUCTS = 2
+STOP_WORDS = frozenset((
+    'also', 'been', 'each', 'even', 'from', 'have', 'into', 'just', 'known', 'made', 'makes', 'more',
+    'most', 'much', 'only', 'over', 'such', 'than', 'that', 'their', 'them', 'they', 'this', 'very', 'what',
+    'when', 'where', 'which', 'while', 'will', 'with', 'your',
+))
+# Longest query looked up; nothing in the catalog has a longer name
+MAX_QUERY_LENGTH = 100
+
+SUGGEST_CACHE_MAX_ENTRIES = int(os.environ.get('SUGGEST_CACHE_MAX_ENTRIES', 5000))
+
+# (catalog version, normalized query, count) -> suggestion list
+suggest_cache = LRUCache(SUGGEST_CACHE_MAX_ENTRIES)
+
+# Suggestion kinds, in the order they are listed
+CATEGORY, PRODUCT, KEYWORD = 'category', 'product', 'keyword'
+_KIND_ORDER = {CATEGORY: 0, PRODUCT: 1, KEYWORD: 2}
+
+
+def normalize(query):
+    """Lower-case a query and reduce it to space-separated tokens, as keys are stored"""
+    return ' '.join(tokenize(query[:MAX_QUERY_LENGTH]))
+
+
+class SuggestIndex:
+    """Typeahead over product names, categories and description keywords.
+
+    Every suggestion is an entry, numbered by rank: categories first, then
+    products (popular ones first, then by rating), then keywords (most used
+    first). Each entry is reachable through one or more lower-cased keys; a
+    product name is keyed from each of its words, so "del" finds "Monstera
+    Deliciosa". Keys are kept in one sorted list with a parallel array of
+    entry numbers, so the keys starting with a prefix are one bisect away
+    and the best suggestions among them are simply the lowest entry numbers.
+    Prefixes shared by many keys have their answer precomputed.
+    """
+
+    def __init__(self, products, by_category, category_names, postings, count=MAX_SUGGEST_COUNT):
+        # postings is the search index's word -> product ids, reused for keyword counts
+        self.count = count
+
+        ranked = [(_KIND_ORDER[CATEGORY], -len(items), category_names.get(category, category.title()), category)
+                  for category, items in by_category.items()]
+        ranked += [(_KIND_ORDER[PRODUCT], -bool(p.get('is_popular')), -(p.get('rating') or 0), p['name'], p['id'])
+                   for p in products]
+        ranked += [(_KIND_ORDER[KEYWORD], -used, keyword, keyword) for keyword, used in _keywords(postings)]
+        ranked.sort()
+
+        # Entry number -> (kind, text, target): a category slug, a product id or the keyword itself
+        kinds = list(_KIND_ORDER)
+        self.entries = [(kinds[row[0]], row[-2], row[-1]) for row in ranked]
+
+        pairs = []
+        for number, (kind, text, target) in enumerate(self.entries):
+            words = tokenize(text)
+            if kind == CATEGORY:
+                pairs.append((target, number))
+            for i in range(len(words)):
+                pairs.append((' '.join(words[i:]), number))
+        pairs = sorted(set(pairs))
+        self.keys = [key for key, _ in pairs]
+        self.numbers = array('I', (number for _, number in pairs))
+
+        self.top = {}
+        if self.keys:
+            self._precompute('', 0, len(self.keys))
+
+    def _precompute(self, prefix, lo, hi):
+        """Store the best entry numbers for prefix and every longer prefix shared by many keys"""
+        if hi - lo <= PRECOMPUTE_THRESHOLD:
+            return nsmallest(self.count, set(self.numbers[lo:hi]))
+        depth = len(prefix)
+        best = set()
+        i = lo
+        while i < hi:
+            key = self.keys[i]
+            if len(key) == depth:
+                best.add(self.numbers[i])
+                i += 1
+                continue
+            child = prefix + key[depth]
+            end = bisect_left(self.keys, child + '\uffff', i, hi)
+            best.update(self._precompute(child, i, end))
+            i = end
+        top = nsmallest(self.count, best)
+        self.top[prefix] = top
+        return top
+
+    def suggest(self, query, count=SUGGEST_COUNT):
+        """Up to count (kind, text, target) entries for keys starting with query"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        count = min(count, self.count)
+        top = self.top.get(prefix)
+        if top is None:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\uffff', start)
+            top = nsmallest(count, set(self.numbers[start:end]))
+        return [self.entries[number] for number in top[:count]]
+
+
+def _keywords(postings):
+    """(word, product count) for catalog words used by several products"""
+    return [(word, len(ids)) for word, ids in postings.items()
+            if len(ids) >= KEYWORD_MIN_PRODUCTS and word not in STOP_WORDS and KEYWORD_PATTERN.fullmatch(word)]
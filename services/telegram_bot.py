@@ -1,67 +1,382 @@
-import requestsimport requests
-
-import osimport os
-
-
-
-
-
-def send_telegram_alert(message):def send_telegram_alert(message):
-
-    try:    try:
-
-        # Use environment variables only - no hardcoded tokens        # Use environment variables only - no hardcoded tokens
-
-        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-
-        chat_id = os.environ.get('TELEGRAM_CHAT_ID')        chat_id = os.environ.get('TELEGRAM_CHAT_ID')
-
-
-
-        # Check if environment variables are set        # Check if environment variables are set
-
-        if not bot_token or not chat_id:        if not bot_token or not chat_id:
-
-            print("Telegram credentials not configured. Skipping notification.")            print("Telegram credentials not configured. Skipping notification.")
-
-            return False            return False
-
-
-
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-
-        payload = {        payload = {
-
-            'chat_id': chat_id,            'chat_id': chat_id,
-
-            'text': message,            'text': message,
-
-            'parse_mode': 'HTML'            'parse_mode': 'HTML'
-
-        }        }
-
-
-
-        print(f"Sending to Telegram: {url}")        print(f"Sending to Telegram: {url}")
-
-        print(f"Message: {message}")        print(f"Message: {message}")
-
-
-
-        response = requests.post(url, data=payload)        response = requests.post(url, data=payload)
-
-        print(f"Response status: {response.status_code}")        print(f"Response status: {response.status_code}")
-
-        print(f"Response text: {response.text}")        print(f"Response text: {response.text}")
-
-
-
-        return response.status_code == 200        return response.status_code == 200
-
-
-
-    except Exception as e:    except Exception as e:
-
-        print(f"Telegram error: {e}")        print(f"Telegram error: {e}")
-
-        return False        return False
\ No newline at end of file
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services import instance_path
+from services.metrics import telegram_latency
+
+try:
+    import fcntl
+except ImportError:  # Windows: spool replay falls back to unlocked access
+    fcntl = None
+
+API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+SPOOL_PATH = os.environ.get('TELEGRAM_SPOOL_PATH') or instance_path('telegram_spool.jsonl')
+
+# (connect, read) timeouts for a single sendMessage call
+REQUEST_TIMEOUT = (3.05, 10)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# After a delivery runs out of attempts its messages are queued again after a longer, growing delay
+REQUEUE_BASE = 30.0
+REQUEUE_MAX = 15 * 60.0
+
+# Telegram allows roughly one message per second to the same chat
+MIN_SEND_INTERVAL = 1.0
+# How long the worker waits for more messages to merge into one send
+COALESCE_WINDOW = 0.5
+MAX_MESSAGE_LENGTH = 4096
+MESSAGE_SEPARATOR = '\n\n' + '—' * 12 + '\n\n'
+
+# Outcomes of one delivery; failed messages are queued again later, rejected ones never are
+DELIVERED, REJECTED, FAILED = 'delivered', 'rejected', 'failed'
+
+# Tells this run's spool records from an earlier run's that had the same pid, where /proc is missing
+_RUN_ID = uuid.uuid4().hex
+
+
+def _process_start(pid):
+    """Start time of pid in clock ticks since boot, or None without /proc"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields follow the command name, which is in parentheses and may contain spaces
+    return int(stat[stat.rindex(b')') + 2:].split()[19])
+
+
+def _owner(pid):
+    """Identify a process by pid and start time, since containers reuse the same low pids on restart"""
+    start = _process_start(pid)
+    if start is not None:
+        return f"{pid}:{start}"
+    if pid == os.getpid():
+        return f"{pid}:{_RUN_ID}"
+    return None
+
+
+def _owner_alive(owner):
+    pid, _, _ = (owner or '').partition(':')
+    if not pid.isdigit():
+        return False
+    pid = int(pid)
+    if pid == os.getpid():
+        return owner == _owner(pid)
+    if not _pid_alive(pid):
+        return False
+    # Without /proc a live pid is given the benefit of the doubt
+    current = _owner(pid)
+    return current is None or current == owner
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MessageSpool:
+    """Append-only JSONL log of queued and delivered messages.
+
+    Every queued message is written before it is handed to the worker and
+    acknowledged once Telegram accepts it, so anything still unacknowledged
+    after a crash or restart can be replayed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def append(self, record, sync=True):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            # claim_orphans in another worker may be rewriting the file
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(line)
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def queued(self, message):
+        self.append({'op': 'queued', 'id': message['id'], 'owner': _owner(os.getpid()),
+                     'text': message['text'], 'created': message['created']})
+
+    def acked(self, message_ids, op='delivered'):
+        # A lost acknowledgement only means a duplicate after a crash, so skip the fsync
+        for message_id in message_ids:
+            self.append({'op': op, 'id': message_id}, sync=False)
+
+    def pending(self):
+        """Messages queued but not yet delivered or rejected, by id"""
+        if not os.path.exists(self.path):
+            return {}
+        with self._lock, open(self.path, 'r', encoding='utf-8') as f:
+            return self._pending(f)
+
+    @staticmethod
+    def _pending(f):
+        pending = {}
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn write from a crash mid-append
+            if record.get('op') == 'queued':
+                pending[record['id']] = record
+            else:
+                pending.pop(record.get('id'), None)
+        return pending
+
+    def claim_orphans(self):
+        """Take over undelivered messages queued by processes that no longer exist.
+
+        The spool is compacted to its undelivered messages, with the orphans
+        re-owned by this process, and the orphans are returned for the caller
+        to queue again.
+        """
+        if not os.path.exists(self.path):
+            return []
+
+        with self._lock, open(self.path, 'r+', encoding='utf-8') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                pending = self._pending(f)
+
+                orphans = []
+                for record in pending.values():
+                    if not _owner_alive(record.get('owner')):
+                        record['owner'] = _owner(os.getpid())
+                        orphans.append(record)
+
+                f.seek(0)
+                f.truncate()
+                for record in pending.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return orphans
+
+
+class TelegramNotifier:
+    """Delivers messages from a background thread over a pooled HTTP session"""
+
+    def __init__(self, bot_token, chat_id, api_url=API_URL, spool_path=SPOOL_PATH):
+        self.bot_token = bot_token
+        self.chat_id = chat_id
+        self.url = f"{api_url.rstrip('/')}/bot{bot_token}/sendMessage"
+        self.spool = MessageSpool(spool_path)
+        self.queue = queue.Queue()
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._last_send = 0.0
+        self._held = None
+
+    def send(self, text):
+        """Queue a message for delivery and return immediately"""
+        message = {'id': uuid.uuid4().hex, 'text': text, 'created': time.time()}
+        self.spool.queued(message)
+        self.start()
+        self.queue.put(message)
+        return True
+
+    def start(self):
+        """Start the delivery thread in this process, replaying orphaned messages first"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # A forked child must not deliver the parent's in-memory queue
+                self.queue = queue.Queue()
+                self._held = None
+                for orphan in self.spool.claim_orphans():
+                    self.queue.put({'id': orphan['id'], 'text': orphan['text'], 'created': orphan['created']})
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='telegram-notifier', daemon=True)
+            self._thread.start()
+
+    def flush(self, timeout=None):
+        """Block until every queued message has been delivered, rejected or set aside to retry later"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _next_batch(self):
+        """Wait for a message, then collect whatever else arrives within the coalesce window"""
+        batch = [self._held or self.queue.get()]
+        self._held = None
+        size = len(batch[0]['text'])
+        deadline = time.monotonic() + max(COALESCE_WINDOW, self._last_send + MIN_SEND_INTERVAL - time.monotonic())
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(MESSAGE_SEPARATOR) + len(message['text']) > MAX_MESSAGE_LENGTH:
+                # Too big to merge; it starts the next batch instead
+                self._held = message
+                break
+            batch.append(message)
+            size += len(MESSAGE_SEPARATOR) + len(message['text'])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                outcome = self._deliver(MESSAGE_SEPARATOR.join(m['text'] for m in batch))
+                if outcome == REJECTED and len(batch) > 1:
+                    # One bad message must not sink the others it was merged with
+                    for message in batch:
+                        self._settle([message], self._deliver(message['text']))
+                else:
+                    self._settle(batch, outcome)
+            except Exception as e:
+                print(f"Telegram worker error: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _settle(self, messages, outcome):
+        ids = [m['id'] for m in messages]
+        if outcome == FAILED:
+            self._requeue(messages)
+        else:
+            self.spool.acked(ids, op=outcome)
+
+    def _requeue(self, messages):
+        """Put failed messages back on the queue once Telegram has had longer to recover.
+
+        The delay doubles with each failed round, up to REQUEUE_MAX. The
+        messages stay unacknowledged in the spool meanwhile, so a restart
+        before then still replays them.
+        """
+        failures = max(m.get('failures', 0) for m in messages) + 1
+        delay = min(REQUEUE_MAX, REQUEUE_BASE * 2 ** (failures - 1))
+        print(f"Telegram delivery failed; retrying {len(messages)} message(s) in {delay:.0f}s")
+
+        def requeue():
+            for message in messages:
+                self.queue.put(dict(message, failures=failures))
+
+        timer = threading.Timer(delay, requeue)
+        timer.daemon = True
+        timer.start()
+
+    def _deliver(self, text):
+        """POST one message, retrying transient failures with exponential backoff.
+
+        Returns DELIVERED, REJECTED for a 4xx other than 429 (retrying will
+        not help), or FAILED once the attempts run out.
+        """
+        payload = {
+            'chat_id': self.chat_id,
+            'text': text,
+            'parse_mode': 'HTML'
+        }
+        for attempt in range(MAX_ATTEMPTS):
+            wait = self._last_send + MIN_SEND_INTERVAL - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url, data=payload, timeout=REQUEST_TIMEOUT)
+                self._last_send = time.monotonic()
+                telegram_latency.observe(time.perf_counter() - started, outcome=response.status_code)
+                if response.status_code == 200:
+                    return DELIVERED
+                if response.status_code == 429:
+                    try:
+                        retry_after = response.json().get('parameters', {}).get('retry_after')
+                    except ValueError:
+                        pass
+                elif response.status_code < 500:
+                    # Bad request or bad credentials; retrying will not help
+                    print(f"Telegram rejected message: {response.status_code} {response.text}")
+                    return REJECTED
+            except requests.RequestException as e:
+                self._last_send = time.monotonic()
+                telegram_latency.observe(time.perf_counter() - started, outcome='error')
+                print(f"Telegram error: {e}")
+
+            if attempt + 1 < MAX_ATTEMPTS:
+                backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                time.sleep(retry_after if retry_after is not None else backoff)
+        return FAILED
+
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """Return the process-wide notifier, or None when credentials are not configured"""
+    global _notifier
+    # Use environment variables only - no hardcoded tokens
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    chat_id = os.environ.get('TELEGRAM_CHAT_ID')
+    if not bot_token or not chat_id:
+        return None
+
+    with _notifier_lock:
+        if _notifier is None or (_notifier.bot_token, _notifier.chat_id) != (bot_token, chat_id):
+            _notifier = TelegramNotifier(bot_token, chat_id)
+    return _notifier
+
+
+def start():
+    """Start background delivery (and spool replay) if Telegram is configured"""
+    notifier = get_notifier()
+    if notifier:
+        notifier.start()
+
+
+def send_telegram_alert(message):
+    """Queue a Telegram message; returns False only if Telegram is not configured"""
+    try:
+        notifier = get_notifier()
+        if notifier is None:
+            print("Telegram credentials not configured. Skipping notification.")
+            return False
+        return notifier.send(message)
+
+    except Exception as e:
+        print(f"Telegram error: {e}")
+        return False
@@ -0,0 +1,62 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from services import instance_path
+from services.cache import LRUCache
+
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096))
+# Default seconds a fragment is kept when the tag gives no TTL; 0 disables fragment caching
+FRAGMENT_CACHE_TTL = float(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR') or instance_path('jinja_bytecode')
+
+# Rendered template fragments shared by every template in this process
+fragment_cache = LRUCache(FRAGMENT_CACHE_MAX_ENTRIES, FRAGMENT_CACHE_TTL)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds a ``{% cache key[, ttl] %}...{% endcache %}`` tag.
+
+    The key is any expression (use a tuple for compound keys) and is scoped
+    to the template, so only the values the fragment depends on need to be
+    part of it. Set ``environment.fragment_cache_version`` to a callable
+    returning the current data version (e.g. the catalog version) and every
+    key includes it, so fragments are never served for an older catalog.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=fragment_cache, fragment_cache_version=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_support', args), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, template_name, key, ttl, caller):
+        if not FRAGMENT_CACHE_TTL:
+            return caller()
+
+        version = self.environment.fragment_cache_version
+        cache_key = (template_name, key, version() if version else None)
+        rv = self.environment.fragment_cache.get(cache_key)
+        if rv is None:
+            rv = str(caller())
+            self.environment.fragment_cache.set(cache_key, rv, ttl)
+        return Markup(rv)
+
+
+def bytecode_cache():
+    """Compiled templates on disk, so new workers skip parsing and compiling them"""
+    os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+    return FileSystemBytecodeCache(BYTECODE_CACHE_DIR)
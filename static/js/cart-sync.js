@@ -0,0 +1,109 @@
+// Keeps the server-side cart in step with the localStorage cart.
+// Each change is sent as a small delta to /cart/items; the whole cart is only
+// posted to /sync-cart when a delta was lost (offline, server error) or the
+// server no longer has this browser's cart (new session, expired, redeployed).
+(function () {
+    const DIRTY_KEY = 'cart_dirty';
+    // Item count the server last reported; the server losing the cart shows up as a different count
+    const COUNT_KEY = 'cart_server_count';
+    // Requests go out one at a time so the server applies them in order
+    let queue = Promise.resolve();
+
+    function markDirty() {
+        localStorage.setItem(DIRTY_KEY, '1');
+    }
+
+    function isDirty() {
+        // A cart without the flag predates server-side carts and still needs one full sync
+        return localStorage.getItem(DIRTY_KEY) !== '0';
+    }
+
+    function remember(data) {
+        if (data && typeof data.item_count === 'number') {
+            localStorage.setItem(COUNT_KEY, String(data.item_count));
+        }
+        return data;
+    }
+
+    function serverLostCart() {
+        // localStorage outlives the session cookie and the server's copy, so ask the server
+        const expected = Number(localStorage.getItem(COUNT_KEY) || 0);
+        if (expected === 0 && localCart().length === 0) {
+            return Promise.resolve(false);
+        }
+        return request('GET', '/cart/items').then(data => !data || data.item_count !== expected);
+    }
+
+    function send(method, url, body) {
+        queue = queue.then(() => request(method, url, body));
+        return queue;
+    }
+
+    function request(method, url, body) {
+        return fetch(url, {
+            method: method,
+            headers: { 'Content-Type': 'application/json' },
+            credentials: 'same-origin',
+            body: body === undefined ? undefined : JSON.stringify(body)
+        })
+        .then(response => {
+            if (response.status === 404) {
+                // Not a catalog product (e.g. a placeholder recommendation); nothing to keep in step
+                return null;
+            }
+            if (!response.ok) {
+                throw new Error(`Cart update failed: ${response.status}`);
+            }
+            return response.json().then(remember);
+        })
+        .catch(error => {
+            console.error(error);
+            markDirty();
+            return null;
+        });
+    }
+
+    function localCart() {
+        return JSON.parse(localStorage.getItem('cart')) || [];
+    }
+
+    const CartSync = {
+        add(productId, quantity = 1) {
+            return send('POST', '/cart/items', { id: productId, quantity: quantity });
+        },
+
+        update(productId, quantity) {
+            return send('PATCH', `/cart/items/${encodeURIComponent(productId)}`, { quantity: quantity });
+        },
+
+        remove(productId) {
+            return send('DELETE', `/cart/items/${encodeURIComponent(productId)}`);
+        },
+
+        clear() {
+            return send('DELETE', '/cart/items');
+        },
+
+        // Push the full localStorage cart if the server copy may be stale or gone.
+        // Runs after any queued deltas, so a dirty flag they set is seen here.
+        reconcile() {
+            queue = queue.then(() => isDirty() ? true : serverLostCart()).then(stale => {
+                if (!stale) {
+                    return true;
+                }
+                const items = localCart().map(item => ({ id: item.id, quantity: item.quantity }));
+                return request('POST', '/sync-cart', { cart_items: items }).then(data => {
+                    if (data && data.success) {
+                        localStorage.setItem(DIRTY_KEY, '0');
+                        return true;
+                    }
+                    return false;
+                });
+            });
+            return queue;
+        }
+    };
+
+    window.CartSync = CartSync;
+    document.addEventListener('DOMContentLoaded', () => CartSync.reconcile());
+})();
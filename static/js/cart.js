@@ -52,24 +52,9 @@ document.addEventListener("DOMContentLoaded", () => {
     // Shipping options
     const shippingOptions = document.querySelectorAll('input[name="shipping"]');
     
-    // Constants
-    const TAX_RATE = 0.08; // 8% tax rate
-    const FREE_SHIPPING_THRESHOLD = 50;
-    const SHIPPING_COSTS = {
-        'standard-shipping': 0,
-        'express-shipping': 9.99,
-        'overnight-shipping': 19.99
-    };
-
-    // Coupon codes
-    const COUPON_CODES = {
-        'WELCOME10': { discount: 0.10, type: 'percentage', description: '10% off' },
-        'PLANT20': { discount: 0.20, type: 'percentage', description: '20% off' },
-        'SAVE5': { discount: 5, type: 'fixed', description: '$5 off' },
-        'FREESHIP': { discount: 0, type: 'freeship', description: 'Free shipping' }
-    };
-
+    // Prices, shipping, coupons and tax all come from /api/quote
     let appliedCoupon = null;
+    let quoteSequence = 0;
 
     // Initialize cart with delay to ensure DOM is ready
     setTimeout(initializeCart, 100);
@@ -310,6 +295,7 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         saveCartToStorage();
+        syncCart('update', productId, item.quantity);
         displayCartItems();
         updateCartSummary();
         updateCartBadge();
@@ -323,6 +309,7 @@ document.addEventListener("DOMContentLoaded", () => {
         cartItems[itemIndex].quantity = Math.max(1, Math.min(99, newQuantity));
         
         saveCartToStorage();
+        syncCart('update', productId, cartItems[itemIndex].quantity);
         updateCartSummary();
         updateCartBadge();
     }
@@ -338,6 +325,7 @@ document.addEventListener("DOMContentLoaded", () => {
             setTimeout(() => {
                 cartItems.splice(itemIndex, 1);
                 saveCartToStorage();
+                syncCart('remove', productId);
                 displayCartItems();
                 updateCartSummary();
                 updateCartBadge();
@@ -356,6 +344,7 @@ document.addEventListener("DOMContentLoaded", () => {
             cartItems = [];
             appliedCoupon = null;
             saveCartToStorage();
+            syncCart('clear');
             displayCartItems();
             updateCartSummary();
             updateCartBadge();
@@ -369,64 +358,34 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
-    function updateCartSummary() {
-        console.log('Updating cart summary, cart items:', cartItems.length);
-        
-        const subtotal = cartItems.reduce((sum, item) => sum + (item.price * item.quantity), 0);
-        const totalItems = cartItems.reduce((sum, item) => sum + item.quantity, 0);
-        
-        // Get selected shipping cost
+    function getSelectedShippingMethod() {
         const selectedShipping = document.querySelector('input[name="shipping"]:checked');
-        let shippingCost = 0;
-        
-        console.log('Selected shipping option:', selectedShipping?.id);
-        
-        if (selectedShipping) {
-            shippingCost = SHIPPING_COSTS[selectedShipping.id] || 0;
-        }
-
-        console.log('Calculated shipping cost:', shippingCost);
-
-        // Apply free shipping only for standard shipping if over threshold, or if coupon applied
-        if (appliedCoupon && appliedCoupon.type === 'freeship') {
-            shippingCost = 0;
-            console.log('Free shipping applied via coupon');
-        } else if (subtotal >= FREE_SHIPPING_THRESHOLD && selectedShipping?.id === 'standard-shipping') {
-            shippingCost = 0;
-            console.log('Free standard shipping applied (over $50)');
-        }
+        return selectedShipping ? selectedShipping.id.replace('-shipping', '') : 'standard';
+    }
 
-        // Calculate discount
-        let discount = 0;
-        if (appliedCoupon) {
-            if (appliedCoupon.type === 'percentage') {
-                discount = subtotal * appliedCoupon.discount;
-            } else if (appliedCoupon.type === 'fixed') {
-                discount = appliedCoupon.discount;
+    // Ask the server to price the cart; resolves to the quote, or rejects with the server's message
+    function fetchQuote(coupon) {
+        return fetch('/api/quote', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                items: cartItems.map(item => ({ id: item.id, quantity: item.quantity })),
+                coupon: coupon,
+                shipping_method: getSelectedShippingMethod()
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.message || 'Could not price cart');
             }
-        }
-
-        const discountedSubtotal = Math.max(0, subtotal - discount);
-        const tax = discountedSubtotal * TAX_RATE;
-        const total = discountedSubtotal + shippingCost + tax;
-
-        console.log('Summary calculation:', { subtotal, shippingCost, tax, total });
+            return data.quote;
+        });
+    }
 
-        // Update DOM elements
+    function updateCartSummary() {
+        const totalItems = cartItems.reduce((sum, item) => sum + item.quantity, 0);
         if (totalItemsSpan) totalItemsSpan.textContent = totalItems;
-        if (subtotalSpan) subtotalSpan.textContent = `$${subtotal.toFixed(2)}`;
-        if (shippingCostSpan) {
-            if (shippingCost === 0) {
-                shippingCostSpan.textContent = 'Free';
-                shippingCostSpan.classList.add('text-success');
-            } else {
-                shippingCostSpan.textContent = `$${shippingCost.toFixed(2)}`;
-                shippingCostSpan.classList.remove('text-success');
-            }
-            console.log('Updated shipping display:', shippingCostSpan.textContent);
-        }
-        if (taxAmountSpan) taxAmountSpan.textContent = `$${tax.toFixed(2)}`;
-        if (finalTotalSpan) finalTotalSpan.textContent = `$${total.toFixed(2)}`;
 
         // Enable/disable checkout button
         if (checkoutBtn) {
@@ -443,8 +402,33 @@ document.addEventListener("DOMContentLoaded", () => {
             }
         }
 
+        // Only the newest request gets to update the totals
+        const sequence = ++quoteSequence;
+        fetchQuote(appliedCoupon && appliedCoupon.code)
+            .then(quote => {
+                if (sequence === quoteSequence) {
+                    renderQuote(quote);
+                }
+            })
+            .catch(error => console.error('Quote error:', error));
+    }
+
+    function renderQuote(quote) {
+        if (subtotalSpan) subtotalSpan.textContent = `$${quote.subtotal.toFixed(2)}`;
+        if (shippingCostSpan) {
+            if (quote.shipping_cost === 0) {
+                shippingCostSpan.textContent = 'Free';
+                shippingCostSpan.classList.add('text-success');
+            } else {
+                shippingCostSpan.textContent = `$${quote.shipping_cost.toFixed(2)}`;
+                shippingCostSpan.classList.remove('text-success');
+            }
+        }
+        if (taxAmountSpan) taxAmountSpan.textContent = `$${quote.tax_amount.toFixed(2)}`;
+        if (finalTotalSpan) finalTotalSpan.textContent = `$${quote.total.toFixed(2)}`;
+
         // Show discount if applied
-        displayAppliedDiscount(discount);
+        displayAppliedDiscount(quote.discount);
     }
 
     function displayAppliedDiscount(discount) {
@@ -476,14 +460,16 @@ document.addEventListener("DOMContentLoaded", () => {
             return;
         }
 
-        if (COUPON_CODES[couponCode]) {
-            if (appliedCoupon && appliedCoupon.code === couponCode) {
-                showMessage('This coupon is already applied', 'info');
-                return;
-            }
+        if (appliedCoupon && appliedCoupon.code === couponCode) {
+            showMessage('This coupon is already applied', 'info');
+            return;
+        }
 
-            appliedCoupon = { ...COUPON_CODES[couponCode], code: couponCode };
-            updateCartSummary();
+        fetchQuote(couponCode)
+        .then(quote => {
+            appliedCoupon = { code: quote.coupon, description: quote.coupon_description };
+            quoteSequence++;
+            renderQuote(quote);
             showMessage(`Coupon applied! ${appliedCoupon.description}`, 'success');
             
             // Update coupon input to show applied state
@@ -499,10 +485,8 @@ document.addEventListener("DOMContentLoaded", () => {
             `);
             
             document.getElementById('remove-coupon-btn').addEventListener('click', removeCoupon);
-            
-        } else {
-            showMessage('Invalid coupon code', 'error');
-        }
+        })
+        .catch(error => showMessage(error.message || 'Invalid coupon code', 'error'));
     }
 
     function removeCoupon() {
@@ -547,31 +531,19 @@ document.addEventListener("DOMContentLoaded", () => {
             checkoutBtn.classList.add('disabled');
         }
 
-        console.log('Syncing cart to session:', cartItems);
-
-        // Sync cart to session before checkout
-        fetch('/sync-cart', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ cart_items: cartItems })
-        })
-        .then(response => {
-            console.log('Sync response status:', response.status);
-            return response.json();
-        })
-        .then(data => {
-            console.log('Sync response data:', data);
-            if (data.success) {
-                console.log('Cart synced successfully, redirecting to checkout');
-                // Small delay before redirect to ensure state is updated
-                setTimeout(() => {
-                    window.location.href = '/checkout';
-                }, 500);
-            } else {
-                throw new Error(data.message || 'Failed to sync cart');
+        // Deltas have kept the server cart current; a full sync only runs if one was lost
+        const ready = window.CartSync ? window.CartSync.reconcile() : Promise.resolve(false);
+        ready
+        .then(synced => {
+            if (!synced) {
+                throw new Error('Failed to sync cart');
+            }
+            // The checkout page reprices with the same options
+            const params = new URLSearchParams({ shipping_method: getSelectedShippingMethod() });
+            if (appliedCoupon) {
+                params.set('coupon', appliedCoupon.code);
             }
+            window.location.href = `/checkout?${params}`;
         })
         .catch(error => {
             console.error('Checkout error:', error);
@@ -585,11 +557,6 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
 
-    function getSelectedShippingCost() {
-        const selectedShipping = document.querySelector('input[name="shipping"]:checked');
-        return selectedShipping ? SHIPPING_COSTS[selectedShipping.id] || 0 : 0;
-    }
-
     function loadRecommendedProducts() {
         // Sample recommended products - using actual available images from your static folder
         const recommendedProducts = [
@@ -696,6 +663,7 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         saveCartToStorage();
+        syncCart('add', product.id, 1);
         displayCartItems();
         updateCartSummary();
         updateCartBadge();
@@ -713,6 +681,14 @@ document.addEventListener("DOMContentLoaded", () => {
         localStorage.setItem('cart', JSON.stringify(cartItems));
     }
 
+    // Mirror one change to the server-side cart (see cart-sync.js)
+    function syncCart(action, ...args) {
+        if (window.CartSync) {
+            return window.CartSync[action](...args);
+        }
+        return Promise.resolve(null);
+    }
+
     function showMessage(message, type = 'info') {
         const alertClass = {
             'success': 'alert-success',
@@ -787,6 +763,7 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         saveCartToStorage();
+        syncCart('add', productData.id, 1);
         updateCartBadge();
         
         // Update cart page if currently viewing it
@@ -822,6 +799,7 @@ document.addEventListener("DOMContentLoaded", () => {
         cartItems = [];
         appliedCoupon = null;
         saveCartToStorage();
+        syncCart('clear');
         updateCartBadge();
         
         // Update cart page if currently viewing it
@@ -1,7 +1,6 @@
 document.addEventListener("DOMContentLoaded", () => {
     // Global variables
     const cartItems = [];
-    let filteredProducts = [];
     
     // Cart elements
     const cartCountElement = document.getElementById('cart-count');
@@ -23,18 +22,25 @@ document.addEventListener("DOMContentLoaded", () => {
     const sortDropdown = document.getElementById('sortDropdown');
     const noResultsDiv = document.getElementById('no-results');
     
-    // Get all product items
-    const allProducts = Array.from(document.querySelectorAll('.product-item'));
-    filteredProducts = [...allProducts];
+    // Listing state - results come from /api/products rather than hidden DOM nodes
+    const PAGE_SIZE = 9;
+    let nextCursor = productsGrid?.dataset.nextCursor || null;
+    let activeSort = 'featured';
+    let activeFlag = null;
+    let pendingRequest = null;
+    let searchTimer = null;
+    let loadingMore = false;
+    
+    // Typeahead - answers from /api/suggest, remembered per query for this page view
+    const SUGGEST_DELAY = 150;
+    const suggestCache = new Map();
 
     // Initialize
     loadCartFromStorage();
     updateCartDisplay();
     initializeEventListeners();
     initializeProductCards();
-    
-    // Initialize filters - make sure all products are visible initially
-    applyFilters();
+    initializeInfiniteScroll();
     
     // Test if JS is loading properly
     console.log('Shop.js loaded successfully. Cart items:', cartItems.length);
@@ -56,6 +62,9 @@ document.addEventListener("DOMContentLoaded", () => {
         if (navbarSearch) {
             navbarSearch.addEventListener('input', handleSearch);
         }
+        [searchInput, navbarSearch].forEach(input => {
+            if (input) initializeSuggestions(input);
+        });
         
         // Filter functionality
         categoryFilters.forEach(filter => {
@@ -76,12 +85,12 @@ document.addEventListener("DOMContentLoaded", () => {
             priceMinInput.addEventListener('input', () => {
                 // Clear price range radio buttons when typing custom values
                 priceRangeFilters.forEach(filter => filter.checked = false);
-                applyFilters();
+                handleSearch();
             });
             priceMaxInput.addEventListener('input', () => {
                 // Clear price range radio buttons when typing custom values
                 priceRangeFilters.forEach(filter => filter.checked = false);
-                applyFilters();
+                handleSearch();
             });
         }
         
@@ -202,6 +211,9 @@ document.addEventListener("DOMContentLoaded", () => {
         
         // Save to localStorage
         localStorage.setItem('cart', JSON.stringify(cart));
+        if (window.CartSync) {
+            window.CartSync.add(productData.id, 1);
+        }
         
         // Update local cartItems array
         cartItems.length = 0;
@@ -237,8 +249,11 @@ document.addEventListener("DOMContentLoaded", () => {
     function removeFromCart(index) {
         // Remove from localStorage
         let cart = JSON.parse(localStorage.getItem('cart')) || [];
-        cart.splice(index, 1);
+        const [removed] = cart.splice(index, 1);
         localStorage.setItem('cart', JSON.stringify(cart));
+        if (removed && window.CartSync) {
+            window.CartSync.remove(removed.id);
+        }
         
         // Update local cartItems array
         cartItems.splice(index, 1);
@@ -253,6 +268,9 @@ document.addEventListener("DOMContentLoaded", () => {
     function clearCart() {
         cartItems.length = 0;
         localStorage.removeItem('cart');
+        if (window.CartSync) {
+            window.CartSync.clear();
+        }
         updateCartDisplay();
         
         // Dispatch custom event
@@ -428,92 +446,165 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     function handleSearch() {
-        // Just trigger applyFilters which handles search now
-        applyFilters();
+        // Wait for a pause in typing before asking the server
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(applyFilters, 250);
     }
 
-    function applyFilters() {
-        // ALWAYS start completely fresh - reset all products to original state
-        let filtered = [...allProducts]; 
+    function initializeSuggestions(input) {
+        const menu = document.createElement('div');
+        menu.className = 'dropdown-menu w-100 shadow-sm';
+        menu.setAttribute('role', 'listbox');
+        input.parentElement.style.position = 'relative';
+        input.parentElement.appendChild(menu);
+        input.setAttribute('autocomplete', 'off');
+        
+        let timer = null;
+        let controller = null;
+        let active = -1;
+        
+        function hide() {
+            menu.classList.remove('show');
+            active = -1;
+        }
+        
+        function render(suggestions) {
+            menu.replaceChildren(...suggestions.map(suggestion => {
+                const item = document.createElement('a');
+                item.className = 'dropdown-item d-flex justify-content-between align-items-center';
+                item.href = suggestion.url;
+                item.setAttribute('role', 'option');
+                const text = document.createElement('span');
+                text.textContent = suggestion.text;
+                const type = document.createElement('small');
+                type.className = 'text-muted ms-2';
+                type.textContent = suggestion.type;
+                item.append(text, type);
+                return item;
+            }));
+            active = -1;
+            menu.classList.toggle('show', suggestions.length > 0 && document.activeElement === input);
+        }
+        
+        function fetchSuggestions() {
+            const query = input.value.trim().toLowerCase();
+            if (!query) {
+                hide();
+                return;
+            }
+            if (suggestCache.has(query)) {
+                render(suggestCache.get(query));
+                return;
+            }
+            // Only the latest keystroke's answer matters
+            if (controller) controller.abort();
+            controller = new AbortController();
+            fetch('/api/suggest?' + new URLSearchParams({ q: query }), { signal: controller.signal })
+                .then(response => response.ok ? response.json() : { suggestions: [] })
+                .then(data => {
+                    suggestCache.set(query, data.suggestions);
+                    if (input.value.trim().toLowerCase() === query) render(data.suggestions);
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Error loading suggestions:', error);
+                });
+        }
         
-        // Clear any existing filter states
-        allProducts.forEach(product => {
-            product.classList.remove('filtered-hidden');
-            product.style.display = 'block'; // Reset to visible first
+        input.addEventListener('input', () => {
+            clearTimeout(timer);
+            timer = setTimeout(fetchSuggestions, SUGGEST_DELAY);
         });
         
-        // Search filter first
-        const query = (searchInput?.value || navbarSearch?.value || '').toLowerCase().trim();
-        if (query) {
-            filtered = filtered.filter(product => {
-                const name = product.dataset.name?.toLowerCase() || '';
-                const category = product.dataset.category?.toLowerCase() || '';
-                return name.includes(query) || category.includes(query);
-            });
-        }
+        input.addEventListener('keydown', (e) => {
+            const items = menu.querySelectorAll('.dropdown-item');
+            if (!menu.classList.contains('show') || !items.length) return;
+            if (e.key === 'ArrowDown' || e.key === 'ArrowUp') {
+                e.preventDefault();
+                active = (active + (e.key === 'ArrowDown' ? 1 : items.length - 1)) % items.length;
+                items.forEach((item, index) => item.classList.toggle('active', index === active));
+            } else if (e.key === 'Enter' && active >= 0) {
+                e.preventDefault();
+                window.location.href = items[active].href;
+            } else if (e.key === 'Escape') {
+                hide();
+            }
+        });
+        
+        // Delay so a click on a suggestion lands before the menu goes away
+        input.addEventListener('blur', () => setTimeout(hide, 150));
+    }
+
+    function buildQueryParams() {
+        const params = new URLSearchParams();
+        
+        const query = (searchInput?.value || navbarSearch?.value || '').trim();
+        if (query) params.set('q', query);
         
-        // Category filter
         const selectedCategory = document.querySelector('input[name="categoryFilter"]:checked')?.value;
-        if (selectedCategory && selectedCategory !== 'all') {
-            filtered = filtered.filter(product => {
-                const productCategory = (product.dataset.category || '').toLowerCase().trim();
-                const targetCategory = selectedCategory.toLowerCase().trim();
-                return productCategory === targetCategory;
-            });
-        }
+        if (selectedCategory && selectedCategory !== 'all') params.append('category', selectedCategory);
         
-        // Price range filter
         const selectedPriceRange = document.querySelector('input[name="priceRange"]:checked')?.value;
-        const minPrice = parseFloat(priceMinInput?.value || 0);
-        const maxPrice = parseFloat(priceMaxInput?.value || 1000);
-        
         if (selectedPriceRange) {
-            const [min, max] = selectedPriceRange.split('-').map(Number);
-            filtered = filtered.filter(product => {
-                const price = parseFloat(product.dataset.price);
-                return price >= min && price <= max;
-            });
-        } else if ((priceMinInput?.value && priceMinInput.value.trim() !== '') || (priceMaxInput?.value && priceMaxInput.value.trim() !== '')) {
+            params.append('price', selectedPriceRange);
+        } else {
             // Only apply manual price range if values are actually set
-            filtered = filtered.filter(product => {
-                const price = parseFloat(product.dataset.price);
-                const actualMin = priceMinInput?.value && priceMinInput.value.trim() !== '' ? minPrice : 0;
-                const actualMax = priceMaxInput?.value && priceMaxInput.value.trim() !== '' ? maxPrice : 1000;
-                return price >= actualMin && price <= actualMax;
-            });
+            if (priceMinInput?.value.trim()) params.set('min_price', priceMinInput.value.trim());
+            if (priceMaxInput?.value.trim()) params.set('max_price', priceMaxInput.value.trim());
         }
         
-        displayProducts(filtered);
+        if (activeFlag) params.set('flag', activeFlag);
+        if (activeSort !== 'featured') params.set('sort', activeSort);
+        params.set('limit', PAGE_SIZE);
+        return params;
     }
 
-    function handleQuickLinkFilter(filterType) {
-        // Clear existing filters first
-        clearAllFilters();
-        
-        // Filter products based on special attributes
-        let filtered = [...allProducts];
-        
-        switch(filterType) {
-            case 'featured':
-            case 'popular':
-                filtered = filtered.filter(product => product.dataset.popular === 'true');
-                break;
-            case 'new':
-                filtered = filtered.filter(product => product.dataset.new === 'true');
-                break;
-            case 'sale':
-                filtered = filtered.filter(product => product.dataset.sale === 'true');
-                break;
-            case 'rating':
-                filtered = filtered.filter(product => {
-                    const rating = parseInt(product.dataset.rating || 0);
-                    return rating >= 5; // Show 5-star products
+    function fetchProducts(params) {
+        // Drop any response still in flight for an older filter state
+        if (pendingRequest) pendingRequest.abort();
+        pendingRequest = new AbortController();
+        
+        // The server renders the cards; we only get the HTML for one page
+        return fetch(`/shop/page?${params}`, { signal: pendingRequest.signal })
+            .then(response => {
+                if (!response.ok) throw new Error(`Failed to load products (${response.status})`);
+                const cursor = response.headers.get('X-Next-Cursor');
+                const total = parseInt(response.headers.get('X-Total-Count') || '0', 10);
+                return response.text().then(html => {
+                    pendingRequest = null;
+                    return { html: html, total: total, nextCursor: cursor || null };
                 });
-                break;
-            default:
-                // For any other filter, just show all
-                break;
-        }
+            });
+    }
+
+    function applyFilters() {
+        if (!productsGrid) return;
+        
+        productsGrid.classList.add('loading');
+        fetchProducts(buildQueryParams())
+            .then(page => {
+                productsGrid.innerHTML = page.html;
+                productsGrid.classList.remove('loading');
+                initializeProductCards();
+                nextCursor = page.nextCursor;
+                
+                // Show/hide no results message
+                if (noResultsDiv) {
+                    noResultsDiv.classList.toggle('d-none', page.total > 0);
+                }
+                updateProductCount(page.total);
+                updateLoadMoreButton();
+            })
+            .catch(error => {
+                if (error.name === 'AbortError') return;
+                productsGrid.classList.remove('loading');
+                console.error('Error loading products:', error);
+            });
+    }
+
+    function handleQuickLinkFilter(filterType) {
+        // Clear existing filters first, then filter on the product flag server-side
+        resetFilterInputs();
+        activeFlag = filterType;
         
         // Highlight the active quick link
         document.querySelectorAll('.quick-link-btn').forEach(btn => {
@@ -524,112 +615,22 @@ document.addEventListener("DOMContentLoaded", () => {
             activeBtn.classList.add('active', 'bg-success', 'text-white');
         }
         
-        displayProducts(filtered);
-    }
-
-    function displayProducts(products) {
-        // FIRST: Reset ALL products to hidden state and clear all classes
-        allProducts.forEach(product => {
-            product.style.display = 'none';
-            product.classList.add('filtered-hidden');
-            // Reset load more state for fresh filtering
-            if (product.classList.contains('extra-product')) {
-                product.classList.add('d-none');
-            }
-        });
-        
-        // SECOND: Show only the filtered products (limit to first 9 initially)
-        products.forEach((product, index) => {
-            product.style.display = 'block';
-            product.classList.remove('filtered-hidden');
-            
-            // Show first 9 products, hide the rest for load more functionality
-            if (index < 9) {
-                if (product.classList.contains('extra-product')) {
-                    product.classList.remove('d-none');
-                }
-            } else {
-                // Hide products beyond first 9 for load more
-                if (product.classList.contains('extra-product')) {
-                    product.classList.add('d-none');
-                }
-            }
-        });
-        
-        // Show/hide no results message
-        if (noResultsDiv) {
-            if (products.length === 0) {
-                noResultsDiv.classList.remove('d-none');
-            } else {
-                noResultsDiv.classList.add('d-none');
-            }
-        }
-        
-        // Update product count display
-        updateProductCount(products.length);
-        
-        // Handle load more button visibility
-        const loadMoreBtn = document.getElementById('load-more-btn');
-        const loadMoreSection = document.getElementById('load-more-section');
-        if (loadMoreBtn && loadMoreSection) {
-            // Only show load more if there are more than 9 products AND some are hidden
-            if (products.length > 9) {
-                const hiddenProducts = products.filter((product, index) => 
-                    index >= 9 && product.classList.contains('extra-product')
-                );
-                
-                if (hiddenProducts.length > 0) {
-                    loadMoreSection.style.display = 'block';
-                    loadMoreBtn.style.display = 'block';
-                    loadMoreBtn.disabled = false;
-                    loadMoreBtn.classList.remove('btn-secondary');
-                    loadMoreBtn.classList.add('btn-outline-success');
-                    loadMoreBtn.innerHTML = '<i class="fas fa-plus me-2"></i>Load More Products';
-                } else {
-                    loadMoreSection.style.display = 'none';
-                }
-            } else {
-                // Hide load more if 9 or fewer products
-                loadMoreSection.style.display = 'none';
-            }
-        }
+        applyFilters();
     }
 
-    function resetLoadMore() {
-        // For filtered results, hide extra products that were previously shown
-        const extraProducts = document.querySelectorAll('.product-item.extra-product');
-        extraProducts.forEach(product => {
-            // Only hide if it's currently visible due to filtering
-            if (!product.classList.contains('filtered-hidden') && product.style.display !== 'none') {
-                product.classList.add('d-none');
-            }
-        });
-        
-        // Show load more button ONLY if there are more than 9 visible products after filtering
+    function updateLoadMoreButton() {
         const loadMoreBtn = document.getElementById('load-more-btn');
         const loadMoreSection = document.getElementById('load-more-section');
-        if (loadMoreBtn && loadMoreSection) {
-            // Count total visible products after filtering
-            const visibleProducts = Array.from(allProducts).filter(p => 
-                !p.classList.contains('filtered-hidden') && p.style.display !== 'none'
-            );
-            
-            // Count how many are currently hidden due to load-more (extra products)
-            const hiddenExtraProducts = Array.from(extraProducts).filter(p => 
-                !p.classList.contains('filtered-hidden') && p.classList.contains('d-none')
-            );
-            
-            // Only show load more if there are more than 9 total visible products AND there are hidden extra products
-            if (visibleProducts.length > 9 && hiddenExtraProducts.length > 0) {
-                loadMoreSection.style.display = 'block';
-                loadMoreBtn.style.display = 'block';
-                loadMoreBtn.disabled = false;
-                loadMoreBtn.classList.remove('btn-secondary');
-                loadMoreBtn.classList.add('btn-outline-success');
-                loadMoreBtn.innerHTML = '<i class="fas fa-plus me-2"></i>Load More Products';
-            } else {
-                loadMoreSection.style.display = 'none';
-            }
+        if (!loadMoreBtn || !loadMoreSection) return;
+        
+        if (nextCursor) {
+            loadMoreSection.style.display = 'block';
+            loadMoreBtn.style.display = 'inline-block';
+            loadMoreBtn.classList.remove('btn-secondary', 'disabled');
+            loadMoreBtn.classList.add('btn-outline-success');
+            loadMoreBtn.innerHTML = '<i class="fas fa-plus me-2"></i>Load More Products';
+        } else {
+            loadMoreSection.style.display = 'none';
         }
     }
 
@@ -643,29 +644,10 @@ document.addEventListener("DOMContentLoaded", () => {
 
     function handleSort(e) {
         if (!e.target.dataset.sort) return;
+        e.preventDefault();
         
-        const sortType = e.target.dataset.sort;
-        const visibleProducts = Array.from(productsGrid.querySelectorAll('.product-item:not([style*="display: none"])'));
-        
-        visibleProducts.sort((a, b) => {
-            switch (sortType) {
-                case 'name':
-                    return a.dataset.name.localeCompare(b.dataset.name);
-                case 'name-desc':
-                    return b.dataset.name.localeCompare(a.dataset.name);
-                case 'price':
-                    return parseFloat(a.dataset.price) - parseFloat(b.dataset.price);
-                case 'price-desc':
-                    return parseFloat(b.dataset.price) - parseFloat(a.dataset.price);
-                default:
-                    return 0;
-            }
-        });
-        
-        // Reorder DOM elements
-        visibleProducts.forEach(product => {
-            productsGrid.appendChild(product);
-        });
+        activeSort = e.target.dataset.sort;
+        applyFilters();
         
         // Update dropdown text
         sortDropdown.innerHTML = `<i class="fas fa-sort me-2"></i>${e.target.textContent}`;
@@ -708,54 +690,51 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     }
 
-    function loadMoreProducts() {
-        // Find hidden products that match current filters
+    function loadMoreProducts(e) {
+        if (e) e.preventDefault();
+        
         const loadMoreBtn = document.getElementById('load-more-btn');
-        const hiddenProducts = Array.from(allProducts).filter(product => 
-            !product.classList.contains('filtered-hidden') && // Passes current filters
-            product.style.display !== 'none' && // Not filtered out
-            product.classList.contains('extra-product') && // Is an extra product
-            product.classList.contains('d-none') // Currently hidden by load-more
-        );
-        
-        if (!loadMoreBtn || hiddenProducts.length === 0) {
+        if (!loadMoreBtn || !nextCursor) {
             if (loadMoreBtn) loadMoreBtn.style.display = 'none';
             return;
         }
+        if (loadingMore) return;
+        loadingMore = true;
 
         // Disable button and show loading state
-        loadMoreBtn.disabled = true;
-        loadMoreBtn.classList.add('btn-secondary');
+        loadMoreBtn.classList.add('btn-secondary', 'disabled');
         loadMoreBtn.classList.remove('btn-outline-success');
         loadMoreBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-2" role="status" aria-hidden="true"></span>Loading...';
 
-        setTimeout(() => {
-            // Show next batch (up to 6 items)
-            const batch = hiddenProducts.slice(0, 6);
-            batch.forEach(el => {
-                el.classList.remove('d-none');
+        const params = buildQueryParams();
+        params.set('cursor', nextCursor);
+        fetchProducts(params)
+            .then(page => {
+                productsGrid.insertAdjacentHTML('beforeend', page.html);
+                initializeProductCards();
+                nextCursor = page.nextCursor;
+            })
+            .catch(error => {
+                if (error.name !== 'AbortError') console.error('Error loading more products:', error);
+            })
+            .finally(() => {
+                loadingMore = false;
+                updateLoadMoreButton();
             });
+    }
 
-            // Check if there are still more hidden products
-            const stillHidden = Array.from(allProducts).filter(product => 
-                !product.classList.contains('filtered-hidden') &&
-                product.style.display !== 'none' &&
-                product.classList.contains('extra-product') &&
-                product.classList.contains('d-none')
-            );
-            
-            if (stillHidden.length === 0) {
-                loadMoreBtn.style.display = 'none';
-            } else {
-                loadMoreBtn.disabled = false;
-                loadMoreBtn.classList.remove('btn-secondary');
-                loadMoreBtn.classList.add('btn-outline-success');
-                loadMoreBtn.innerHTML = '<i class="fas fa-plus me-2"></i>Load More Products';
-            }
-        }, 500);
+    function initializeInfiniteScroll() {
+        // Fetch the next page as the load-more button scrolls into view
+        const loadMoreSection = document.getElementById('load-more-section');
+        if (!loadMoreSection || !('IntersectionObserver' in window)) return;
+        
+        const observer = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) loadMoreProducts();
+        }, { rootMargin: '400px 0px' });
+        observer.observe(loadMoreSection);
     }
 
-    function clearAllFilters() {
+    function resetFilterInputs() {
         // Reset category filter to "All"
         const allCategoryFilter = document.getElementById('all-category');
         if (allCategoryFilter) {
@@ -775,38 +754,7 @@ document.addEventListener("DOMContentLoaded", () => {
         if (searchInput) searchInput.value = '';
         if (navbarSearch) navbarSearch.value = '';
         
-        // Reset all products to original state
-        allProducts.forEach(product => {
-            product.style.display = 'block';
-            product.classList.remove('filtered-hidden');
-            // Reset load more state to original
-            if (product.classList.contains('extra-product')) {
-                product.classList.add('d-none');
-            }
-        });
-        
-        // Hide no results message
-        if (noResultsDiv) {
-            noResultsDiv.classList.add('d-none');
-        }
-        
-        // Reset load more button
-        const loadMoreBtn = document.getElementById('load-more-btn');
-        const loadMoreSection = document.getElementById('load-more-section');
-        if (loadMoreBtn && loadMoreSection) {
-            const hiddenProducts = document.querySelectorAll('.product-item.extra-product.d-none');
-            if (hiddenProducts.length > 0) {
-                loadMoreSection.style.display = 'block';
-                loadMoreBtn.style.display = 'block';
-                loadMoreBtn.disabled = false;
-                loadMoreBtn.classList.remove('btn-secondary');
-                loadMoreBtn.classList.add('btn-outline-success');
-                loadMoreBtn.innerHTML = '<i class="fas fa-plus me-2"></i>Load More Products';
-            }
-        }
-        
-        // Update product count to total
-        updateProductCount(allProducts.length);
+        activeFlag = null;
         
         // Clear quick link highlighting
         document.querySelectorAll('.quick-link-btn').forEach(btn => {
@@ -814,6 +762,11 @@ document.addEventListener("DOMContentLoaded", () => {
         });
     }
 
+    function clearAllFilters() {
+        resetFilterInputs();
+        applyFilters();
+    }
+
     function handleCheckout() {
         if (cartItems.length === 0) {
             alert('Your cart is empty!');
@@ -903,55 +856,28 @@ document.addEventListener("DOMContentLoaded", () => {
     `;
     document.head.appendChild(style);
     function initializeProductCards() {
-        console.log('Initializing product cards...');
+        // One delegated handler covers server-rendered cards and pages fetched later
+        if (!productsGrid) return;
         
-        // Make cards clickable by extracting product ID and creating URL
-        const productItems = document.querySelectorAll('.product-item');
-        console.log('Found product items:', productItems.length);
+        if (!productsGrid.dataset.clickBound) {
+            productsGrid.dataset.clickBound = 'true';
+            productsGrid.addEventListener('click', handleProductCardClick);
+        }
         
-        productItems.forEach((item, index) => {
-            const card = item.querySelector('.card');
-            if (card) {
-                card.classList.add('clickable-card');
-                card.style.cursor = 'pointer';
-                
-                // Extract product ID from existing links or create from index
-                let productId = index + 1;
-                const existingLink = card.querySelector('a[href*="/product/"]');
-                if (existingLink) {
-                    const match = existingLink.href.match(/\/product\/(\d+)/);
-                    if (match) productId = match[1];
-                }
-                
-                card.setAttribute('data-product-url', `/product/${productId}`);
-                
-                // Add click handler
-                card.addEventListener('click', function(e) {
-                    // Don't navigate if clicking on buttons or interactive elements
-                    if (e.target.closest('button') || e.target.closest('a') || e.target.closest('.add-to-cart-btn')) {
-                        return;
-                    }
-                    const url = this.getAttribute('data-product-url');
-                    if (url) {
-                        window.location.href = url;
-                    }
-                });
-                
-                // Add text truncation classes
-                const title = item.querySelector('.card-title');
-                if (title) {
-                    title.classList.add('text-truncate');
-                    title.style.maxWidth = '200px';
-                }
-                
-                const description = item.querySelector('.card-text');
-                if (description) {
-                    description.classList.add('text-truncate-2-lines');
-                }
-            }
+        productsGrid.querySelectorAll('.product-card').forEach(card => {
+            card.classList.add('clickable-card');
         });
-        
-        console.log('Product cards initialized successfully');
+    }
+
+    function handleProductCardClick(e) {
+        // Don't navigate if clicking on buttons or interactive elements
+        if (e.target.closest('button') || e.target.closest('a') || e.target.closest('.add-to-cart-btn')) {
+            return;
+        }
+        const item = e.target.closest('.product-item');
+        if (item && item.dataset.productId) {
+            window.location.href = `/product/${item.dataset.productId}`;
+        }
     }
     
     // Expose functions for debugging
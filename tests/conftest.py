@@ -0,0 +1,9 @@
+"""Point every store at a throwaway instance directory before any service is imported"""
+import os
+import tempfile
+
+os.environ['INSTANCE_DIR'] = tempfile.mkdtemp(prefix='greenbean-tests-')
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+for name in ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID', 'TELEGRAM_SPOOL_PATH', 'CART_DB_PATH', 'ORDER_DB_PATH',
+             'IDEMPOTENCY_DB_PATH', 'INVENTORY_DB_PATH', 'RANKINGS_DB_PATH', 'RATE_LIMIT_DB_PATH'):
+    os.environ.pop(name, None)
@@ -0,0 +1,224 @@
+"""The @idempotent decorator, exercised through a small Flask app against a fresh key store"""
+import threading
+import uuid
+
+import pytest
+from flask import Flask, jsonify, request, session
+
+from services import idempotency
+from services.idempotency import IdempotencyStore, allow_retry, idempotent
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    store = IdempotencyStore(str(tmp_path / 'idempotency.sqlite3'))
+    monkeypatch.setattr(idempotency, '_store', store)
+    monkeypatch.setattr(idempotency, 'POLL_INTERVAL', 0.01)
+    return store
+
+
+class Shop:
+    """Views that count their runs; each test sets the response the next run gives"""
+
+    def __init__(self):
+        self.app = Flask(__name__)
+        self.app.secret_key = 'test'
+        self.runs = 0
+        self.status = 200
+        self.retry = False
+        self.error = None
+        self.entered = threading.Event()
+        self.proceed = threading.Event()
+        self.proceed.set()
+
+        @self.app.route('/orders', methods=['POST'])
+        @idempotent
+        def place_order():
+            self.runs += 1
+            self.entered.set()
+            self.proceed.wait(5)
+            if self.error:
+                raise self.error
+            if self.retry:
+                allow_retry()
+            session['last_order'] = self.runs
+            return jsonify({'order': self.runs, 'body': request.get_json(silent=True)}), self.status
+
+    def post(self, key, body=None, client=None):
+        client = client or self.app.test_client()
+        return client.post('/orders', json=body or {'item': 1}, headers={'Idempotency-Key': key})
+
+
+@pytest.fixture
+def shop():
+    return Shop()
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def test_repeat_replays_the_stored_response(shop):
+    key = new_key()
+    first = shop.post(key)
+    repeat = shop.post(key)
+
+    assert shop.runs == 1
+    assert (repeat.status_code, repeat.json) == (first.status_code, first.json)
+    assert repeat.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+
+
+def test_replay_restores_the_session_the_request_left(shop):
+    key = new_key()
+    shop.post(key)
+    client = shop.app.test_client()
+    shop.post(key, client=client)
+
+    with client.session_transaction() as replayed:
+        assert replayed['last_order'] == 1
+
+
+def test_different_keys_run_separately(shop):
+    shop.post(new_key())
+    shop.post(new_key())
+
+    assert shop.runs == 2
+
+
+def test_requests_without_a_key_always_run(shop):
+    client = shop.app.test_client()
+    client.post('/orders', json={'item': 1})
+    client.post('/orders', json={'item': 1})
+
+    assert shop.runs == 2
+
+
+def test_same_key_with_a_different_body_is_rejected(shop):
+    key = new_key()
+    shop.post(key, {'item': 1})
+    response = shop.post(key, {'item': 2})
+
+    assert response.status_code == 422
+    assert response.json['success'] is False
+    assert shop.runs == 1
+
+
+def test_overlong_key_is_rejected(shop):
+    response = shop.post('k' * (idempotency.MAX_KEY_LENGTH + 1))
+
+    assert response.status_code == 400
+    assert shop.runs == 0
+
+
+@pytest.mark.parametrize('status', [500, 503, 429])
+def test_server_errors_and_rate_limits_can_be_retried(shop, status):
+    key = new_key()
+    shop.status = status
+    assert shop.post(key).status_code == status
+
+    shop.status = 201
+    retry = shop.post(key)
+
+    assert shop.runs == 2
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+
+
+def test_allow_retry_keeps_a_client_error_from_being_stored(shop):
+    key = new_key()
+    shop.status, shop.retry = 400, True
+    assert shop.post(key).status_code == 400
+
+    shop.status, shop.retry = 200, False
+    assert shop.post(key).status_code == 200
+    assert shop.runs == 2
+
+
+def test_client_errors_are_stored_like_any_other_response(shop):
+    key = new_key()
+    shop.status = 400
+    shop.post(key)
+
+    shop.status = 200
+    repeat = shop.post(key)
+
+    assert shop.runs == 1
+    assert repeat.status_code == 400
+    assert repeat.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_key_is_released_when_the_view_raises(shop):
+    key = new_key()
+    shop.error = RuntimeError('database is locked')
+    assert shop.post(key).status_code == 500
+
+    shop.error = None
+    assert shop.post(key).status_code == 200
+    assert shop.runs == 2
+
+
+def start_first_request(shop, key):
+    """Start a request that holds key until shop.proceed is set, and return its result holder"""
+    shop.proceed.clear()
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault('response', shop.post(key)))
+    thread.start()
+    assert shop.entered.wait(5)
+    return thread, result
+
+
+def test_repeat_waits_for_the_request_in_progress(shop):
+    key = new_key()
+    thread, first = start_first_request(shop, key)
+
+    repeated = threading.Event()
+    second = {}
+
+    def repeat():
+        second['response'] = shop.post(key)
+        repeated.set()
+
+    threading.Thread(target=repeat).start()
+    assert not repeated.wait(0.2)
+    shop.proceed.set()
+    thread.join(5)
+    assert repeated.wait(5)
+
+    assert shop.runs == 1
+    assert second['response'].json == first['response'].json
+    assert second['response'].headers['Idempotent-Replayed'] == 'true'
+
+
+def test_repeat_gives_up_with_409_if_the_first_takes_too_long(shop, monkeypatch):
+    monkeypatch.setattr(idempotency, 'WAIT_TIMEOUT', 0.2)
+    key = new_key()
+    thread, _ = start_first_request(shop, key)
+    try:
+        response = shop.post(key)
+    finally:
+        shop.proceed.set()
+        thread.join(5)
+
+    assert response.status_code == 409
+    assert shop.runs == 1
+
+
+def test_resubmitted_checkout_places_one_order():
+    from app import create_app
+    from services.order_store import get_order_store
+
+    client = create_app({'START_BACKGROUND_TASKS': False, 'TESTING': True}).test_client()
+    client.post('/cart/items', json={'id': 1, 'quantity': 1})
+    form = {'first_name': 'Ada', 'last_name': 'Lovelace', 'email': 'ada@example.com', 'phone': '555-0100',
+            'street_address': '1 Garden Way', 'city': 'Portland', 'state': 'OR', 'zip_code': '97201',
+            'idempotency_key': new_key()}
+
+    first = client.post('/checkout/process', data=form)
+    repeat = client.post('/checkout/process', data=form)
+
+    assert first.status_code == 302 and '/order-confirmation/' in first.headers['Location']
+    assert repeat.headers['Location'] == first.headers['Location']
+    assert repeat.headers['Idempotent-Replayed'] == 'true'
+    order_id = first.headers['Location'].rsplit('/', 1)[1]
+    assert get_order_store().get(order_id)['order_id'] == order_id
@@ -0,0 +1,136 @@
+"""Cart pricing through /api/quote: coupons, shipping rules and rounding"""
+import pytest
+
+from app import create_app
+
+# Sample catalog products used below
+MONSTERA = 1  # $25.99
+SNAKE_PLANT = 2  # $19.99
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app({'START_BACKGROUND_TASKS': False, 'TESTING': True})
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def quote(client, items, coupon=None, shipping_method=None):
+    response = client.post('/api/quote', json={
+        'items': [{'id': product_id, 'quantity': quantity} for product_id, quantity in items],
+        'coupon': coupon,
+        'shipping_method': shipping_method,
+    })
+    assert response.status_code == 200, response.json
+    return response.json['quote']
+
+
+def totals(quote):
+    return {name: quote[name] for name in ('subtotal', 'discount', 'shipping_cost', 'tax_amount', 'total')}
+
+
+def test_prices_come_from_the_catalog(client):
+    result = client.post('/api/quote', json={'items': [{'id': MONSTERA, 'quantity': 2, 'price': 0.01}]}).json['quote']
+
+    assert result['lines'] == [{'id': MONSTERA, 'name': 'Monstera Deliciosa', 'price': 25.99,
+                                'quantity': 2, 'line_total': 51.98}]
+    assert result['items_count'] == 2
+
+
+def test_standard_shipping_is_charged_below_the_threshold(client):
+    assert totals(quote(client, [(SNAKE_PLANT, 1)])) == {
+        'subtotal': 19.99, 'discount': 0.0, 'shipping_cost': 9.99, 'tax_amount': 1.6, 'total': 31.58}
+
+
+def test_standard_shipping_is_free_over_the_threshold(client):
+    assert totals(quote(client, [(MONSTERA, 2), (SNAKE_PLANT, 1)])) == {
+        'subtotal': 71.97, 'discount': 0.0, 'shipping_cost': 0.0, 'tax_amount': 5.76, 'total': 77.73}
+
+
+@pytest.mark.parametrize('method, cost', [('express', 9.99), ('overnight', 19.99)])
+def test_faster_shipping_is_charged_over_the_threshold(client, method, cost):
+    result = quote(client, [(MONSTERA, 2), (SNAKE_PLANT, 1)], shipping_method=method)
+
+    assert result['shipping_method'] == method
+    assert result['shipping_cost'] == cost
+    assert result['total'] == round(71.97 + cost + 5.76, 2)
+
+
+def test_percentage_coupon_is_normalized_and_taxed_after_the_discount(client):
+    result = quote(client, [(MONSTERA, 2), (SNAKE_PLANT, 1)], coupon=' welcome10 ')
+
+    assert result['coupon'] == 'WELCOME10'
+    assert result['coupon_description'] == '10% off'
+    # 7.197 off, then 8% of 64.77
+    assert totals(result) == {
+        'subtotal': 71.97, 'discount': 7.2, 'shipping_cost': 0.0, 'tax_amount': 5.18, 'total': 69.95}
+
+
+def test_free_shipping_threshold_uses_the_subtotal_before_coupons(client):
+    result = quote(client, [(MONSTERA, 2)], coupon='PLANT20')
+
+    assert totals(result) == {
+        'subtotal': 51.98, 'discount': 10.4, 'shipping_cost': 0.0, 'tax_amount': 3.33, 'total': 44.91}
+
+
+def test_fixed_coupon(client):
+    assert totals(quote(client, [(SNAKE_PLANT, 1)], coupon='SAVE5')) == {
+        'subtotal': 19.99, 'discount': 5.0, 'shipping_cost': 9.99, 'tax_amount': 1.2, 'total': 26.18}
+
+
+def test_free_shipping_coupon_waives_any_method(client):
+    result = quote(client, [(SNAKE_PLANT, 1)], coupon='FREESHIP', shipping_method='overnight')
+
+    assert totals(result) == {
+        'subtotal': 19.99, 'discount': 0.0, 'shipping_cost': 0.0, 'tax_amount': 1.6, 'total': 21.59}
+
+
+def test_half_cents_round_up(client):
+    # 15 x 19.99 is 299.85 exactly, not float's 299.8499..., and 10% of it is 29.985
+    result = quote(client, [(SNAKE_PLANT, 15)], coupon='WELCOME10')
+
+    assert totals(result) == {
+        'subtotal': 299.85, 'discount': 29.99, 'shipping_cost': 0.0, 'tax_amount': 21.59, 'total': 291.45}
+
+
+def test_repeated_product_lines_are_merged(client):
+    result = quote(client, [(SNAKE_PLANT, 1), (SNAKE_PLANT, 2)])
+
+    assert [(line['id'], line['quantity'], line['line_total']) for line in result['lines']] == [(SNAKE_PLANT, 3, 59.97)]
+
+
+def test_unknown_products_and_empty_lines_are_skipped(client):
+    result = quote(client, [(SNAKE_PLANT, 1), (999999, 1), (MONSTERA, 0)])
+
+    assert [line['id'] for line in result['lines']] == [SNAKE_PLANT]
+    assert result['unknown_ids'] == [999999]
+
+
+def test_empty_cart_costs_nothing(client):
+    assert totals(quote(client, [])) == {
+        'subtotal': 0.0, 'discount': 0.0, 'shipping_cost': 0.0, 'tax_amount': 0.0, 'total': 0.0}
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'items': [], 'coupon': 'NOPE'}, 'Invalid coupon code'),
+    ({'items': [], 'shipping_method': 'teleport'}, 'Unknown shipping method'),
+    ({'items': [1, 2]}, 'items must be a list of {id, quantity} objects'),
+    ([1], 'Expected a JSON object'),
+])
+def test_bad_requests_are_rejected(client, body, message):
+    response = client.post('/api/quote', json=body)
+
+    assert response.status_code == 400
+    assert response.json == {'success': False, 'message': message}
+
+
+def test_get_prices_the_visitors_cart(client):
+    client.post('/cart/items', json={'id': SNAKE_PLANT, 'quantity': 1})
+
+    result = client.get('/api/quote', query_string={'coupon': 'save5'}).json['quote']
+
+    assert [(line['id'], line['quantity']) for line in result['lines']] == [(SNAKE_PLANT, 1)]
+    assert result['total'] == 26.18
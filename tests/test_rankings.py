@@ -0,0 +1,65 @@
+"""Best sellers and new arrivals, against a fresh rankings database"""
+import pytest
+
+from services import rankings as rankings_module
+from services.catalog import CATALOG_PATH, Catalog, read_products
+from services.rankings import Rankings
+
+
+@pytest.fixture
+def products():
+    return read_products(CATALOG_PATH)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'rankings.sqlite3')
+
+
+def test_fresh_database_takes_new_arrivals_from_catalog_flags(products, db_path):
+    rankings = Rankings(Catalog(products), db_path)
+
+    flagged = {p['id'] for p in products if p.get('is_new')}
+    assert flagged, "the sample catalog should flag some new products"
+    assert {p['id'] for p in products if rankings.is_new(p)} == flagged
+
+
+def test_reopened_database_keeps_catalog_flags(products, db_path):
+    Rankings(Catalog(products), db_path)
+    rankings = Rankings(Catalog(products), db_path)
+
+    assert {p['id'] for p in products if rankings.is_new(p)} == {p['id'] for p in products if p.get('is_new')}
+
+
+def test_products_added_by_a_later_catalog_are_new(products, db_path):
+    rankings = Rankings(Catalog(products), db_path)
+    added = dict(products[0], id=max(p['id'] for p in products) + 1, name='Fresh Fern', is_new=False)
+    rankings.use_catalog(Catalog(products + [added]))
+
+    assert rankings.is_new(added)
+    assert rankings.new()[0]['id'] == added['id']
+    assert not rankings.is_new(next(p for p in products if not p.get('is_new')))
+
+
+def test_sales_rank_best_sellers_and_survive_a_restart(products, db_path):
+    rankings = Rankings(Catalog(products), db_path)
+    best, runner_up = products[-1], products[-2]
+    rankings.record(best['id'], 3)
+    rankings.record(runner_up['id'], 2)
+    rankings.sync()
+
+    assert rankings.best_sellers()[:2] == [best['id'], runner_up['id']]
+    assert rankings.is_popular(best)
+
+    reopened = Rankings(Catalog(products), db_path)
+    assert reopened.best_sellers()[:2] == [best['id'], runner_up['id']]
+    assert reopened.sales(best['id']) == pytest.approx(3, rel=1e-3)
+
+
+def test_old_sales_decay_below_the_popular_threshold(products, db_path):
+    rankings = Rankings(Catalog(products), db_path)
+    product = products[0]
+    rankings.record(product['id'], 2, when=rankings.landmark - 4 * rankings_module.HALF_LIFE)
+
+    assert product['id'] not in rankings.best_sellers()
+    assert rankings.sales(product['id']) == pytest.approx(2 / 16, rel=1e-3)
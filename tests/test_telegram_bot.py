@@ -0,0 +1,203 @@
+"""Telegram notifier against the stub Bot API in tools/telegram_stub.py"""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from services import telegram_bot
+from services.telegram_bot import MessageSpool, TelegramNotifier
+from tools.telegram_stub import StubTelegramServer
+
+
+@pytest.fixture(autouse=True)
+def fast_delivery(monkeypatch):
+    # Real pacing would make every test take seconds
+    monkeypatch.setattr(telegram_bot, 'MIN_SEND_INTERVAL', 0.0)
+    monkeypatch.setattr(telegram_bot, 'COALESCE_WINDOW', 0.05)
+    monkeypatch.setattr(telegram_bot, 'BACKOFF_BASE', 0.01)
+
+
+@pytest.fixture
+def stub():
+    with StubTelegramServer() as server:
+        yield server
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / 'telegram_spool.jsonl')
+
+
+def make_notifier(stub, spool_path):
+    return TelegramNotifier('test-token', '42', api_url=stub.url, spool_path=spool_path)
+
+
+def spool_ops(spool_path):
+    """Message id -> the last op the spool recorded for it"""
+    ops = {}
+    with open(spool_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            ops[record['id']] = record['op']
+    return ops
+
+
+def test_delivers_queued_message(stub, spool_path):
+    notifier = make_notifier(stub, spool_path)
+    notifier.send('<b>Hello</b> from the shop')
+    assert notifier.flush(timeout=5)
+
+    assert [m['text'] for m in stub.messages] == ['<b>Hello</b> from the shop']
+    assert stub.messages[0]['chat']['id'] == '42'
+    assert set(spool_ops(spool_path).values()) == {'delivered'}
+
+
+def test_coalesces_messages_sent_together(stub, spool_path, monkeypatch):
+    monkeypatch.setattr(telegram_bot, 'COALESCE_WINDOW', 0.3)
+    notifier = make_notifier(stub, spool_path)
+    notifier.send('first')
+    notifier.send('second')
+    assert notifier.flush(timeout=5)
+
+    assert [m['text'] for m in stub.messages] == ['first' + telegram_bot.MESSAGE_SEPARATOR + 'second']
+
+
+@pytest.mark.parametrize('status', [500, 502, 429])
+def test_retries_transient_failures(stub, spool_path, status):
+    stub.script = [status, status]
+    notifier = make_notifier(stub, spool_path)
+    notifier.send('retry me')
+    assert notifier.flush(timeout=5)
+
+    assert stub.requests == 3
+    assert [m['text'] for m in stub.messages] == ['retry me']
+    assert set(spool_ops(spool_path).values()) == {'delivered'}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_requeues_message_after_attempts_run_out(stub, spool_path, monkeypatch):
+    monkeypatch.setattr(telegram_bot, 'REQUEUE_BASE', 0.3)
+    stub.script = [502] * telegram_bot.MAX_ATTEMPTS
+    notifier = make_notifier(stub, spool_path)
+    notifier.send('try later')
+    assert notifier.flush(timeout=5)
+
+    # Set aside, still unacknowledged, until the longer delay has passed
+    assert stub.requests == telegram_bot.MAX_ATTEMPTS
+    assert stub.messages == []
+    assert set(spool_ops(spool_path).values()) == {'queued'}
+
+    wait_for(lambda: stub.messages)
+    assert notifier.flush(timeout=5)
+    assert stub.requests == telegram_bot.MAX_ATTEMPTS + 1
+    assert [m['text'] for m in stub.messages] == ['try later']
+    assert set(spool_ops(spool_path).values()) == {'delivered'}
+
+
+class RecordingTimer:
+    """Stands in for threading.Timer, noting each delay instead of waiting it out"""
+    delays = []
+
+    def __init__(self, delay, function):
+        self.delays.append(delay)
+
+    def start(self):
+        pass
+
+
+def test_requeue_delay_grows_with_each_failed_round(monkeypatch, spool_path):
+    monkeypatch.setattr(RecordingTimer, 'delays', [])
+    monkeypatch.setattr(telegram_bot.threading, 'Timer', RecordingTimer)
+    notifier = TelegramNotifier('test-token', '42', spool_path=spool_path)
+    message = {'id': 'm', 'text': 'x', 'created': 0.0}
+    for failures in range(8):
+        notifier._settle([dict(message, failures=failures)], telegram_bot.FAILED)
+
+    base, cap = telegram_bot.REQUEUE_BASE, telegram_bot.REQUEUE_MAX
+    assert RecordingTimer.delays == [min(cap, base * 2 ** n) for n in range(8)]
+    assert RecordingTimer.delays[-1] == cap
+
+
+def test_append_waits_for_the_spool_lock(spool_path):
+    fcntl = pytest.importorskip('fcntl')
+    spool = MessageSpool(spool_path)
+    spool.queued({'id': 'first', 'text': 'a', 'created': 0.0})
+    appended = threading.Event()
+
+    with open(spool_path, 'r+', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        writer = threading.Thread(target=lambda: (spool.acked(['first']), appended.set()))
+        writer.start()
+        assert not appended.wait(0.2)
+        # What claim_orphans does while it holds the lock
+        f.seek(0)
+        f.truncate()
+        fcntl.flock(f, fcntl.LOCK_UN)
+    writer.join(timeout=5)
+
+    assert appended.is_set()
+    assert spool_ops(spool_path) == {'first': 'delivered'}
+
+
+def test_rejected_message_is_not_retried_or_replayed(stub, spool_path):
+    stub.script = [400]
+    notifier = make_notifier(stub, spool_path)
+    notifier.send('unwanted')
+    assert notifier.flush(timeout=5)
+
+    assert stub.requests == 1
+    assert stub.messages == []
+    assert set(spool_ops(spool_path).values()) == {'rejected'}
+    assert notifier.spool.claim_orphans() == []
+
+
+def test_rejected_batch_is_resent_one_message_at_a_time(stub, spool_path, monkeypatch):
+    monkeypatch.setattr(telegram_bot, 'COALESCE_WINDOW', 0.3)
+    notifier = make_notifier(stub, spool_path)
+    notifier.send('<b>Order</b> one')
+    notifier.send('Tom & Jerry <3')
+    notifier.send('<b>Order</b> three')
+    assert notifier.flush(timeout=5)
+
+    assert [m['text'] for m in stub.messages] == ['<b>Order</b> one', '<b>Order</b> three']
+    assert sorted(spool_ops(spool_path).values()) == ['delivered', 'delivered', 'rejected']
+
+
+def write_queued(spool_path, message_id, owner, text):
+    with open(spool_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'queued', 'id': message_id, 'owner': owner,
+                            'text': text, 'created': 0.0}) + '\n')
+
+
+def test_replays_messages_left_by_a_previous_run(stub, spool_path):
+    # A container restart gives the new process the same pid the old one had
+    write_queued(spool_path, 'from-last-run', f"{os.getpid()}:1", 'left behind')
+    write_queued(spool_path, 'delivered-already', f"{os.getpid()}:1", 'sent before the crash')
+    with open(spool_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'delivered', 'id': 'delivered-already'}) + '\n')
+
+    notifier = make_notifier(stub, spool_path)
+    notifier.start()
+    assert notifier.flush(timeout=5)
+
+    assert [m['text'] for m in stub.messages] == ['left behind']
+    assert spool_ops(spool_path) == {'from-last-run': 'delivered'}
+
+
+def test_leaves_messages_of_live_processes_alone(stub, spool_path):
+    write_queued(spool_path, 'in-flight', telegram_bot._owner(os.getpid()), 'still being sent')
+
+    notifier = make_notifier(stub, spool_path)
+    notifier.start()
+    assert notifier.flush(timeout=5)
+
+    assert stub.messages == []
+    assert spool_ops(spool_path) == {'in-flight': 'queued'}
@@ -0,0 +1,149 @@
+"""Local stand-in for the Telegram Bot API.
+
+Point the app at it with TELEGRAM_API_URL=http://127.0.0.1:8081 to exercise
+contact-form notifications without reaching api.telegram.org:
+
+    python tools/telegram_stub.py --port 8081 --delay 0.2 --fail-rate 0.1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+SEND_MESSAGE_PATH = re.compile(r'^/bot(?P<token>[^/]+)/sendMessage$')
+# With parse_mode HTML, Telegram refuses a < that does not open a supported tag and a bare &
+UNPARSEABLE_HTML = re.compile(r'<(?!/?(?:b|strong|i|em|u|ins|s|strike|del|a|code|pre|tg-spoiler|blockquote)\b)'
+                              r'|&(?!(?:lt|gt|amp|quot|#\d+|#x[0-9a-fA-F]+);)')
+
+
+class StubTelegramServer:
+    """Threaded HTTP server that records sendMessage calls.
+
+    ``delay`` adds latency to every call, ``fail_rate`` answers that share of
+    calls with a 502 and ``rate_limit`` answers 429 when calls arrive closer
+    together than that many seconds, like the real API does. ``script`` lists
+    status codes (502, 429, 400...) to answer the first calls with, in order.
+    HTML messages Telegram could not parse are answered with 400.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, fail_rate=0.0, rate_limit=0.0, script=()):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit
+        self.script = list(script)
+        self.messages = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._last_accepted = 0.0
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='telegram-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _respond(self, fields):
+        """Return (status, body) for one sendMessage call"""
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if self.script:
+                return self._error(self.script.pop(0))
+            if fields.get('parse_mode') == 'HTML' and UNPARSEABLE_HTML.search(fields.get('text', '')):
+                return 400, {'ok': False, 'error_code': 400,
+                             'description': "Bad Request: can't parse entities"}
+            if self.fail_rate and random.random() < self.fail_rate:
+                return 502, {'ok': False, 'error_code': 502, 'description': 'Bad Gateway'}
+            if self.rate_limit and now - self._last_accepted < self.rate_limit:
+                retry_after = max(1, round(self.rate_limit))
+                return 429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                             'parameters': {'retry_after': retry_after}}
+            self._last_accepted = now
+            message = {'message_id': len(self.messages) + 1,
+                       'chat': {'id': fields.get('chat_id')},
+                       'text': fields.get('text', ''),
+                       'date': int(time.time())}
+            self.messages.append(message)
+        return 200, {'ok': True, 'result': message}
+
+    @staticmethod
+    def _error(status):
+        payload = {'ok': False, 'error_code': status, 'description': 'Scripted error'}
+        if status == 429:
+            payload['parameters'] = {'retry_after': 0}
+        return status, payload
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not SEND_MESSAGE_PATH.match(self.path):
+                    return self._send(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8')
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    fields = json.loads(body or '{}')
+                else:
+                    fields = {k: v[0] for k, v in parse_qs(body).items()}
+                self._send(*server._respond(fields))
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub Telegram Bot API server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds of latency per call')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of calls answered with 502')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='minimum seconds between accepted calls')
+    args = parser.parse_args()
+
+    server = StubTelegramServer(args.host, args.port, args.delay, args.fail_rate, args.rate_limit)
+    print(f"Stub Telegram API listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"Received {len(server.messages)} message(s)")
+
+
+if __name__ == '__main__':
+    main()